@@ -4,11 +4,12 @@ import inspect
 
 import PredicateSet 
 import CoopPredicateSet
+import PredicateRegistry
+import RandomStreams
 
 import EvolutionaryLearner as EvolutionaryLearner
 from TrafficLight import TrafficLight
 from Rule import Rule
-from random import randrange
 from operator import attrgetter
 
 class AgentPool:
@@ -22,6 +23,7 @@ class AgentPool:
         self.individuals = []                   
         self.userDefinedRuleSet = [Rule(-1, ["emergencyVehicleApproachingVertical"], -1, self), Rule(-1, ["emergencyVehicleApproachingHorizontal"], -1, self), Rule(-1, ["maxGreenPhaseTimeReached"], -1, self), Rule(-1, ["maxYellowPhaseTimeReached"], -1, self)]
         self.coopPredicates = self.initCoopPredicates()                 # Store Observations of communicated intentions here since they are agent specific
+        self.randomGenerator = RandomStreams.getGenerator("agentPool_" + identifier)   # Stream for selecting the pool's individuals and breeding them
         self.initIndividuals()                                          # Populate Agent Pool's own rule set with random rules
         self.minIndividualRunsPerGen = minIndividualRunsPerGen
 
@@ -30,10 +32,16 @@ class AgentPool:
 
     def getActionSet(self):
         return self.actionSet
+
+    def setMinIndividualRunsPerGen(self, minIndividualRunsPerGen):
+        self.minIndividualRunsPerGen = minIndividualRunsPerGen
     
     def getCoopPredicates(self):
         return self.coopPredicates
 
+    def getRandomGenerator(self):
+        return self.randomGenerator
+
     def getIndividualsSet(self):
         return self.individuals
     
@@ -49,6 +57,7 @@ class AgentPool:
     def addNewTrafficLight(self, trafficLight):
         self.trafficLightsAssigned.append(trafficLight)
         trafficLight.assignToAgentPool(self)
+        PredicateRegistry.invalidateTopology()                          # Agent specific predicates depend on the pool's traffic lights
     
     def addDoNothingAction(self):
         self.actionSet.append("DoNothing")
@@ -57,23 +66,23 @@ class AgentPool:
     def selectIndividual(self):
         self.individualsNeedingRuns = []
         for i in self.individuals:
-            if i.getSelectedCount() < self.minIndividualRunsPerGen:
+            if i.needsRuns(self.minIndividualRunsPerGen):
                 self.individualsNeedingRuns.append(i)
         
         if len(self.individualsNeedingRuns) == 0:
-            return self.getIndividualsSet()[randrange(0, len(self.getIndividualsSet()))] # Currently returning a random rule
+            return self.getIndividualsSet()[self.randomGenerator.integers(len(self.getIndividualsSet()))] # Currently returning a random rule
         
         elif len(self.individualsNeedingRuns) == 1:
             return self.individualsNeedingRuns[0]
         else:
-            return self.individualsNeedingRuns[randrange(0, len(self.individualsNeedingRuns))]
+            return self.individualsNeedingRuns[self.randomGenerator.integers(len(self.individualsNeedingRuns))]
 
         # RETURN RANDOM PREDICATE FROM coopPredicate LIST FOR A RULE IN RSint
     def getRandomRSintPredicate(self):
-        return self.coopPredicates[randrange(len(self.coopPredicates))]
+        return self.coopPredicates[self.randomGenerator.integers(len(self.coopPredicates))]
     
     def initCoopPredicates(self):
-        return CoopPredicateSet.getPredicateSet(self)
+        return PredicateRegistry.getCoopPredicates(self)
     
     def getBestIndividual(self):
         bestIndivList = sorted(self.individuals, key=lambda x: x.getFitness())
@@ -0,0 +1,111 @@
+import os
+import sys
+import timeit
+
+# Wraps a simulator backend (see SimulatorBackend) to count and time every call made through its
+# domains (ex: trafficlight.setPhase) and its simulationStep, grouped by API function and by the
+# method of the calling module (ex: a Driver method) that made it. Reading subscription results
+# does not go over the TraCI socket, as TraCI keeps the results of the last simulation step, so
+# those calls are counted apart from the round trips to SUMO. Under libsumo and the stand-in no call
+# leaves the process, but the counts still show how much each method asks of the simulator.
+
+    # Functions that read results TraCI already holds instead of querying SUMO
+global localFunctions
+localFunctions = {"getSubscriptionResults", "getContextSubscriptionResults", "getAllSubscriptionResults", "getAllContextSubscriptionResults"}
+
+class AccountingBackend:
+
+        # WRAP A BACKEND; CALLS ARE CREDITED TO THE INNERMOST CALLER DEFINED IN callerFile (EX: Driver.py)
+    def __init__(self, backend, callerFile):
+        self.backend = backend
+        self.callerFile = callerFile
+        self.simulation = AccountingDomain(self, "simulation", backend.simulation)
+        self.vehicle = AccountingDomain(self, "vehicle", backend.vehicle)
+        self.trafficlight = AccountingDomain(self, "trafficlight", backend.trafficlight)
+        self.edge = AccountingDomain(self, "edge", backend.edge)
+        self.lane = AccountingDomain(self, "lane", backend.lane)
+        self.lanearea = AccountingDomain(self, "lanearea", backend.lanearea)
+        self.junction = AccountingDomain(self, "junction", backend.junction)
+        self.reset()
+
+        # FORGET ALL CALLS COUNTED SO FAR
+    def reset(self):
+        self.functions = {}     # API function -> [count, total time]
+        self.callers = {}       # Calling method -> [count, total time, {API function: count}]
+
+        # COUNT ONE TIMED CALL OF AN API FUNCTION, CREDITED TO THE METHOD THAT MADE IT
+    def record(self, function, seconds):
+        stats = self.functions.get(function)
+        if stats is None:
+            stats = self.functions[function] = [0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+
+        caller = self.getCaller()
+        stats = self.callers.get(caller)
+        if stats is None:
+            stats = self.callers[caller] = [0, 0, {}]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2][function] = stats[2].get(function, 0) + 1
+
+        # RETURN THE NAME OF THE INNERMOST FUNCTION OF callerFile ON THE STACK, OR "other" IF THE CALL CAME FROM ELSEWHERE; GENERATOR EXPRESSIONS AND COMPREHENSIONS ARE CREDITED TO THE FUNCTION THEY ARE IN
+    def getCaller(self):
+        frame = sys._getframe(2)    # Skip this method and record
+        while frame is not None:
+            if frame.f_code.co_filename == self.callerFile and not frame.f_code.co_name.startswith("<"):
+                return frame.f_code.co_name
+            frame = frame.f_back
+        return "other"
+
+        # ADVANCE THE SIMULATION ONE STEP, OR UP TO A GIVEN TIME
+    def simulationStep(self, time=0):
+        start = timeit.default_timer()
+        self.backend.simulationStep(time)
+        self.record("simulationStep", timeit.default_timer() - start)
+
+        # RETURN THE NUMBER OF CALLS THAT WENT TO THE SIMULATOR, LEAVING OUT READS OF SUBSCRIPTION RESULTS
+    def getRoundTrips(self):
+        return sum(count for function, (count, total) in self.functions.items() if function.split(".")[-1] not in localFunctions)
+
+    def getCalls(self):
+        return sum(count for count, total in self.functions.values())
+
+        # RETURN THE COUNTS AS A DICTIONARY, WITH ROUND TRIPS PER SIMULATED SECOND AND PER DECISION OF A RUN OF simulatedSeconds WITH decisions TRAFFIC LIGHT DECISIONS
+    def getRecord(self, simulatedSeconds, decisions):
+        roundTrips = self.getRoundTrips()
+        record = {"simulatedSeconds": simulatedSeconds, "decisions": decisions, "calls": self.getCalls(), "roundTrips": roundTrips,
+                  "roundTripsPerSimulatedSecond": roundTrips/simulatedSeconds if simulatedSeconds > 0 else None,
+                  "roundTripsPerDecision": roundTrips/decisions if decisions > 0 else None,
+                  "functions": {}, "callers": {}}
+        for function, (count, total) in sorted(self.functions.items()):
+            record["functions"][function] = {"count": count, "total": total, "local": function.split(".")[-1] in localFunctions}
+        for caller, (count, total, functions) in sorted(self.callers.items()):
+            record["callers"][caller] = {"count": count, "total": total, "functions": dict(sorted(functions.items()))}
+
+        return record
+
+class AccountingDomain:
+
+        # WRAP A DOMAIN OF A BACKEND (EX: backend.trafficlight), COUNTING ITS CALLS IN accounting
+    def __init__(self, accounting, name, domain):
+        self.accounting = accounting
+        self.name = name
+        self.domain = domain
+
+        # RETURN A COUNTED VERSION OF A DOMAIN FUNCTION; IT IS KEPT AS AN ATTRIBUTE SO LATER LOOKUPS SKIP THIS METHOD
+    def __getattr__(self, attribute):
+        value = getattr(self.domain, attribute)
+        if not callable(value):
+            return value
+
+        function = self.name + "." + attribute
+        accounting = self.accounting
+        def countedCall(*args, **kwargs):
+            start = timeit.default_timer()
+            result = value(*args, **kwargs)
+            accounting.record(function, timeit.default_timer() - start)
+            return result
+
+        setattr(self, attribute, countedCall)
+        return countedCall
@@ -247,23 +247,8 @@ def customPredicate(predicate, intention):
 
     # RETURN LIST OF PREDICATE FUNCTIONS AS DEFINED ABOVE
 def getPredicateSet(agentPool):
-    thisModule = sys.modules[__name__] # Get reference to this module for next operation
-    methodsDict = dict(inspect.getmembers(thisModule, predicate=inspect.isfunction)) # Get a dictionary with all methods (predicates) in this module
-        # Remove all methods that are not predicates from dictionary 
-    methodsDict.pop("getPredicateSet")
-    methodsDict.pop("getRandomPredicate") 
-    methodsDict.pop("getPredicateSetFromFile")
-    methodsDict.pop("getAgentSpecificPredicates")
-    methodsDict.pop("run")
-
-        # Seperate methods/predicates from rest of data in dictionary into a list
-    predicateList = []
-    for predicate in methodsDict:
-        predicateList.append(predicate)
-    
-    predicateList = predicateList + getAgentSpecificPredicates(agentPool)
-    
-    return predicateList
+    import PredicateRegistry        # Imported here since the registry is built from this module
+    return PredicateRegistry.getCoopPredicates(agentPool)
     
     # RETURN LIST OF PREDICATE FUNCTIONS FROM AN INPUT FILE
 def getPredicateSetFromFile(file):
@@ -282,19 +267,12 @@ def getPredicateSetFromFile(file):
 
     # RETURN RANDOM PREDICATE FROM LIST OF PREDICATE FUNCTIONS
 def getRandomPredicate(agentPool):
-    # Add some ap specific stuff here
-    predicateList = getPredicateSet(agentPool)
-    return predicateList[randrange(len(predicateList))]
+    import PredicateRegistry
+    return PredicateRegistry.getRandomCoopPredicate(agentPool)
 
 def getAgentSpecificPredicates(agentPool):
-    customPredicates = []
-    for tl in agentPool.getAssignedTrafficLights():
-        for partner in tl.getCommunicationPartners():
-            for action in partner.getAgentPool().getActionSet():
-                pred = partner.getName() + "_" + action
-                customPredicates.append(pred)
-    
-    return customPredicates
+    import PredicateRegistry
+    return list(PredicateRegistry.getAgentSpecificPredicates(agentPool))
 
 def run():
      print("\nThe predicate list is:", getPredicateSetFromFile("predicatesForRSint.txt"))
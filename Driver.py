@@ -3,14 +3,43 @@
 import os
 import sys
 import optparse
+import timeit
 import traci
+import traci.constants as tc
 
 import PredicateSet 
 import CoopPredicateSet
+import InitSetUp
+import PredicateEngine
+import RandomStreams
 import EvolutionaryLearner 
 import ReinforcementLearner
 from Rule import Rule
 from Intention import Intention
+from IntersectionFeatures import IntersectionFeatures
+from TimingStats import TimingStats
+from CallAccounting import AccountingBackend
+from SimulationSession import SimulationSession
+
+    # Ways intersection features can be read from the simulation:
+    #   "vehicles"  - every vehicle near a traffic light, through a junction context subscription (exact per-vehicle waits)
+    #   "detectors" - a lane area detector on every incoming lane (written by InitSetUp.writeDetectorFile) and the lane's waiting time
+    #   "lanes"     - the halting number and waiting time of every incoming lane, without detectors
+global featureModes
+featureModes = ["vehicles", "detectors", "lanes"]
+
+    # Variables subscribed to for every vehicle near a traffic light, every traffic light and, outside the "vehicles" feature mode, every incoming lane or its detector, at each simulation step
+global vehicleSubscriptionVars
+global trafficLightSubscriptionVars
+global laneSubscriptionVars
+global detectorSubscriptionVars
+global contextRangeMargin
+
+vehicleSubscriptionVars = [tc.VAR_LANE_ID, tc.VAR_SPEED, tc.VAR_WAITING_TIME, tc.VAR_ACCUMULATED_WAITING_TIME]
+trafficLightSubscriptionVars = [tc.TL_CURRENT_PHASE, tc.TL_PHASE_DURATION, tc.TL_NEXT_SWITCH]     # Phase names come from each traffic light's phase table
+laneSubscriptionVars = [tc.LAST_STEP_VEHICLE_HALTING_NUMBER, tc.VAR_WAITING_TIME]
+detectorSubscriptionVars = [tc.LAST_STEP_VEHICLE_HALTING_NUMBER, tc.JAM_LENGTH_METERS]
+contextRangeMargin = 50         # Distance (m) added to the longest incoming lane so a junction's context subscription reaches the end of every lane
 
 class Driver:
 
@@ -20,34 +49,69 @@ class Driver:
     global nextRule
     global maxSimulationTime
 
-    def __init__(self, sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime):
+    def __init__(self, sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, label="default", port=None, session=None, backend="traci", featureMode="vehicles", accountCalls=False):
+        if featureMode not in featureModes:
+            raise ValueError("Unknown feature mode: " + str(featureMode) + " (expected one of " + ", ".join(featureModes) + ")")
         self.sumoCmd = sumoCmd
         self.setUpTuple = setUpTuple
         self.maxGreenPhaseTime = maxGreenPhaseTime
         self.maxYellowPhaseTime = maxYellowPhaseTime
         self.maxSimulationTime = maxSimulationTime
-
-
-    # CONTAINS MAIN TRACI SIMULATION LOOP
-    def run(self):
-        traci.start(self.sumoCmd)   # Start SUMO. Comment out if running Driver as standalone module.
+        self.featureMode = featureMode          # How intersection features are read from the simulation (one of featureModes)
+        self.intersectionFeatures = None    # Per traffic light snapshot of the current simulation step, shared by all predicates and rewards; None until built for the step
+        self.laneIndex = self.buildLaneIndex(setUpTuple[1])    # Lane -> (traffic light controlling it, movement of its vehicles)
+        self.timings = TimingStats()        # Time spent in each phase of the last run: stepping, stateAcquisition, userDefinedRules, ruleMatching, ruleSelection, weightUpdates and phaseApplication
+            # Without a session, SUMO is started and closed for every run
+        if session is None:
+            session = SimulationSession(sumoCmd, label, port, False, backend)
+        self.session = session
+        self.sim = session.getBackend()     # Simulator backend all simulation calls go through
+        self.callAccounting = None          # Counts of the simulator calls of the last run, by API function and Driver method; None unless accountCalls
+        if accountCalls:
+            self.callAccounting = self.sim = AccountingBackend(self.sim, __file__)
+        self.simRunTime = 0                 # Simulated time (s) of the last run
+
+
+    # CONTAINS MAIN TRACI SIMULATION LOOP; assignedIndividuals OPTIONALLY MAPS TL NAMES TO THE INDIVIDUALS THEY MUST USE AND episode OPTIONALLY NUMBERS THE EPISODE'S RANDOM STREAMS
+    def run(self, assignedIndividuals=None, episode=None):
+        self.session.startEpisode()     # Start SUMO or reload the scenario. Comment out if running Driver as standalone module.
 
             # Run set-up script and acquire list of user defined rules and traffic light agents in simulation
         userDefinedRules = self.setUpTuple[0]
         trafficLights = self.setUpTuple[1]
         rule = None 
         nextRule = None
+        self.timings = TimingStats()
+        if self.callAccounting is not None:
+            self.callAccounting.reset()
+
+        self.subscribeToIntersections(trafficLights)    # Have SUMO return the state of every intersection with each simulation step
 
             # Assign each traffic light an individual from their agent pool for this simulation run, and a starting rule
         for tl in trafficLights:
-            tl.assignIndividual()
+            if assignedIndividuals is None:
+                tl.assignIndividual()
+            else:
+                tl.assignIndividual(assignedIndividuals[tl.getName()])
+            if episode is not None:
+                tl.setRandomGenerator(RandomStreams.createGenerator("trafficLight_" + tl.getName(), episode))  # Rules are chosen the same way in an episode whichever process runs it
 
+            start = timeit.default_timer()
+            self.getIntersectionFeatures(tl)
+            self.timings.record("stateAcquisition", timeit.default_timer() - start)
+
+            start = timeit.default_timer()
             rule = self.applicableUserDefinedRule(tl, userDefinedRules) # Check user-defined rules
+            self.timings.record("userDefinedRules", timeit.default_timer() - start)
                 
                 # If no user-defined rules can be applied, get a rule from Agent Pool
             if rule == False:    
+                start = timeit.default_timer()
                 validRules = self.getValidRules(tl, tl.getAssignedIndividual())
-                rule = tl.getNextRule(validRules[0], validRules[1], traci.simulation.getTime()) # Get a rule from assigned Individual
+                self.timings.record("ruleMatching", timeit.default_timer() - start)
+                start = timeit.default_timer()
+                rule = tl.getNextRule(validRules[0], validRules[1], self.getSimulationTime()) # Get a rule from assigned Individual
+                self.timings.record("ruleSelection", timeit.default_timer() - start)
                     
                     # if no valid rule applicable, apply the Do Nothing rule.
                 if rule == -1:
@@ -58,33 +122,49 @@ class Driver:
                 else:       
                         # If rule conditions are satisfied, apply its action. Otherwise, do nothing.
                     if not rule.hasDoNothingAction():
-                        traci.trafficlight.setPhase(tl.getName(), rule.getAction())                
+                        start = timeit.default_timer()
+                        self.sim.trafficlight.setPhase(tl.getName(), rule.getAction())                
+                        self.timings.record("phaseApplication", timeit.default_timer() - start)
             else:
-                self.applyUserDefinedRuleAction(tl, traci.trafficlight.getPhaseName(tl.getName()), rule)
+                start = timeit.default_timer()
+                self.applyUserDefinedRuleAction(tl, self.getTrafficLightData(tl)[tc.TL_CURRENT_PHASE], rule)
+                self.timings.record("phaseApplication", timeit.default_timer() - start)
 
             tl.setCurrentRule(rule) # Set current rule in traffic light
 
             # Simulation loop 
-        step = 0
-            # Variables for rule rewards
-        carsWaitingBefore = {}
-        carsWaitingAfter = {}
-        while traci.simulation.getMinExpectedNumber() > 0 and traci.simulation.getTime() < self.maxSimulationTime:
-            traci.simulationStep() # Advance SUMO simulation one step (1 second)
-
-                # Traffic Light agents reevaluate their state every 5 seconds
-            if step % 5 == 0:  
-                    # For every traffic light in simulation, select and evaluate new rule from its agent pool
-                for tl in trafficLights:
-                    carsWaitingBefore = tl.getCarsWaiting()
-                    carsWaitingAfter = self.carsWaiting(tl) 
+        nextDecisionTimes = {tl: self.getSimulationTime() + 1 for tl in trafficLights}     # Traffic lights first reevaluate their state after one step
+        while self.getMinExpectedNumber() > 0 and self.getSimulationTime() < self.maxSimulationTime:
+                # Advance SUMO straight to the next time a traffic light decides, in one call, since nothing is done between decisions
+            start = timeit.default_timer()
+            self.sim.simulationStep(min(min(nextDecisionTimes.values()), self.maxSimulationTime))
+            self.timings.record("stepping", timeit.default_timer() - start)
+            self.invalidateIntersectionFeatures()   # Snapshots from the last step no longer describe the intersections
+            simTime = self.getSimulationTime()
+
+                # Traffic Light agents reevaluate their state every decision interval (5 seconds by default)
+            for tl in trafficLights:
+                if simTime >= nextDecisionTimes[tl]:
+                    nextDecisionTimes[tl] += tl.getDecisionInterval()
+
+                        # Select and evaluate new rule from the traffic light's agent pool
+                    start = timeit.default_timer()
+                    tl.updateCarsWaiting(self.carsWaiting(tl))     # Count the cars that went through since the last decision, for rule rewards
+                    queue = tl.getQueueTracker()
+                    self.timings.record("stateAcquisition", timeit.default_timer() - start)
                     
+                    start = timeit.default_timer()
                     nextRule = self.applicableUserDefinedRule(tl, userDefinedRules) # Check if a user-defined rule can be applied
+                    self.timings.record("userDefinedRules", timeit.default_timer() - start)
                     
                         # If no user-defined rules can be applied, get a rule from Agent Pool
                     if nextRule == False:    
+                        start = timeit.default_timer()
                         validRules = self.getValidRules(tl, tl.getAssignedIndividual())
-                        nextRule = tl.getNextRule(validRules[0], validRules[1], traci.simulation.getTime()) # Get a rule from assigned Individual
+                        self.timings.record("ruleMatching", timeit.default_timer() - start)
+                        start = timeit.default_timer()
+                        nextRule = tl.getNextRule(validRules[0], validRules[1], self.getSimulationTime()) # Get a rule from assigned Individual
+                        self.timings.record("ruleSelection", timeit.default_timer() - start)
 
                             # if no valid rule applicable, apply the Do Nothing rule.
                         if nextRule == -1:
@@ -98,100 +178,161 @@ class Driver:
                                 # If applied rule isn't user-defined, update its weight
                             if oldRule not in userDefinedRules:
                                 if oldRule != -1:
+                                    start = timeit.default_timer()
                                     ruleWeightBefore = oldRule.getWeight()   # Used to calculate fitness penalty to individual
-                                    oldRule.updateWeight(ReinforcementLearner.updatedWeight(oldRule, nextRule, self.getThroughputRatio(self.getThroughput(tl, carsWaitingBefore, carsWaitingAfter), len(carsWaitingBefore)), self.getWaitTimeReducedRatio(self.getThroughputWaitingTime(tl, carsWaitingBefore, carsWaitingAfter), self.getTotalWaitingTime(carsWaitingBefore)), len(carsWaitingAfter) - len(carsWaitingBefore)))
+                                    oldRule.updateWeight(ReinforcementLearner.updatedWeight(oldRule, nextRule, self.getThroughputRatio(self.getThroughput(tl), queue.getNumCarsWaitingBefore()), self.getWaitTimeReducedRatio(self.getThroughputWaitingTime(tl), queue.getTotalWaitingTimeBefore()), queue.getQueueDelta()))
                                     tl.getAssignedIndividual().updateFitnessPenalty(True, oldRule.getWeight() > ruleWeightBefore)
-                                    print("Old weight was", ruleWeightBefore, "and new weight is", oldRule.getWeight())
+                                    self.timings.record("weightUpdates", timeit.default_timer() - start)
+                                    # print("Old weight was", ruleWeightBefore, "and new weight is", oldRule.getWeight())
                                     # Apply the next rule; if action is -1 then action is do nothing
                                 if not nextRule.hasDoNothingAction():
                                     # print('Next rule action is', nextRule.getAction())
-                                    traci.trafficlight.setPhase(tl.getName(), nextRule.getAction())
+                                    start = timeit.default_timer()
+                                    self.sim.trafficlight.setPhase(tl.getName(), nextRule.getAction())
+                                    self.timings.record("phaseApplication", timeit.default_timer() - start)
                                 
-                                if nextRule.getType() == 0:
-                                    print("Applying TL action from RS! Action is", nextRule.getAction(), "\n\n")                
-                                else:
-                                    print("Applying TL action from RSint! Action is", nextRule.getAction(), "\n\n")                
+                                # if nextRule.getType() == 0:
+                                #     print("Applying TL action from RS! Action is", nextRule.getAction(), "\n\n")                
+                                # else:
+                                #     print("Applying TL action from RSint! Action is", nextRule.getAction(), "\n\n")                
 
                     else:
-                        self.applyUserDefinedRuleAction(tl, traci.trafficlight.getPhaseName(tl.getName()), nextRule)
+                        start = timeit.default_timer()
+                        self.applyUserDefinedRuleAction(tl, self.getTrafficLightData(tl)[tc.TL_CURRENT_PHASE], nextRule)
+                        self.timings.record("phaseApplication", timeit.default_timer() - start)
                         # # print("Applying action of", nextRule.getConditions())  
 
                     tl.setCurrentRule(nextRule)                 # Update the currently applied rule in the traffic light
-                    tl.updateCarsWaiting(carsWaitingAfter)      # Set the number of cars waiting count within the TL itself
-
-            step += 1  # Increment step in line with simulator
             
             # Update the fitnesses of the individuals involved in the simulation based on their fitnesses
-        simRunTime = traci.simulation.getTime()
-        print("***SIMULATION TIME:", simRunTime, "\n\n")
+        simRunTime = self.getSimulationTime()
+        self.simRunTime = simRunTime
+        # print("***SIMULATION TIME:", simRunTime, "\n\n")
         for tl in trafficLights:
             # # print(tl.getName(), "has these communicated intentions:", tl.getCommunicatedIntentions())
             i = tl.getAssignedIndividual()
             i.updateLastRunTime(simRunTime)
-            print("Individual", i, "has a last runtime of", i.getLastRunTime())
+            # print("Individual", i, "has a last runtime of", i.getLastRunTime())
             i.updateFitness(EvolutionaryLearner.rFit(i, simRunTime, i.getAggregateVehicleWaitTime()))
 
-        traci.close()       # End simulation
+        self.session.endEpisode()       # End simulation
         
         return self.setUpTuple[2] # Returns all the agent pools to the main module
         # sys.stdout.flush()
 
         
-    # RETRIEVE THE STATE OF THE INTERSECTION FROM SUMO
-    def getState(self, trafficLight):
-        state = {}
-        leftTurnLane = ""
-        for lane in trafficLight.getLanes():
-            state[lane] = []
-
-            # Loop to determine which vehicles are waiting at an intersection
-        for vehID in traci.vehicle.getIDList(): 
-            laneID = traci.vehicle.getLaneID(vehID)
-            tlLanes = trafficLight.getLanes()
-            
-            # Operate only on vehicles in a lane controlled by traffic light 
-            if laneID in tlLanes:
-                    # Determine left turn lane if it exists
-                if "_LTL" in laneID:
-                    maxLaneNum = 0
-                    for lane in tlLanes:
-                        if lane == laneID:
-                            laneSplit = lane.split("_")
-                            if int(laneSplit[2]) > maxLaneNum:
-                                leftTurnLane = lane
-                
-                    # If vehicle is stopped, append relevant identifier to it
-                if traci.vehicle.getSpeed(vehID) == 0:    
-                    if leftTurnLane == laneID:
-                        vehID = vehID + "_L"
+        # RETURNS THE TIME SPENT IN EACH PHASE OF THE LAST RUN
+    def getTimings(self):
+        return self.timings
+
+        # RETURNS THE SIMULATOR CALLS OF THE LAST RUN BY API FUNCTION AND DRIVER METHOD, WITH ROUND TRIPS PER SIMULATED SECOND AND PER DECISION; None IF CALLS ARE NOT ACCOUNTED FOR
+    def getCallRecord(self):
+        if self.callAccounting is None:
+            return None
+        decisions = self.timings.getCount("userDefinedRules")    # Every decision checks the user-defined rules once
+        return self.callAccounting.getRecord(self.simRunTime, decisions)
+
+        # SUBSCRIBE TO SIMULATION, TRAFFIC LIGHT AND NEARBY VEHICLE (OR LANE) DATA SO EACH SIMULATION STEP RETURNS THE STATE OF EVERY INTERSECTION IN ONE RESPONSE
+    def subscribeToIntersections(self, trafficLights):
+        self.sim.simulation.subscribe([tc.VAR_TIME, tc.VAR_MIN_EXPECTED_VEHICLES])
+        for tl in trafficLights:
+            if self.featureMode == "vehicles":
+                    # The context range must reach the far end of the longest lane controlled by the traffic light
+                contextRange = max(self.sim.lane.getLength(lane) for lane in tl.getLanes()) + contextRangeMargin
+                self.sim.junction.subscribeContext(tl.getName(), tc.CMD_GET_VEHICLE_VARIABLE, contextRange, vehicleSubscriptionVars)
+            else:
+                    # Lanes and detectors report their aggregates whatever the number of vehicles on them
+                for lane in tl.getLanes():
+                    if self.featureMode == "detectors":
+                        self.sim.lanearea.subscribe(InitSetUp.getDetectorID(lane), detectorSubscriptionVars)
+                        self.sim.lane.subscribe(lane, [tc.VAR_WAITING_TIME])
                     else:
-                        vehID = vehID + "_S"
-                
-                    state[laneID].append(vehID)
-                
-        return state
+                        self.sim.lane.subscribe(lane, laneSubscriptionVars)
+            self.sim.trafficlight.subscribe(tl.getName(), trafficLightSubscriptionVars)
+
+        # RETURNS THE CURRENT SIMULATION TIME FROM THE LAST SUBSCRIPTION RESPONSE
+    def getSimulationTime(self):
+        return self.sim.simulation.getSubscriptionResults()[tc.VAR_TIME]
+
+        # RETURNS THE NUMBER OF VEHICLES STILL RUNNING OR EXPECTED TO ENTER THE SIMULATION FROM THE LAST SUBSCRIPTION RESPONSE
+    def getMinExpectedNumber(self):
+        return self.sim.simulation.getSubscriptionResults()[tc.VAR_MIN_EXPECTED_VEHICLES]
+
+        # RETURNS A DICTIONARY OF SUBSCRIBED TRAFFIC LIGHT VARIABLES (PHASE INDEX, PHASE DURATION, NEXT SWITCH)
+    def getTrafficLightData(self, trafficLight):
+        return self.sim.trafficlight.getSubscriptionResults(trafficLight.getName())
+
+        # RETURNS A DICTIONARY OF VEHIDs NEAR AN INTERSECTION AND THEIR SUBSCRIBED VARIABLES
+    def getIntersectionVehicles(self, trafficLight):
+        return self.sim.junction.getContextSubscriptionResults(trafficLight.getName()) or {}
+
+        # RETURNS THE STATE SNAPSHOT OF AN INTERSECTION FOR THE CURRENT SIMULATION STEP; THE SNAPSHOTS OF ALL INTERSECTIONS ARE BUILT TOGETHER ON FIRST USE
+    def getIntersectionFeatures(self, trafficLight):
+        if self.intersectionFeatures is None:
+            self.intersectionFeatures = self.buildIntersectionFeatures(self.setUpTuple[1])
+
+        return self.intersectionFeatures[trafficLight.getName()]
+
+        # BUILD THE STATE SNAPSHOTS OF EVERY INTERSECTION WITH A SINGLE PASS OVER THE VEHICLES NEAR THEM (OR THEIR LANES); RETURNS A DICTIONARY OF TL NAMES AND THEIR SNAPSHOTS
+    def buildIntersectionFeatures(self, trafficLights):
+        time = self.getSimulationTime()
+        intersectionFeatures = {}
+        for tl in trafficLights:
+            intersectionFeatures[tl.getName()] = IntersectionFeatures(tl, time)
+
+        for tl in trafficLights:
+            if self.featureMode == "vehicles":
+                vehicles = self.getIntersectionVehicles(tl)
+                for vehID in vehicles:
+                    vehData = vehicles[vehID]
+                    laneEntry = self.laneIndex.get(vehData[tc.VAR_LANE_ID])
+                        # Only stopped vehicles in lanes controlled by a traffic light are considered waiting. A vehicle near several intersections is only counted by the one whose lane it is in
+                    if laneEntry is not None and laneEntry[0] is tl and vehData[tc.VAR_SPEED] == 0:
+                        intersectionFeatures[tl.getName()].addStoppedVehicle(vehID, laneEntry[1], vehData[tc.VAR_WAITING_TIME], vehData[tc.VAR_ACCUMULATED_WAITING_TIME])
+            else:
+                for lane in tl.getLanes():
+                    laneData = self.sim.lane.getSubscriptionResults(lane)
+                    if self.featureMode == "detectors":
+                        detectorData = self.sim.lanearea.getSubscriptionResults(InitSetUp.getDetectorID(lane))
+                        intersectionFeatures[tl.getName()].addLaneQueue(lane, self.laneIndex[lane][1], detectorData[tc.LAST_STEP_VEHICLE_HALTING_NUMBER], laneData[tc.VAR_WAITING_TIME], detectorData[tc.JAM_LENGTH_METERS])
+                    else:
+                        intersectionFeatures[tl.getName()].addLaneQueue(lane, self.laneIndex[lane][1], laneData[tc.LAST_STEP_VEHICLE_HALTING_NUMBER], laneData[tc.VAR_WAITING_TIME])
+
+            tlData = self.getTrafficLightData(tl)
+            intersectionFeatures[tl.getName()].setPhase(tlData[tc.TL_CURRENT_PHASE], tlData[tc.TL_PHASE_DURATION], tlData[tc.TL_PHASE_DURATION] - (tlData[tc.TL_NEXT_SWITCH] - time))
+
+        return intersectionFeatures
+
+        # DISCARD ALL INTERSECTION SNAPSHOTS; CALLED WHENEVER THE SIMULATION ADVANCES
+    def invalidateIntersectionFeatures(self):
+        self.intersectionFeatures = None
+
+        # RETURN A DICTIONARY OF EVERY LANE CONTROLLED BY A TRAFFIC LIGHT AND ITS (TRAFFIC LIGHT, MOVEMENT); MOVEMENT IS "L" FOR LEFT TURN LANES AND "S" OTHERWISE
+    def buildLaneIndex(self, trafficLights):
+        laneIndex = {}
+        for tl in trafficLights:
+            for lane in tl.getLanes():
+                if self.isLeftTurnLane(lane):
+                    laneIndex[lane] = (tl, "L")
+                else:
+                    laneIndex[lane] = (tl, "S")
+
+        return laneIndex
+
+        # RETURNS TRUE IF A LANE IS THE LEFT TURN LANE OF ITS EDGE (A NON-ZERO INDEXED LANE OF AN "_LTL" EDGE)
+    def isLeftTurnLane(self, laneID):
+        if "_LTL" in laneID:
+            laneSplit = laneID.split("_")
+            return int(laneSplit[2]) > 0
+        return False
 
         # RETURNS A DICTIONARY WITH KEYS OF VEHIDs WAITING AT AN INTERSECTION AND THEIR WAITING TIME AS VALUES
     def carsWaiting(self, trafficLight):
-        state = self.getState(trafficLight)
-        carsWaiting = {}
-            # Count all vehicles in the state dictionary
-        for lanes in state:
-            for veh in state[lanes]:
-                vehID = veh.split("_")
-                carsWaiting[vehID[0]] = traci.vehicle.getAccumulatedWaitingTime(vehID[0])
-        
-        return carsWaiting
+        return self.getIntersectionFeatures(trafficLight).getCarsWaiting()
 
         # RETURNS NUMBER OF CARS WAITING AT AN INTERSECTION
     def carsWaitingCount(self, trafficLight):
-        state = self.getState(trafficLight)
-        carsWaiting = 0
-            # Count all vehicles in the state dictionary
-        for lanes in state:
-            carsWaiting += len(state[lanes])
-        
-        return carsWaiting
+        return len(self.getIntersectionFeatures(trafficLight).getCarsWaiting())
         
         # RETURNS NORMALIZED THROUGHPUT BY DIVIDING THE THROUGHPUT BY THE TOTAL VEHICLES AT AN INTERSECTION 
     def getThroughputRatio(self, throughput, totalCarsWaiting):
@@ -200,30 +341,24 @@ class Driver:
         else:
             return throughput/totalCarsWaiting
     
-        # RETURNS THROUGHPUT OF AN INTERSECTION BASED ON VEHICLES WAITING BEFORE AND AFTER A GIVEN TIME
-    def getThroughput(self, trafficLight, carsWaitingBefore, carsWaitingAfter):
-        if not carsWaitingBefore:
-            return 0
-        elif not carsWaitingAfter:
-            return len(carsWaitingBefore)
-        else:
-            carsThrough = { k : carsWaitingBefore[k] for k in set(carsWaitingBefore) - set(carsWaitingAfter) }
-            return len(carsThrough)
+        # RETURNS THROUGHPUT OF AN INTERSECTION: THE CARS THAT WENT THROUGH BETWEEN ITS LAST TWO DECISIONS
+    def getThroughput(self, trafficLight):
+        return trafficLight.getQueueTracker().getThroughput()
 
-        # RETURNS THE AGGREGATE WAITING TIME OF CARS THAT HAVE GONE THROUGH THE INTERSECTION AT A GIVEN TIME
-    def getThroughputWaitingTime(self, trafficLight, carsWaitingBefore, carsWaitingAfter):
-        carsThrough = { k : carsWaitingBefore[k] for k in set(carsWaitingBefore) - set(carsWaitingAfter) }
+        # RETURNS THE AGGREGATE WAITING TIME OF CARS THAT WENT THROUGH THE INTERSECTION BETWEEN ITS LAST TWO DECISIONS
+    def getThroughputWaitingTime(self, trafficLight):
+        throughputWaitingTime = trafficLight.getQueueTracker().getThroughputWaitingTime()
             
             # Update the relevant individual's aggregate vehicle wait time and return the throughput waiting time
-        trafficLight.getAssignedIndividual().updateAggregateVehicleWaitTime(sum(carsThrough.values()))
-        return sum(carsThrough.values())        
+        trafficLight.getAssignedIndividual().updateAggregateVehicleWaitTime(throughputWaitingTime)
+        return throughputWaitingTime
         
         # RETURNS TOTAL WAIT TIME AT AN INTERSECTION AT A GIVEN TIME
     def getWaitingTime(self, trafficLight):
         waitTime = 0
             # Sum waiting time of each edge controlled by the traffic light
         for edge in trafficLight.getEdges():
-            waitTime += traci.edge.getWaitingTime(edge)
+            waitTime += self.sim.edge.getWaitingTime(edge)
         
         return waitTime
 
@@ -249,8 +384,9 @@ class Driver:
                 validRS.append(rule)
             
             # Find valid RSint rules
+        intentionFeatures = self.getIntentionFeatures(trafficLight)
         for rule in individual.getRSint():
-            if self.evaluateCoopRule(trafficLight, rule):
+            if self.evaluateCoopRule(trafficLight, rule, intentionFeatures):
                 validRSint.append(rule)
 
         return (validRS, validRSint)
@@ -258,46 +394,35 @@ class Driver:
         # EVALUATE RULE VALIDITY (fEval)
     def evaluateRule(self, trafficLight, rule):
         if rule.getType() == 1:
-            return evaluateCoopRule(trafficLight, rule)
+            return self.evaluateCoopRule(trafficLight, rule)
 
-            # For each condition, its parameters are acquired and the condition predicate is evaluated
-        for cond in rule.getConditions():
-            predicateSplit = cond.split("_")
-            predicate = predicateSplit[0]
-
-            predCall = getattr(PredicateSet, cond)(self.getPredicateParameters(trafficLight, predicate)) # Construct predicate fuction call
-                # Determine validity of predicate
-            if predCall == False:
-                return False
-        
-        return True # if all predicates return true, evaluate rule as True
+            # Each condition is compiled once into an interval over an intersection feature
+        return PredicateEngine.evaluateConditions(rule.getConditions(), self.getIntersectionFeatures(trafficLight).getFeatureValues())
 
         # EVALUATE RULE VALIDITY (fEval)
-    def evaluateCoopRule(self, trafficLight, rule):
+    def evaluateCoopRule(self, trafficLight, rule, intentionFeatures=None):
         if rule.getType() == 0:
             return self.evaluateRule(trafficLight, rule)
-            
-        intentions = trafficLight.getCommunicatedIntentions()   
-
-        for x in intentions:
-            for i in intentions[x]:
-                    # For each condition, its parameters are acquired and the condition predicate is evaluated
-                for cond in rule.getConditions():
-                    predicateSplit = cond.split("_")
-                    predicate = predicateSplit[0]
-                    
-                    parameters = self.getCoopPredicateParameters(trafficLight, predicate, i)
-                    # # print("Parameters are:", parameters)
-                    if isinstance(parameters, int) or isinstance(parameters, float) or isinstance(parameters, str):
-                        predCall = getattr(CoopPredicateSet, cond)(parameters) # Construct predicate fuction call
-                    else:
-                        predCall = getattr(CoopPredicateSet, "customPredicate")(parameters[0], parameters[1]) # Construct predicate fuction call for custom predicates (they are of form TLname_action but are handled by the same predicate in CoopPredicateSet)
-                        # Determine validity of predicate
-                    if predCall == False:
-                        return False
+
+        if intentionFeatures is None:
+            intentionFeatures = self.getIntentionFeatures(trafficLight)
+
+            # Every condition must hold for every communicated intention
+        for featureValues in intentionFeatures:
+            if not PredicateEngine.evaluateConditions(rule.getConditions(), featureValues, PredicateEngine.compileCoopCondition):
+                return False
 
         return True # if all predicates return true, evaluate rule as True
 
+        # RETURNS THE FEATURE VALUES OF EVERY INTENTION COMMUNICATED TO A TRAFFIC LIGHT
+    def getIntentionFeatures(self, trafficLight):
+        time = self.getSimulationTime()
+        intentionFeatures = []
+        for i in trafficLight.getCommunicatedIntentions(time):
+            intentionFeatures.append(PredicateEngine.getIntentionFeatureValues(i, time))
+
+        return intentionFeatures
+
         # DETERMINE IF ANY USER DEFINED RULES ARE APPLICABLE
     def applicableUserDefinedRule(self, trafficLight, userDefinedRules):    
             # Evaluate each user define rule
@@ -316,125 +441,46 @@ class Driver:
                     return rule
         return False # if no user-defined predicates are applicable, return False
 
-        # APPLIES USER DEFINED ACTIONS
-    def applyUserDefinedRuleAction(self, trafficLight, currPhaseName, rule):
+        # APPLIES USER DEFINED ACTIONS; TRANSITIONS ARE LOOKED UP IN THE TRAFFIC LIGHT'S PHASE TABLE
+    def applyUserDefinedRuleAction(self, trafficLight, currPhaseIndex, rule):
             # If max green phase time reached, switch phase to yellow in same direction
         if rule.getConditions()[0] == "maxGreenPhaseTimeReached":
-            currPhase = traci.trafficlight.getPhaseName(trafficLight.getName())
-            currPhase[5] = "Y"
-            traci.trafficlight.setPhase(trafficLight.getName(), currPhase)
+            self.sim.trafficlight.setPhase(trafficLight.getName(), trafficLight.getPhaseTable().getNextYellow(currPhaseIndex))
             
             # If max yellow phase time reached, switch to next phase in the schedule 
         elif rule.getConditions()[0] == "maxYellowPhaseTimeReached":
-            if traci.trafficlight.getPhase(trafficLight.getName()) >= (len(trafficLight.getPhases()) - 2):
-                traci.trafficlight.setPhase(trafficLight.getName(), 0)
-            else:
-                traci.trafficlight.setPhase(trafficLight.getName(), traci.trafficlight.getPhase(trafficLight.getName()) + 1)
+            self.sim.trafficlight.setPhase(trafficLight.getName(), trafficLight.getPhaseTable().getNextPhase(currPhaseIndex))
 
         # PROVIDE SIMULATION RELEVANT PARAMETERS
     def getPredicateParameters(self, trafficLight, predicate):
+        features = self.getIntersectionFeatures(trafficLight) # Retrieve state of specified intersection
+
         if predicate == "longestTimeWaitedToProceedStraight":
-                # Find max wait time for relevant intersection
-            maxWaitTime = 0
-            state = self.getState(trafficLight) # Retrieve state of specified intersection 
-            for lane in state:
-                if lane in trafficLight.getLanes():
-                    for veh in state[lane]:
-                        if "_S" in veh:
-                            vehIDSplit = veh.split("_")
-                            vehID  = vehIDSplit[0]
-                            if traci.vehicle.getWaitingTime(vehID) > maxWaitTime:
-                                maxWaitTime = traci.vehicle.getWaitingTime(vehID)
-            return maxWaitTime
+            return features.getLongestTimeWaitedToProceedStraight()
 
         elif predicate == "longestTimeWaitedToTurnLeft":
-                # Find max wait time for relevant intersection
-            maxWaitTime = 0
-            state = self.getState(trafficLight) # Retrieve state of specified intersection 
-            for lane in state:
-                if lane in trafficLight.getLanes():
-                    for veh in state[lane]:
-                        if "_L" in veh:
-                            vehIDSplit = veh.split("_")
-                            vehID  = vehIDSplit[0]
-                            if traci.vehicle.getWaitingTime(vehID) > maxWaitTime:
-                                maxWaitTime = traci.vehicle.getWaitingTime(vehID)
-            return maxWaitTime
+            return features.getLongestTimeWaitedToTurnLeft()
 
         elif predicate == "numCarsWaitingToProceedStraight":
-            carsWaiting = 0
-            state = self.getState(trafficLight) # Retrieve state of specified intersection 
-            for lane in state:
-                if lane in trafficLight.getLanes():
-                    for veh in state[lane]:
-                        if "_S" in veh:
-                            vehIDSplit = veh.split("_")
-                            vehID  = vehIDSplit[0]
-                            if traci.vehicle.getWaitingTime(vehID) > 0:
-                                carsWaiting += 1
-
-            return carsWaiting
+            return features.getNumCarsWaitingToProceedStraight()
 
         elif predicate == "numCarsWaitingToTurnLeft":
-            carsWaiting = 0
-            state = self.getState(trafficLight) # Retrieve state of specified intersection 
-            for lane in state:
-                if lane in trafficLight.getLanes():
-                    for veh in state[lane]:
-                        if "_L" in veh:
-                            vehIDSplit = veh.split("_")
-                            vehID  = vehIDSplit[0]
-                            if traci.vehicle.getWaitingTime(vehID) > 0:
-                                carsWaiting += 1
-
-            return carsWaiting
+            return features.getNumCarsWaitingToTurnLeft()
         
         elif predicate == "timeSpentInCurrentPhase":
-            return traci.trafficlight.getPhaseDuration(trafficLight.getName())
+            return features.getPhaseDuration()
         
         elif "verticalPhaseIs" in predicate or "horizontalPhaseIs" in predicate or "northSouthPhaseIs" in predicate or "southNorthPhaseIs" in predicate or "eastWestPhaseIs" in predicate or "westEastPhaseIs" in predicate:
-            return traci.trafficlight.getPhaseName(trafficLight.getName()).split("_")
+            return features.getPhaseNameSplit()
 
         elif "maxGreenPhaseTimeReached" == predicate:
-            parameters = []
-            parameters.append(traci.trafficlight.getPhaseName(trafficLight.getName()))
-            
-                # Get phase (G or Y) from phase name
-            getPhase = parameters[0].split("_")
-            parameters[0] = getPhase[2]
-            
-            parameters.append(traci.trafficlight.getPhaseDuration(trafficLight.getName()) - (traci.trafficlight.getNextSwitch(trafficLight.getName()) - traci.simulation.getTime()))
-            parameters.append(self.maxGreenPhaseTime)
-
-            return parameters
+                # Phase colour (G or Y), time spent in the phase so far and the maximum allowed time
+            return [features.getPhaseColour(), features.getTimeInPhase(), self.maxGreenPhaseTime]
         
         elif "maxYellowPhaseTimeReached" == predicate:
-            parameters = []  
-            parameters.append(traci.trafficlight.getPhaseName(trafficLight.getName())) # Get traffic light phase name
-                
-                # Get phase (G or Y) from phase name
-            getPhase = parameters[0].split("_")
-            parameters[0] = getPhase[2]
-            
-            parameters.append(traci.trafficlight.getPhaseDuration(trafficLight.getName()) - (traci.trafficlight.getNextSwitch(trafficLight.getName()) - traci.simulation.getTime()))
-            parameters.append(self.maxYellowPhaseTime)
-
-            return parameters 
+            return [features.getPhaseColour(), features.getTimeInPhase(), self.maxYellowPhaseTime]
         
-        # PROVIDE SIMULATION RELEVANT PARAMETERS
-    def getCoopPredicateParameters(self, trafficLight, predicate, intention):        
-        if "timeSinceCommunication" == predicate:
-            timeSent = intention.getTime()            
-            return traci.simulation.getTime() - timeSent
-        
-        elif "intendedActionIs" == predicate:
-            return intention.getAction()
-        
-        else:       # equivalent to: elif "customPredicate" == predicate:
-            # print("The current traffic light is", trafficLight.getName(), "with predicate", predicate, "and an intention from", intention.getTrafficLight(), "to do action", intention.getAction())
-            return (str(intention.getTrafficLight().getName()) + "_" + str(intention.getAction()), intention)
 
-        
 # main entry point
 if __name__ == "__main__":
 
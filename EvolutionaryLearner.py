@@ -2,13 +2,10 @@ import os
 import sys
 import PredicateSet as PredicateSet
 import CoopPredicateSet as CoopPredicateSet
-import numpy.random as npr
-import random
+import PredicateRegistry
 
 from Rule import Rule
 from Individual import Individual
-from random import randrange
-from random import randint
 
     #  EVOLUTIONARY LEARNER ALGORITHM
 # class EvolutionaryLearner:
@@ -80,6 +77,7 @@ def fit(simTime, agentPools):
 def createNewGeneration(agentPools):
     print("Creating a new Generation.")
     for ap in agentPools:
+        randomGenerator = ap.getRandomGenerator()   # Each agent pool breeds from its own stream
         individuals = ap.getIndividualsSet()
         individuals.sort(key=lambda x: x.getFitness(), reverse = False)
         #individuals.len() # An error trip for the program to stop for testing
@@ -90,13 +88,13 @@ def createNewGeneration(agentPools):
 
             # Create however many children possible to also leave room for max number of mutations
         for x in range((maxIndividuals-numOfSurvivingIndividuals)-numOfIndividualsToMutate):
-            parent1 = chooseFirstParent(newGeneration)
-            parent2 = chooseSecondParent(newGeneration, parent1)
+            parent1 = chooseFirstParent(newGeneration, randomGenerator)
+            parent2 = chooseSecondParent(newGeneration, parent1, randomGenerator)
             newGeneration.append(crossover(parent1, parent2))
 
             # Randomly mutate a random number of the children
         for i in range(numOfIndividualsToMutate):
-            individualToMutate = newGeneration[randrange(0, len(newGeneration))]
+            individualToMutate = newGeneration[randomGenerator.integers(len(newGeneration))]
             # Simulate deepcopy() without using deepcopy() because it is slooooow and mutate copied Individual
             newGeneration.append(mutate(Individual(individualToMutate.getID(), individualToMutate.getAgentPool(), individualToMutate.getRS(), individualToMutate.getRSint())))
         
@@ -153,25 +151,26 @@ def initIndividuals(agentPool):
     # CREATE A RANDOM RULE USING RANDOM PREDICATES AND AN AGENT POOL RELATED ACTION
 def createRandomRule(agentPool, ruleType):
     conditions = [] # Conditions for a rule
+    randomGenerator = agentPool.getRandomGenerator()
 
         # RS rule
     if ruleType == 0:
             # Set conditions of rules as a random amount of random predicates
-        for i in range(randint(1, maxRulePredicates)):
-            newCond = PredicateSet.getRandomPredicate()
+        for i in range(randomGenerator.integers(1, maxRulePredicates + 1)):
+            newCond = PredicateRegistry.getRandomRSPredicate(randomGenerator)
             if checkValidCond(newCond, conditions):
                 conditions.append(newCond)
 
         # RSint rule
     elif ruleType == 1:
             # Set conditions of rules as a random amount of random predicates
-        for i in range(randint(1, maxRulePredicates)):
+        for i in range(randomGenerator.integers(1, maxRulePredicates + 1)):
             newCond = agentPool.getRandomRSintPredicate()
             if checkValidCond(newCond, conditions):
                 conditions.append(newCond)
 
         # Get index of possible action. SUMO changes phases on indexes
-    action = randrange(0, len(agentPool.getActionSet()))     # Set rule action to a random action from ActionSet pertaining to Agent Pool being serviced
+    action = int(randomGenerator.integers(len(agentPool.getActionSet())))     # Set rule action to a random action from ActionSet pertaining to Agent Pool being serviced
     #print("The action set is:", agentPool.getActionSet())
     rule = Rule(ruleType, conditions, action, agentPool)
 
@@ -207,49 +206,19 @@ def crossover(indiv1, indiv2):
     #     print("Rule", counter, "contains conditions", rule.getConditions(), "and action", rule.getAction(), "\n\n")
     #     counter += 1
 
-        # Ensure duplicate rules (with or without different weights) haven't been added to rule set. If they have, keep the one with the higher weight and mutate the other
-    for rule in newRS:
-        for r in newRS:
-            if rule is not r:
-                while set(rule.getConditions()) == set(r.getConditions()) and rule.getAction() == r.getAction():
-                    if rule.getWeight() < r.getWeight():
-                        # print("rule has less weight than r")
-                        newRS.append(mutateRule(rule))
-                        newRS.remove(rule)
-                    else:
-                        newRule = mutateRule(r)
-                        newRS.append(mutateRule(r))
-                        newRS.remove(r)
-
-        # Ensure the same rule with different weights haven't been added to rule set. If they have, keep the one with the higher weight and mutate the other
-    for rule in newRSint:
-        for r in newRSint:
-            if rule is not r:
-                while set(rule.getConditions()) == set(r.getConditions()) and rule.getAction() == r.getAction():
-                    if rule.getWeight() < r.getWeight():
-                        # print("rule has less weight than r")
-                        newRS.append(mutateRule(rule))
-                        newRS.remove(rule)
-                    else:
-                        newRule = mutateRule(r)
-                        newRS.append(mutateRule(r))
-                        newRS.remove(r)
+        # Ensure duplicate rules (with or without different weights) haven't been added to rule sets. If they have, keep the one with the higher weight and mutate the other
+    mutateDuplicateRules(newRS)
+    mutateDuplicateRules(newRSint)
 
         # Both while loops below ensure the rule sets are not identical
     while ruleSetsAreDuplicate(newRS, indiv1.getRS()) or ruleSetsAreDuplicate(newRS, indiv2.getRS()):
         newRS.sort(key=lambda x: x.getWeight(), reverse = True)
-        ruleToMutate = newRS[len(newRS)-1]
-        newRS.append(mutateRule(ruleToMutate))
-        newRS.remove(newRS[len(newRS)-2])
+        newRS[len(newRS)-1] = mutateRuleCopy(newRS[len(newRS)-1])
 
     while ruleSetsAreDuplicate(newRSint, indiv1.getRSint()) or ruleSetsAreDuplicate(newRSint, indiv2.getRSint()):
-        # print("Indiv 1 compare is", ruleSetsAreDuplicate(newRSint, indiv1.getRSint()))
-        # print('Indiv 2 compare is', ruleSetsAreDuplicate(newRSint, indiv2.getRSint()))
         # print("Rule set RSint is the same as parent's RSint")
         newRSint.sort(key=lambda x: x.getWeight(), reverse = True)
-        ruleToMutate = newRS[len(newRSint)-1]
-        newRSint.append(mutateRule(ruleToMutate))
-        newRSint.remove(newRSint[len(newRSint)-2])
+        newRSint[len(newRSint)-1] = mutateRuleCopy(newRSint[len(newRSint)-1])
 
     newIndividual = Individual(identifier, agentPool, newRS, newRSint)
 
@@ -264,7 +233,7 @@ def crossover(indiv1, indiv2):
     return newIndividual
 
 def mutate(individual):
-    chosenRule = individual.getRS()[randrange(0,len(individual.getRS()))]
+    chosenRule = individual.getRS()[individual.getAgentPool().getRandomGenerator().integers(len(individual.getRS()))]
     newRule = mutateRule(chosenRule)
 
     if newRule.getType() == 0:
@@ -279,29 +248,30 @@ def mutate(individual):
     # MUTATES A RULE A RANDOM NUMBER OF TIMES (MAX MUTATIONS IS USER-DEFINED)
 def mutateRule(rule):
     ruleCond = rule.getConditions()
+    randomGenerator = rule.getAgentPool().getRandomGenerator()
     #print("*Rule to be mutated has conditions:", rule.getConditions())
     #print('Mutating...')
         # Remove a random number of conditions and add a random number of random conditions
-    for x in range(randint(1, maxNumOfMutations)):
+    for x in range(randomGenerator.integers(1, maxNumOfMutations + 1)):
 
         if len(ruleCond) == 1:
             numCondToRemove = 1
         else:
-            numCondToRemove = randrange(1, len(ruleCond))
+            numCondToRemove = randomGenerator.integers(1, len(ruleCond))
 
         for i in range(numCondToRemove):
             # print("Rule is of type", rule.getType(), "conds were", ruleCond)
-            ruleCond.remove(ruleCond[randrange(len(ruleCond))])
+            ruleCond.remove(ruleCond[randomGenerator.integers(len(ruleCond))])
             # print("Rule conds are NOW:", ruleCond)
             # #print("*Rule to be mutated has conditions:", rule.getConditions())
 
-        numCondToAdd = randint(1, maxRulePredicates - len(ruleCond))
+        numCondToAdd = randomGenerator.integers(1, maxRulePredicates - len(ruleCond) + 1)
         #print("Num conds to add are", numCondToAdd)
             # If rule is from RS
         if rule.getType() == 0:
             #print("Adding conds to type 0")
             for i in range(numCondToAdd):
-                newPredicate = PredicateSet.getRandomPredicate()
+                newPredicate = PredicateRegistry.getRandomRSPredicate(randomGenerator)
                 #print("New predicate being added is:", newPredicate)
                     # If new random predicate is valid, append it to the conditions list
                 if checkValidCond(newPredicate, ruleCond):
@@ -312,36 +282,36 @@ def mutateRule(rule):
             # If rule is from RSint
         elif rule.getType() == 1:
             for i in range(numCondToAdd):
-                newPredicate = CoopPredicateSet.getRandomPredicate(rule.getAgentPool())
+                newPredicate = PredicateRegistry.getRandomCoopPredicate(rule.getAgentPool(), randomGenerator)
                     # If new random predicate is valid, append it to the conditions list
                 if checkValidCond(newPredicate, ruleCond):
                     ruleCond.append(newPredicate)
 
     rule.setConditions(ruleCond) # set rule's new conditions
-    rule.setAction(rule.getAgentPool().getActionSet()[randrange(0, len(rule.getAgentPool().getActionSet()))])
+    rule.setAction(rule.getAgentPool().getActionSet()[randomGenerator.integers(len(rule.getAgentPool().getActionSet()))])
     rule.setWeight(0)
 
     return rule
 
     # RETURNS A PARENT TO BE BREED BASED ON FITNESS PROPOTIONAL SELECTION
-def chooseFirstParent(breedingPopulation):
+def chooseFirstParent(breedingPopulation, randomGenerator):
     totalFitness = sum([i.getNormalizedFitness() for i in breedingPopulation]) # Adjust fitnesses to benefit the smallest
     if totalFitness != 0:
         selection_probs = [i.getNormalizedFitness()/totalFitness for i in breedingPopulation]
-        return breedingPopulation[npr.choice(len(breedingPopulation), p=selection_probs)]
+        return breedingPopulation[randomGenerator.choice(len(breedingPopulation), p=selection_probs)]
     else:
-        return random.choice(breedingPopulation)
+        return breedingPopulation[randomGenerator.integers(len(breedingPopulation))]
 
     # RETURNS A PARENT TO BE BREED BASED ON FITNESS PROPOTIONAL SELECTION
-def chooseSecondParent(breedingPopulation, parent1):
+def chooseSecondParent(breedingPopulation, parent1, randomGenerator):
     adjustedPopulation = breedingPopulation.copy()
     adjustedPopulation.remove(parent1)
     totalFitness = sum([i.getNormalizedFitness() for i in adjustedPopulation])
     if totalFitness != 0:
         selection_probs = [i.getNormalizedFitness()/totalFitness for i in adjustedPopulation]
-        return adjustedPopulation[npr.choice(len(adjustedPopulation), p=selection_probs)]
+        return adjustedPopulation[randomGenerator.choice(len(adjustedPopulation), p=selection_probs)]
     else:
-        return random.choice(breedingPopulation)
+        return breedingPopulation[randomGenerator.integers(len(breedingPopulation))]
 
 
     # ENSURE UNIQUE PREDICATE TYPES IN CONDITIONS
@@ -354,29 +324,36 @@ def checkValidCond(cond, conditions):
     else:
         return True
 
+    # RETURN A RULE SET WITHOUT DUPLICATE RULES, KEEPING THE DUPLICATE WITH THE HIGHEST WEIGHT IN PLACE OF THE FIRST ONE
 def removeDuplicateRules(ruleSet):
+    uniqueRules = {}
     for rule in ruleSet:
-        for otherRule in ruleSet:
-            if rulesAreDuplicate(rule, otherRule):
-                ruleSet.remove(otherRule)
-    return ruleSet
+        key = rule.getKey()
+        if key not in uniqueRules or rule.getWeight() > uniqueRules[key].getWeight():
+            uniqueRules[key] = rule
+    return list(uniqueRules.values())
+
+    # MUTATE THE LOWER WEIGHTED RULES OF A RULE SET UNTIL NO TWO RULES ARE DUPLICATES; RULES ARE REPLACED BY MUTATED COPIES SINCE THEY CAN BE SHARED WITH OTHER INDIVIDUALS
+def mutateDuplicateRules(ruleSet):
+    keptRules = {}
+    for index in sorted(range(len(ruleSet)), key=lambda x: ruleSet[x].getWeight(), reverse = True):
+        if keptRules.get(ruleSet[index].getKey()) is ruleSet[index]:
+            continue
+        while ruleSet[index].getKey() in keptRules:
+            ruleSet[index] = mutateRuleCopy(ruleSet[index])
+        keptRules[ruleSet[index].getKey()] = ruleSet[index]
+
+    # RETURN A MUTATED COPY OF A RULE, LEAVING THE RULE ITSELF UNCHANGED
+def mutateRuleCopy(rule):
+    return mutateRule(Rule(rule.getType(), list(rule.getConditions()), rule.getAction(), rule.getAgentPool()))
 
     # CHECK IF TWO RULES ARE DUPLICATES OF EACH OTHER
 def rulesAreDuplicate(rule1, rule2):
-    conds1 = rule1.getConditions()
-    conds2 = rule2.getConditions()
-
-    act1 = rule1.getAction()
-    act2 = rule2.getAction()
-
-    if rule1 is rule2 or (set(conds1) == set(conds2) and act1 == act2):
-        return True
-    else:
-        return False
+    return rule1 is rule2 or rule1.getKey() == rule2.getKey()
 
     # CHECK IF TWO RULE SETS ARE DUPLICATES OF EACH OTHER
 def ruleSetsAreDuplicate(rs1, rs2):
-    return set(rs1) == set(rs2)
+    return set(rule.getKey() for rule in rs1) == set(rule.getKey() for rule in rs2)
 
     # RETURN SUM OF ALL WEIGHTS IN A RULE SET
 def getSumRuleWeights(agentPools):
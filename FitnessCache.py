@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import hashlib
+from collections import OrderedDict
+
+from StandInSimulator import StandInBackend
+
+# Caches the run fitness results of individuals on disk so that individuals whose rules have already
+# been evaluated enough times are not simulated again, within an experiment (ex: elites surviving a
+# new generation unchanged) or across experiments on the same scenario. Results are keyed by a
+# canonical hash of an individual's rules and by the scenario: the contents of the route files, the
+# SUMO seed, the maximum simulation, green phase and yellow phase times, the traffic lights' decision
+# intervals and the simulator backend. The least recently used entries are evicted once the cache
+# holds maxEntries of them.
+
+global defaultCacheFile
+global defaultMaxEntries
+global defaultSeed
+defaultCacheFile = "fitnessCache.json"
+defaultMaxEntries = 10000
+defaultSeed = "23423"           # Seed SUMO uses when none is given
+
+    # RETURN A HASH OF AN INDIVIDUAL'S RULES (TYPE, CONDITIONS AND ACTION); THE ORDER OF RULES AND OF THEIR CONDITIONS DOES NOT CHANGE IT
+def getGenomeHash(individual):
+    ruleSets = []
+    for ruleSet in [individual.getRS(), individual.getRSint()]:
+        ruleSets.append(sorted([[rule.getType(), sorted(rule.getConditions()), str(rule.getAction())] for rule in ruleSet]))
+
+    return hashlib.sha256(json.dumps(ruleSets).encode()).hexdigest()
+
+    # RETURN A HASH OF THE SCENARIO A SUMO COMMAND RUNS: ITS ROUTE FILES' CONTENTS AND SEED, THE MAXIMUM SIMULATION, GREEN PHASE AND YELLOW PHASE TIMES, THE DECISION INTERVALS (TL NAME -> SECONDS) AND THE SIMULATOR BACKEND
+def getScenarioHash(sumoCmd, maxSimulationTime, maxGreenPhaseTime, maxYellowPhaseTime, decisionIntervals, backend):
+    options = StandInBackend().readOptions(sumoCmd[1:])
+    scenarioHash = hashlib.sha256()
+    for routeFile in options.get("route-files", "").split(","):
+        if routeFile != "":
+            with open(routeFile, "rb") as f:
+                scenarioHash.update(f.read())
+    scenarioHash.update(("_" + str(options.get("seed", defaultSeed)) + "_" + str(maxSimulationTime) + "_" + str(maxGreenPhaseTime) + "_" + str(maxYellowPhaseTime) + "_" + backend).encode())
+    scenarioHash.update(json.dumps(sorted(decisionIntervals.items())).encode())
+
+    return scenarioHash.hexdigest()
+
+class FitnessCache:
+
+        # LOAD THE CACHE FROM ITS FILE IF IT EXISTS; decisionIntervals MAPS TL NAMES TO THEIR DECISION INTERVALS
+    def __init__(self, sumoCmd, maxGreenPhaseTime, maxYellowPhaseTime, decisionIntervals, backend="traci", fileName=defaultCacheFile, maxEntries=defaultMaxEntries):
+        self.sumoCmd = sumoCmd
+        self.maxGreenPhaseTime = maxGreenPhaseTime
+        self.maxYellowPhaseTime = maxYellowPhaseTime
+        self.decisionIntervals = dict(decisionIntervals)
+        self.backend = backend
+        self.fileName = fileName
+        self.maxEntries = maxEntries
+        self.scenarioHashes = {}        # maxSimulationTime -> scenario hash
+        self.entries = OrderedDict()    # Key -> run fitness results, least recently used first
+        self.generationStarts = {}      # Individual -> number of run fitness results it held when the generation started
+        if os.path.exists(fileName):
+            with open(fileName, "r") as f:
+                for key, runFitnessResults in json.load(f):
+                    self.entries[key] = runFitnessResults
+
+        # RETURN THE CACHE KEY OF AN INDIVIDUAL FOR A MAXIMUM SIMULATION TIME
+    def getKey(self, individual, maxSimulationTime):
+        if maxSimulationTime not in self.scenarioHashes:
+            self.scenarioHashes[maxSimulationTime] = getScenarioHash(self.sumoCmd, maxSimulationTime, self.maxGreenPhaseTime, self.maxYellowPhaseTime, self.decisionIntervals, self.backend)
+
+        return getGenomeHash(individual) + "_" + self.scenarioHashes[maxSimulationTime]
+
+        # RETURN THE RUN FITNESS RESULTS CACHED UNDER A KEY, OR None
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+
+        return self.entries[key]
+
+        # CACHE RUN FITNESS RESULTS UNDER A KEY, EVICTING THE LEAST RECENTLY USED ENTRIES IF THE CACHE IS FULL
+    def put(self, key, runFitnessResults):
+        self.entries[key] = list(runFitnessResults)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+    def getNumEntries(self):
+        return len(self.entries)
+
+        # MARK EVERY INDIVIDUAL WITH AT LEAST minIndividualRunsPerGen CACHED RESULTS AS NOT NEEDING RUNS, GIVING IT THE RESULTS IF IT HAS NONE; RETURNS THE NUMBER OF CACHE HITS. CALLED AT THE START OF EVERY GENERATION
+    def applyCachedResults(self, agentPools, minIndividualRunsPerGen, maxSimulationTime):
+        hits = 0
+        self.generationStarts = {}
+        for ap in agentPools:
+            for i in ap.getIndividualsSet():
+                self.generationStarts[i] = len(i.getRunFitnessResults())    # Results held from earlier generations may come from other scenarios or the surrogate
+                runFitnessResults = self.get(self.getKey(i, maxSimulationTime))
+                if runFitnessResults is not None and len(runFitnessResults) >= minIndividualRunsPerGen:
+                    if len(i.getRunFitnessResults()) > 0:
+                        i.useCachedFitness([])      # Individuals surviving from the last generation already hold their results
+                    else:
+                        i.useCachedFitness(runFitnessResults)
+                    hits += 1
+                else:
+                    i.setFitnessCached(False)
+
+        return hits
+
+        # CACHE THE RUN FITNESS RESULTS EVERY INDIVIDUAL SIMULATED THIS GENERATION GOT FROM ITS RUNS THIS GENERATION, ADDED TO THOSE ALREADY CACHED FOR IT; SCREENED OUT INDIVIDUALS HOLD SURROGATE RESULTS AND CACHED ONES WERE NOT RUN, SO NEITHER IS CACHED
+    def storeResults(self, agentPools, maxSimulationTime):
+        for ap in agentPools:
+            for i in ap.getIndividualsSet():
+                if i.isScreenedOut() or i.isFitnessCached():
+                    continue
+                runFitnessResults = i.getRunFitnessResults()[self.generationStarts.get(i, 0):]
+                if len(runFitnessResults) > 0:
+                    key = self.getKey(i, maxSimulationTime)
+                    self.put(key, (self.get(key) or []) + runFitnessResults)
+
+        # WRITE THE CACHE TO ITS FILE, REPLACING THE OLD FILE ONLY ONCE THE NEW ONE IS COMPLETE
+    def save(self):
+        with open(self.fileName + ".tmp", "w") as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(self.fileName + ".tmp", self.fileName)
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import optparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+import InitSetUp
+import OutputManager
+import RandomStreams
+import EvolutionaryLearner
+import ReinforcementLearner
+from Rule import Rule
+from Driver import Driver
+from AgentPool import AgentPool
+from TrafficLight import TrafficLight
+from SimulationSession import SimulationSession
+from StandInSimulator import StandInBackend
+import ParallelEvaluator
+
+# Importing needed python modules from the $SUMO_HOME/tools directory
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+# End-to-end benchmark of the evolutionary learning loop: runs a number of generations the way
+# main.py does in serial mode (episodes until every individual has had its runs, normalizing
+# fitnesses, breeding the next generation and writing the final output) on the stand-in simulator
+# instead of SUMO, and reports episodes per second, generations per hour and how the time splits
+# between:
+#   simulation     - stepping the stand-in, starting and ending episodes and reading intersection state
+#   ruleEvaluation - checking user-defined rules, matching RS/RSint rules and selecting a rule
+#   rlUpdates      - updating rule weights and fitness penalties
+#   breeding       - normalizing fitnesses and creating new generations (including their generation files)
+#   fileOutput     - writing the final output file
+#   orchestration  - everything else (the Driver loop, reward bookkeeping, logging)
+# Times are exclusive: time spent in a nested timed call only counts towards the nested call's part.
+# The network is the repository's scenario, or with -g N an N x N grid of traffic lights generated
+# with netgenerate (only needed to build the grid; SUMO itself is not run) and random routes, so the
+# loop's own overhead can be seen to scale with the number of traffic lights, individuals and rules:
+#   python GenerationBenchmark.py -k 3 -g 4 -i 10 -r 5
+# All files the loop writes go to a temporary directory.
+
+global defaultSumoCmd
+global defaultNetwork
+global defaultGenerations
+global defaultRunsPerGen
+global defaultMaxSimulationTime
+global defaultVehiclesPerTrafficLight
+global gridEdgeLength
+global benchmarkSeed
+global minIndividuals
+defaultSumoCmd = ["sumo", "-c", "config_file.sumocfg"]     # Only read by the stand-in simulator
+defaultNetwork = "simpleNetwork.net.xml"
+defaultGenerations = 3
+defaultRunsPerGen = 1
+defaultMaxSimulationTime = 3000
+defaultVehiclesPerTrafficLight = 20     # Vehicles departing in a grid scenario, per traffic light
+gridEdgeLength = 200                    # Length (m) of the edges of a generated grid
+benchmarkSeed = 0                       # Seed of every random stream, so runs benchmark the same agent pools and routes
+minIndividuals = 7                      # Fewest individuals per agent pool that leave two parents to breed from
+
+    # Parts of the loop timed by the benchmark: (owner, attribute name, part)
+global timedFunctions
+timedFunctions = [
+    (StandInBackend, "simulationStep", "simulation"),
+    (SimulationSession, "startEpisode", "simulation"),
+    (SimulationSession, "endEpisode", "simulation"),
+    (Driver, "subscribeToIntersections", "simulation"),
+    (Driver, "buildIntersectionFeatures", "simulation"),
+    (Driver, "applicableUserDefinedRule", "ruleEvaluation"),
+    (Driver, "getValidRules", "ruleEvaluation"),
+    (TrafficLight, "getNextRule", "ruleEvaluation"),
+    (ReinforcementLearner, "updatedWeight", "rlUpdates"),
+    (Rule, "updateWeight", "rlUpdates"),
+    (AgentPool, "normalizeIndividualsFitnesses", "breeding"),
+    (EvolutionaryLearner, "createNewGeneration", "breeding"),
+    (OutputManager, "run", "fileOutput"),
+]
+
+global partTimes
+global nestedTimes
+partTimes = {}          # Part -> exclusive time (s) spent in it
+nestedTimes = []        # Time (s) spent in nested timed calls of every timed call in progress, innermost last
+
+def get_options():
+    opt_parser = optparse.OptionParser()
+    opt_parser.add_option("-k", "--generations", type="int", default=defaultGenerations, help="number of generations to run")
+    opt_parser.add_option("-g", "--grid", type="int", default=0, help="run on an N x N grid of traffic lights instead of the repository's scenario")
+    opt_parser.add_option("-i", "--individuals", type="int", default=EvolutionaryLearner.maxIndividuals, help="individuals per agent pool (maxIndividuals)")
+    opt_parser.add_option("-r", "--rules", type="int", default=EvolutionaryLearner.maxRules, help="rules per rule set (maxRules)")
+    opt_parser.add_option("--runs", type="int", default=defaultRunsPerGen, help="minimum runs per individual per generation")
+    opt_parser.add_option("--max-time", type="int", default=defaultMaxSimulationTime, help="maximum simulation time (s) of an episode")
+    opt_parser.add_option("--vehicles", type="int", default=defaultVehiclesPerTrafficLight, help="vehicles per traffic light in a grid scenario")
+    opt_parser.add_option("-o", "--output", default=None, help="JSON file the results are written to")
+    options, args = opt_parser.parse_args()
+    if options.individuals < minIndividuals:
+        opt_parser.error("at least " + str(minIndividuals) + " individuals are needed to breed new generations")
+    return options
+
+    # RETURN A FUNCTION THAT TIMES CALLS TO function AS PART OF THE LOOP, EXCLUDING ITS NESTED TIMED CALLS
+def timed(function, part):
+    def timedFunction(*args, **kwargs):
+        start = time.perf_counter()
+        nestedTimes.append(0)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            partTimes[part] += elapsed - nestedTimes.pop()
+            if len(nestedTimes) > 0:
+                nestedTimes[-1] += elapsed
+    return timedFunction
+
+    # TIME THE PARTS OF THE LOOP WHILE THE BLOCK RUNS
+@contextlib.contextmanager
+def timingParts():
+    originals = [(owner, name, getattr(owner, name)) for owner, name, part in timedFunctions]
+    for owner, name, part in timedFunctions:
+        partTimes[part] = 0
+        setattr(owner, name, timed(getattr(owner, name), part))
+    try:
+        yield
+    finally:
+        for owner, name, function in originals:
+            setattr(owner, name, function)
+
+    # GENERATE AN N x N GRID OF TRAFFIC LIGHTS AND RANDOM ROUTES THROUGH IT IN A DIRECTORY; RETURNS (NETWORK FILE, STAND-IN COMMAND)
+def createGridScenario(gridSize, numVehicles, maxSimulationTime, directory):
+    import sumolib
+    from sumolib import checkBinary
+
+    networkFile = os.path.join(directory, "grid.net.xml")
+    routeFile = os.path.join(directory, "grid.rou.xml")
+    subprocess.check_call([checkBinary("netgenerate"), "--grid", "--grid.number", str(gridSize), "--grid.length", str(gridEdgeLength),
+                           "--default-junction-type", "traffic_light", "--no-turnarounds", "true", "-o", networkFile], stdout=subprocess.DEVNULL)
+
+        # Each vehicle drives a random walk of up to 2N edges from a random edge, departing at a random time in the first half of an episode
+    randomGenerator = RandomStreams.getGenerator("generationBenchmark")
+    edges = sumolib.net.readNet(networkFile).getEdges()
+    departures = sorted(int(randomGenerator.integers(maxSimulationTime//2)) for v in range(numVehicles))
+    with open(routeFile, "w") as f:
+        f.write("<routes>\n")
+        for v, depart in enumerate(departures):
+            route = [edges[randomGenerator.integers(len(edges))]]
+            for e in range(2*gridSize - 1):
+                nextEdges = [edge for edge in route[-1].getOutgoing() if edge.getToNode() != route[-1].getFromNode()]
+                if len(nextEdges) == 0:
+                    break
+                route.append(nextEdges[randomGenerator.integers(len(nextEdges))])
+            f.write('    <vehicle id="' + str(v) + '" depart="' + str(depart) + '">\n        <route edges="' + " ".join(edge.getID() for edge in route) + '"/>\n    </vehicle>\n')
+        f.write("</routes>\n")
+
+    return networkFile, ["sumo", "-n", networkFile, "-r", routeFile]
+
+    # RUN GENERATIONS OF THE LEARNING LOOP AS main.py DOES IN SERIAL MODE; RETURNS THE NUMBER OF EPISODES RUN
+def runGenerations(sumoCmd, setUpTuple, numGenerations, individualRunsPerGen, maxSimulationTime, maxGreenPhaseTime=225, maxYellowPhaseTime=5):
+    session = SimulationSession(sumoCmd, backend="standin")
+    episode = 0
+    for generation in range(numGenerations):
+        for ap in setUpTuple[2]:
+            for i in ap.getIndividualsSet():
+                i.resetSelectedCount()
+
+        while ParallelEvaluator.individualsNeedRuns(setUpTuple[2], individualRunsPerGen):
+            Driver(sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, session=session).run(episode=episode)
+            episode += 1
+
+        for ap in setUpTuple[2]:
+            ap.normalizeIndividualsFitnesses()
+
+        if generation + 1 < numGenerations:
+            EvolutionaryLearner.createNewGeneration(setUpTuple[2])
+            for ap in setUpTuple[2]:
+                for i in ap.getIndividualsSet():
+                    i.resetSelectedCount()
+                    i.resetAggregateVehicleWaitTime()
+        else:
+            OutputManager.run(setUpTuple[2], 0, 0)
+    session.close()
+
+    return episode
+
+    # RUN THE BENCHMARK; RETURNS A DICTIONARY OF ITS PARAMETERS AND RESULTS
+def run(numGenerations=defaultGenerations, gridSize=0, numIndividuals=EvolutionaryLearner.maxIndividuals, numRules=EvolutionaryLearner.maxRules,
+        individualRunsPerGen=defaultRunsPerGen, maxSimulationTime=defaultMaxSimulationTime, vehiclesPerTrafficLight=defaultVehiclesPerTrafficLight):
+    RandomStreams.seed(benchmarkSeed)
+    EvolutionaryLearner.maxIndividuals = numIndividuals
+    EvolutionaryLearner.maxRules = numRules
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        if gridSize > 0:
+            networkFile, sumoCmd = createGridScenario(gridSize, vehiclesPerTrafficLight*gridSize*gridSize, maxSimulationTime, directory)
+        else:
+            networkFile = os.path.abspath(defaultNetwork)
+            sumoCmd = [defaultSumoCmd[0], defaultSumoCmd[1], os.path.abspath(defaultSumoCmd[2])]
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            setUpStart = time.perf_counter()
+            setUpTuple = InitSetUp.run(networkFile, individualRunsPerGen)
+            setUpTime = time.perf_counter() - setUpStart
+
+        os.chdir(directory)     # The loop writes generation and output files to the working directory
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                with timingParts():
+                    start = time.perf_counter()
+                    numEpisodes = runGenerations(sumoCmd, setUpTuple, numGenerations, individualRunsPerGen, maxSimulationTime)
+                    wallTime = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    parts = dict(partTimes)
+    parts["orchestration"] = wallTime - sum(partTimes.values())
+
+    return {"parameters": {"generations": numGenerations, "trafficLights": len(setUpTuple[1]), "agentPools": len(setUpTuple[2]), "individuals": numIndividuals,
+                           "rules": numRules, "runsPerGen": individualRunsPerGen, "maxSimulationTime": maxSimulationTime, "grid": gridSize},
+            "setUpTime": setUpTime, "wallTime": wallTime, "episodes": numEpisodes, "episodesPerSecond": numEpisodes/wallTime,
+            "generationsPerHour": numGenerations/wallTime*3600, "parts": parts, "python": platform.python_version(), "machine": platform.machine()}
+
+    # PRINT THE RESULTS OF THE BENCHMARK
+def printResults(results):
+    parameters = results["parameters"]
+    print(parameters["generations"], "generations,", parameters["trafficLights"], "traffic lights in", parameters["agentPools"], "agent pools,",
+          parameters["individuals"], "individuals,", parameters["rules"], "rules per rule set")
+    print("Set-up time:          ", round(results["setUpTime"], 2), "s")
+    print("Wall time:            ", round(results["wallTime"], 2), "s for", results["episodes"], "episodes")
+    print("Episodes per second:  ", round(results["episodesPerSecond"], 2))
+    print("Generations per hour: ", round(results["generationsPerHour"], 1))
+    for part, partTime in results["parts"].items():
+        print("  {:<16}{:>10.2f} s{:>8.1f}%".format(part, partTime, 100*partTime/results["wallTime"]))
+
+# main entry point
+if __name__ == "__main__":
+    options = get_options()
+    results = run(options.generations, options.grid, options.individuals, options.rules, options.runs, options.max_time, options.vehicles)
+    printResults(results)
+    if options.output is not None:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print("Results written to", options.output)
@@ -1,6 +1,6 @@
 import os
 import sys
-from numpy.random import choice
+import numpy as np
 
 class Individual:
     global epsilon          # paramater between 0 and 1 used to determine importance of doing exploration (higher epsilon = more exploration)
@@ -24,6 +24,8 @@ class Individual:
         self.ruleWeightSum = 0
         self.aggregateVehicleWaitTime = 0
         self.fitnessRuleApplicationPenalty = 0      # A penalty applied to the fitness of an Individual when its rule aren't applied, or result in negative outcomes, in a simulation
+        self.screenedOut = False                    # True if surrogate screening kept the Individual from SUMO runs this generation
+        self.fitnessCached = False                  # True if the fitness cache already held enough run fitness results for the Individual this generation
 
         # RETURN INDIVIDUAL IDENTIFIER
     def getID(self):
@@ -49,7 +51,36 @@ class Individual:
         # RETURN selectedCount 
     def getSelectedCount(self):
         return self.selectedCount
+
+        # RETURN TRUE IF THE INDIVIDUAL HAS NOT HAD ITS MINIMUM NUMBER OF RUNS THIS GENERATION AND WAS NOT SCREENED OUT OR FOUND IN THE FITNESS CACHE
+    def needsRuns(self, minIndividualRunsPerGen):
+        return not self.screenedOut and not self.fitnessCached and self.selectedCount < minIndividualRunsPerGen
+
+    def isScreenedOut(self):
+        return self.screenedOut
+
+    def setScreenedOut(self, screenedOut):
+        self.screenedOut = screenedOut
+
+        # KEEP THE INDIVIDUAL FROM SUMO RUNS THIS GENERATION, USING THE FITNESS RESULTS OF ITS SURROGATE RUNS INSTEAD
+    def screenOut(self, runFitnessResults):
+        self.screenedOut = True
+        self.totalSelectedCount += len(runFitnessResults)
+        self.addRunFitnessResults(runFitnessResults)
     
+    def isFitnessCached(self):
+        return self.fitnessCached
+
+    def setFitnessCached(self, fitnessCached):
+        self.fitnessCached = fitnessCached
+
+        # KEEP THE INDIVIDUAL FROM SUMO RUNS THIS GENERATION SINCE ITS FITNESS IS CACHED; runFitnessResults ARE THE CACHED RESULTS IT DOES NOT HOLD YET
+    def useCachedFitness(self, runFitnessResults):
+        self.fitnessCached = True
+        if len(runFitnessResults) > 0:
+            self.totalSelectedCount += len(runFitnessResults)
+            self.addRunFitnessResults(runFitnessResults)
+
     def getTotalSelectedCount(self):
         return self.totalSelectedCount
     
@@ -64,7 +95,18 @@ class Individual:
     def updateFitness(self, fitness):
         self.runFitnessResults.append(fitness + self.fitnessRuleApplicationPenalty) # Add run fitness plus rule application penalty to master rFit list 
         self.fitnessRuleApplicationPenalty = 0  # Reset penalty value for next sim run
+        self.calculateFitness()
+
+        # ADD FITNESS RESULTS OF RUNS EVALUATED ELSEWHERE (EX: BY A PARALLEL WORKER) AND UPDATE FITNESS SCORE
+    def addRunFitnessResults(self, runFitnessResults):
+        self.runFitnessResults += runFitnessResults
+        self.calculateFitness()
 
+    def getRunFitnessResults(self):
+        return self.runFitnessResults
+
+        # CALCULATE FITNESS SCORE AS THE AVERAGE OF ALL RUN FITNESS RESULTS
+    def calculateFitness(self):
         if sum(self.runFitnessResults) == 0:
             self.fitness = defaultFitness
         else:
@@ -109,182 +151,57 @@ class Individual:
 
         return self.ruleWeightSum
 
-        # RETURN A RULE FROM RS BASED ON THEIR PROBABILITIES 
-    def selectRule(self, validRules):
+        # RETURN A RULE FROM RS BASED ON THEIR PROBABILITIES, SAMPLED WITH THE GENERATOR OF THE TRAFFIC LIGHT USING THE INDIVIDUAL
+    def selectRule(self, validRules, randomGenerator):
         if len(validRules) == 0:
             return -1
-        
-        ruleSets = self.subDivideValidRules(validRules)
-        rules = []
-        probabilities = []  
-        
 
-            # Add a number of max weight rules to selection set relative to their probabilities
-        for rule in ruleSets[0]:
-            probability = self.getRuleProbabilityMax(rule, ruleSets[0], ruleSets[1])
-            rules.append(rule)
-            probabilities.append(probability)
-
-            #If rsRest contains elements too, calculate their probabilities
-        if len(ruleSets[1]) > 0:  
-                # Acquire sum of weights in rsRest
-            sumOfWeights = self.getSumOfWeights(ruleSets[1])
-            
-            # If sum of weights is 0, assign a weight based on the available probability left
-            if sumOfWeights == 0:
-                probability = (1-sum(probabilities))/len(ruleSets[1])
-                    
-                    # If sum of weights is 0, assign equal part of the remaining probability to each rule
-                for rule in ruleSets[1]:
-                    rules.append(rule)
-                    probabilities.append(probability)
-                
-            else:
-                    # If weights do not sum to 0, normalize them between 0 and 1 (0.1 and 1.1 technically) and calculate their probabilities
-                weightsList = self.getWeightsList(ruleSets[1])
-                self.normalizeRuleWeights(ruleSets[1], weightsList)
-                sumOfWeights = self.getSumOfWeights(self.getNormalizedWeightsList(ruleSets[1]))
-
-                    # Individually calculate probabilities 
-                for rule in ruleSets[1]:
-                    probability = self.getRuleProbabilityRest(rule, probabilities, sumOfWeights, ruleSets[1])
-                    rules.append(rule)
-                    probabilities.append(probability)
-
-        # print("Probabilities have a sum of:", sum(probabilities))
-        if sum(probabilities) == 0:
-            for i in range(len(probabilities)):
-                probabilities[i] = 1/len(probabilities)
-            # print("Probabilities have been edited and have a sum of:", sum(probabilities))
-        rule = choice(rules, 1, p = probabilities)  # Returns a list (of size 1) of rules based on their probabilities
-        
-        return rule[0]  # Choice function returns an array, so we take the only element in it
-            
-        # RETURN A RULE FROM RSint BASED ON THEIR PROBABILITIES 
-    def selectCoopRule(self, validRules):
+        return validRules[self.sampleRule(self.getRuleProbabilities(validRules, False), randomGenerator)]
+
+        # RETURN A RULE FROM RSint BASED ON THEIR PROBABILITIES, SAMPLED WITH THE GENERATOR OF THE TRAFFIC LIGHT USING THE INDIVIDUAL
+    def selectCoopRule(self, validRules, randomGenerator):
         if len(validRules) == 0:
             return -1
-        
-        ruleSets = self.subDivideValidRules(validRules)
-
-        if len(ruleSets[0]) > 0:  
-            rules = []
-            probabilities = []  
-                # Add a number of max weight rules to selection set relative to their probabilities
-            for rule in ruleSets[0]:
-                probability = int(self.getRuleProbabilityMax(rule, ruleSets[0], ruleSets[1])) 
-                # print("Rule with conditions:", rule.getConditions(), "is in the MAX GROUP with probability", probability, "\n\n")
-                rules.append(rule)
-                probabilities.append(probability)
-            
-            #If rsRest contains elements too, calculate their probabilities
-        if len(ruleSets[1]) > 0:  
-                # Acquire sum of weights in rsRest
-            sumOfWeights = self.getSumOfWeights(ruleSets[1])
-            
-            # If sum of weights is 0, assign a weight based on the available probability left
-            if sumOfWeights == 0:
-                probability = (1-sum(probabilities))/len(ruleSets[1])
-                    
-                    # If sum of weights is 0, assign equal part of the remaining probability to each rule
-                for rule in ruleSets[1]:
-                    rules.append(rule)
-                    probabilities.append(probability)
-            else:
-                    # If weights do not sum to 0, normalize them between 0 and 1 (0.1 and 1.1 technically) and calculate their probabilities
-                weightsList = self.getWeightsList(ruleSets[1])
-                self.normalizeWeights(ruleSets[1], weightsList)
-                sumOfWeights = self.getSumOfWeights(ruleSets[1])
-
-                    # Individually calculate probabilities 
-                for rule in ruleSets[1]:
-                    probability = self.getRuleProbabilityRest(rule, probabilities, sumOfWeights, ruleSets[1])
-                    rules.append(rule)
-                    probabilities.append(probability)
-        
-        # print("Probabilities have a sum of:", sum(probabilities))
-        if sum(probabilities) == 0:
-            for i in range(len(probabilities)):
-                probabilities[i] = 1/len(probabilities)
-            # print("Probabilities have been edited and have a sum of:", sum(probabilities))
-        rule = choice(rules, 1, p = probabilities)  # Returns a list (of size 1) of rules based on their probabilities
-        
-        return rule[0]  # Choice function returns an array, so we take the only element in it
-
-        # RETURN A RANDOM RULE FROM RS
-    def selectRandomRule(self, validRules):
-        return self.RS[randrange(0, len(self.ruleSet))]    # Return a random rule
-
-        # RETURN AGENT POOL THE INDIVIDUAL BELONGS TO
-    def getAgentPool(self):
-        return self.agentPool
 
-        # RETURN PROBABILITY OF SELECTION FOR A RULE IN rsMax
-    def getRuleProbabilityMax(self, rule, rsMax, rsRest):
-        weight = rule.getWeight()
+        return validRules[self.sampleRule(self.getRuleProbabilities(validRules, True), randomGenerator)]
 
-        if len(rsRest) == 0:
-            return 1/len(rsMax)
-            
-            # Avoid dividing by zero
-        if weight == 0:
-            weight = 2.2250738585072014e-308 
+        # RETURN AN ARRAY OF THE SELECTION PROBABILITIES OF VALID RULES; coop IS TRUE FOR RULES FROM RSint
+    def getRuleProbabilities(self, validRules, coop):
+        weights = [rule.getWeight() for rule in validRules]
+        isMax = np.array(weights) == max(weights)      # rsMax holds the rules with the highest weight, rsRest the others
+        numMax = int(np.count_nonzero(isMax))
+        numRest = len(weights) - numMax
 
-        return ((1-epsilon)*(weight/(weight*len(rsMax))))
-    
-        # RETURN PROBABILITY OF SELECTION FOR A RULE IN rsRest
-    def getRuleProbabilityRest(self, rule, probabilities, sumOfWeights, rsRest):
-        weight = rule.getNormalizedWeight()
-        
-        # print("Rule with weight", rule.getNormalizedWeight(), "has a probability of", epsilon*(weight/sumOfWeights))
-        return epsilon*(weight/sumOfWeights)
-
-        # RETURN SUM OF ALL WEIGHTS IN A RULE SET
-    def getSumOfWeights(self, setOfRules):       
-        return sum(rule.getNormalizedWeight() for rule in setOfRules)
-
-        # RETURN A LIST OF ALL WEIGHTS IN A LIST OF RULES
-    def getWeightsList(self, setOfRules):
-        weightsList = []
-        for r in setOfRules:
-            weightsList.append(r.getWeight())
-        
-        return weightsList
+            # Rules in rsMax share 1-epsilon of the probability, or all of it when rsRest is empty
+        if numRest == 0:
+            maxProbability = 1/numMax
+        else:
+            maxProbability = (1-epsilon)/numMax
+        if coop:
+            maxProbability = int(maxProbability)    # RSint probabilities of rsMax rules are whole numbers, so they are only chosen when no other rule is valid
 
-        # RETURN A LIST OF WEIGHTS NORMALIZED BETWEEN 0.1 AND 1.1
-    def getNormalizedWeightsList(self, setOfRules):
-        weightsList = []
-        for r in setOfRules:
-            weightsList.append(r.getNormalizedWeight())
-        
-        return weightsList
+            # Rules in rsRest share the remaining probability equally; normalized weights are never set before selection, so they cannot weigh the share
+        restProbability = (1 - maxProbability*numMax)/numRest if numRest > 0 else 0.0
 
-        # NORMALIZE WEIGHTS BETWEEN 0.1 AND 1.1 (WEIGHTS ARE NORMALIZED BETWEEN 0 AND 1, AND 0.1 IS ADDED TO AVOID WEIGHTS OF 0)
-    def normalizeWeights(self, setOfRules, weightsList):
-        for r in setOfRules:
-            r.setNormalizedWeight(((r.getWeight()-min(weightsList))/(max(weightsList)-min(weightsList)))+ 0.1) 
+        if maxProbability*numMax + restProbability*numRest == 0:
+            return np.full(len(weights), 1/len(weights))
 
+        return np.where(isMax, maxProbability, restProbability)
 
-        # SEPERATE RULES INTO rsMax AND rsRest 
-    def subDivideValidRules(self, validRules):
-        rsMax = []
-        ruleWeights = []
+        # RETURN THE INDEX OF A RULE SAMPLED FROM SELECTION PROBABILITIES WITH A GENERATOR
+    def sampleRule(self, probabilities, randomGenerator):
+        cumulativeProbabilities = probabilities.cumsum()
+        index = cumulativeProbabilities.searchsorted(randomGenerator.random()*cumulativeProbabilities[-1], side="right")
 
-            # Add all the valid rule weights into a list to sort
-        for rule in validRules:
-            ruleWeights.append(rule.getWeight())
-        
-        ruleWeights.sort(reverse=True)   # Sort rule weights from highest to lowest
+        return min(int(index), len(probabilities) - 1)
 
-            # Add rules with highest weight into rsMax, and then remove them from primary list
-        for rule in validRules:
-            if rule.getWeight() == ruleWeights[0]:
-                # print(rule, "has a weight of", rule.getWeight(), "and the highest weight is:", ruleWeights[0])
-                rsMax.append(rule)
-                validRules.remove(rule)
+        # RETURN A RANDOM RULE FROM RS
+    def selectRandomRule(self, validRules):
+        return self.RS[randrange(0, len(self.ruleSet))]    # Return a random rule
 
-        # print("RSMax contains:", rsMax, "\nRSRest contains:", validRules)
-        return (rsMax, validRules)       # Return the two rule sets (validRules now serves as rsRest)
+        # RETURN AGENT POOL THE INDIVIDUAL BELONGS TO
+    def getAgentPool(self):
+        return self.agentPool
 
     def updateFitnessPenalty(self, ruleApplied, positiveRuleReward):
             # If no rule is applied, add a big penalty to the fitness
@@ -4,153 +4,207 @@ import os
 import sys
 import optparse
 import re
+import pickle
+import hashlib
+import xml.etree.ElementTree as ET
 
 from TrafficLight import TrafficLight
 from AgentPool import AgentPool
 from Rule import Rule
 
-def run(sumoNetworkName, minIndividualRunsPerGen):
-    tlAgentPoolList = []
-    trafficLightDict = {}
-    userDefinedRules = []
+global defaultUserDefinedRulesFile
+global compiledTopologyVersion
+defaultUserDefinedRulesFile = "UserDefinedRules.txt"
+compiledTopologyVersion = 2     # Raised whenever the layout of a compiled topology changes, so older cached ones are not loaded
+global detectorPeriod
+detectorPeriod = 86400          # Aggregation period (s) of generated detectors; their output file is discarded
+
+    # PARSE A SUMO NETWORK FILE IN ONE STREAMING PASS, RETURNING DICTIONARIES INDEXING ITS TOPOLOGY:
+    #   "trafficLightLanes" - traffic light junction -> its incoming lanes, in network file order
+    #   "laneTrafficLights" - incoming lane -> the traffic light junction it leads to
+    #   "edgeEndpoints"     - edge -> (from junction, to junction), for every edge that is not internal
+    #   "tlPhases"          - traffic light -> the names of its phases
+    #   "laneLengths"       - lane -> its length (m), for every lane of an edge that is not internal
+def parseNetwork(sumoNetworkName):
+    topology = {"trafficLightLanes": {}, "laneTrafficLights": {}, "edgeEndpoints": {}, "tlPhases": {}, "laneLengths": {}}
+    root = None
+    depth = 0                   # Depth of the element being parsed; top-level elements (children of the root) are at depth 1
+    for event, elem in ET.iterparse(sumoNetworkName, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+
+        if elem.tag == "junction":
+            if elem.get("type") == "traffic_light":
+                lanes = elem.get("incLanes", "").split()
+                topology["trafficLightLanes"][elem.get("id")] = lanes
+                for l in lanes:
+                    topology["laneTrafficLights"][l] = elem.get("id")
+
+        elif elem.tag == "edge":
+            if elem.get("function") is None:
+                topology["edgeEndpoints"][elem.get("id")] = (elem.get("from"), elem.get("to"))
+                for lane in elem.iter("lane"):
+                    topology["laneLengths"][lane.get("id")] = float(lane.get("length"))
+
+            # Phases without a name are named by their state
+        elif elem.tag == "tlLogic":
+            topology["tlPhases"][elem.get("id")] = [phase.get("name", phase.get("state")) for phase in elem.iter("phase")]
+
+        if depth == 1:
+            root.clear()    # Every top-level element (ex: the many connections) is dropped once read so memory does not grow with the network
+
+    return topology
+
+    # RETURN A DICTIONARY OF EACH JUNCTION AND THE JUNCTIONS IT SHARES AN EDGE WITH, IN NETWORK FILE ORDER
+def getEdgePartners(edgeEndpoints):
     edgePartners = {}
-    communicationPartners = {}
-        
-        # Parse user defined rules file and create rules for each
-    f = open("UserDefinedRules.txt", "r")
-        # Parse file to gather information about traffic lights, and instantiate their objects
+    for fromJunction, toJunction in edgeEndpoints.values():
+        edgePartners.setdefault(toJunction, {})[fromJunction] = None      # Dictionaries keep junctions in the order they were added, without duplicates
+        edgePartners.setdefault(fromJunction, {})[toJunction] = None
+
+    return {junction: list(partners) for junction, partners in edgePartners.items()}
+
+    # RETURN THE CONDITIONS OF THE USER DEFINED RULES IN A RULES FILE
+def parseUserDefinedRules(userDefinedRulesFile):
+    userDefinedConditions = []
+    f = open(userDefinedRulesFile, "r")
     for x in f:
             # Ignore comment sections of input file
         if "//" in x:
             continue
-            # For each user defined rule, create a rule with its conditions
+            # For each user defined rule, record its condition
         elif "udr" in x:
             ruleComponents = x.split(": ")
             ruleComponents = ruleComponents[1].split()
-            userDefinedRules.append(Rule(-1, [ruleComponents[0]], -1, None)) # User defined rules have only defined conditions; actions are predefined in Driver.py and they apply to all Agent Pools
-            # print("The rule being added is:", ruleComponents[0], ".")
+            userDefinedConditions.append(ruleComponents[0])
     f.close() # Close file before moving on
 
-        
-        # Get SUMO network file to parse
-    # fileName = input("Please enter the name of the desired network file: ")
+    return userDefinedConditions
+
+    # PARSE THE NETWORK AND USER DEFINED RULES FILES INTO A COMPILED TOPOLOGY OF PLAIN DATA:
+    #   "userDefinedRules"      - conditions of the user defined rules
+    #   "trafficLights"         - (name, lanes, phases) of every traffic light, in network file order
+    #   "edgeEndpoints"         - edge -> (from junction, to junction)
+    #   "laneTrafficLights"     - incoming lane -> the traffic light it leads to
+    #   "laneLengths"           - incoming lane -> its length (m)
+    #   "communicationPartners" - traffic light -> names of the traffic lights it shares an edge with
+    #   "agentPools"            - (agent pool ID, names of its traffic lights) of every agent pool
+def compileTopology(sumoNetworkName, userDefinedRulesFile=defaultUserDefinedRulesFile):
+    topology = parseNetwork(sumoNetworkName)
+    trafficLights = [(tlName, lanes, topology["tlPhases"].get(tlName, [])) for tlName, lanes in topology["trafficLightLanes"].items()]
+    edgePartners = getEdgePartners(topology["edgeEndpoints"])
 
-#ADD error checking for input (ensure it's a valid network file)
+    communicationPartners = {}
+    for tlName, lanes, phases in trafficLights:
+        communicationPartners[tlName] = [p for p in edgePartners.get(tlName, []) if p in topology["trafficLightLanes"]]
+
+        # An agent pool can realistically host more than one traffic light iff at minimum all TL's using the pool share the same number of phases
+    agentPools = []
+    agentPoolsByActionSet = {}
+    for tlName, lanes, phases in trafficLights:
+        ap = agentPoolsByActionSet.get(tuple(phases))
+        if ap is not None:
+            ap[1].append(tlName)
+        else:
+            ap = ("AP" + str(len(agentPools) + 1), [tlName])
+            agentPools.append(ap)
+            agentPoolsByActionSet[tuple(phases) + ("DoNothing",)] = ap     # Agent pools add the "do nothing" action to their action set
+
+    return {"userDefinedRules": parseUserDefinedRules(userDefinedRulesFile), "trafficLights": trafficLights, "edgeEndpoints": topology["edgeEndpoints"],
+            "laneTrafficLights": topology["laneTrafficLights"], "laneLengths": {l: topology["laneLengths"][l] for l in topology["laneTrafficLights"] if l in topology["laneLengths"]},
+            "communicationPartners": communicationPartners, "agentPools": agentPools}
+
+    # RETURN THE ID OF THE LANE AREA (E2) DETECTOR ON AN INCOMING LANE
+def getDetectorID(laneID):
+    return "e2_" + laneID
+
+    # WRITE A SUMO ADDITIONAL FILE WITH A LANE AREA (E2) DETECTOR COVERING EVERY INCOMING LANE OF EVERY TRAFFIC LIGHT; DETECTORS ARE ONLY READ OVER TRACI, SO THEIR OUTPUT IS DISCARDED
+def writeDetectorFile(compiled, detectorFile):
+    additional = ET.Element("additional")
+    for tlName, lanes, phases in compiled["trafficLights"]:
+        for lane in [l for l in lanes if l in compiled["laneLengths"]]:
+            ET.SubElement(additional, "laneAreaDetector", id=getDetectorID(lane), lane=lane, pos="0", endPos=str(compiled["laneLengths"][lane]), period=str(detectorPeriod), file="NUL")
+    ET.indent(additional)
+    ET.ElementTree(additional).write(detectorFile, encoding="UTF-8", xml_declaration=True)
+
+    # RETURN A HASH OF THE CONTENTS OF THE NETWORK AND USER DEFINED RULES FILES
+def getTopologyHash(sumoNetworkName, userDefinedRulesFile=defaultUserDefinedRulesFile):
+    topologyHash = hashlib.sha256(("topology_v" + str(compiledTopologyVersion)).encode())
+    for fileName in [sumoNetworkName, userDefinedRulesFile]:
+        with open(fileName, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                topologyHash.update(chunk)
+        topologyHash.update(b"\0")
+
+    return topologyHash.hexdigest()
+
+    # RETURN THE COMPILED TOPOLOGY OF A NETWORK, LOADING IT FROM THE CACHE DIRECTORY IF IT WAS COMPILED FROM THE SAME FILES BEFORE, AND SAVING IT THERE OTHERWISE
+def loadCompiledTopology(sumoNetworkName, topologyCacheDir, userDefinedRulesFile=defaultUserDefinedRulesFile):
+    fileName = os.path.join(topologyCacheDir, getTopologyHash(sumoNetworkName, userDefinedRulesFile) + ".pickle")
+    if os.path.exists(fileName):
+        with open(fileName, "rb") as f:
+            return pickle.load(f)
+
+    compiled = compileTopology(sumoNetworkName, userDefinedRulesFile)
+    os.makedirs(topologyCacheDir, exist_ok=True)
+    with open(fileName + ".tmp", "wb") as f:
+        pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(fileName + ".tmp", fileName)     # Replace the file only once it is complete so other runs never load part of it
+
+    return compiled
+
+    # CREATE THE USER DEFINED RULES, TRAFFIC LIGHTS AND AGENT POOLS OF A COMPILED TOPOLOGY
+def buildSetUp(compiled, minIndividualRunsPerGen):
+        # User defined rules have only defined conditions; actions are predefined in Driver.py and they apply to all Agent Pools
+    userDefinedRules = [Rule(-1, [cond], -1, None) for cond in compiled["userDefinedRules"]]
 
-    
-    f = open(sumoNetworkName, "r")                                     # Open desired file
-    
-    lanes = []
     trafficLights = []
-    tlPhases = {}
-    # Parse file to gather information about traffic lights, and instantiate their objects
-    for x in f:
-            # Create an action set dictionary for each traffic light
-        if "<tlLogic" in x:
-            getTLName = x.split("id=\"")
-            tlNameArray = getTLName[1].split("\"")
-            tlPhases[tlNameArray[0]] = []
-                
-                # Count number of phases/actions a TL has; loop max is arbitrarily high given phase number uncertainty 
-            for i in range(0, 1000):
-                x = f.readline()
-                    # For each phase, record its phase name
-                if "<phase" in x:
-                    phaseNameSplit = x.split("name=")
-                    phaseName = phaseNameSplit[1].split("\"")
-                    tlPhases[tlNameArray[0]].append(phaseName[1])
-                else:
-                    break
-
-            # Gather info about individual traffic lights
-        elif "<junction" and "type=\"traffic_light\"" in x:
-                # Isolate individual TLs
-            temp = x.split("id=\"")
-            trafficLightName = temp[1].split("\"")                      # Traffic Light name
-
-                # Get all lanes controlled by TL
-            splitForlanes = temp[1].split("incLanes=\"")
-            lanesBulk = splitForlanes[1].split("\"")
-            lanesSplit = lanesBulk[0].split()
-
-                # Split lanes into individual elements in a list
-            for l in lanesSplit:
-                lanes.append(l)
-
-            trafficLights.append(TrafficLight(trafficLightName[0], lanes))
-            lanes = []
-
-        elif "<edge id=" in x and "function" not in x:
-            isolateFrom = x.split("from=\"")
-            isolateTo = x.split("to=\"")
-
-            isolateFrom = isolateFrom[1].split("\"")
-            fromJunction = isolateFrom[0]
-
-            isolateTo = isolateTo[1].split("\"")
-            toJunction = isolateTo[0]
-
-                # Create new dictionary entry for junctions if they doesn't already exist
-            if toJunction not in edgePartners:
-                edgePartners[toJunction] = []          
-            if fromJunction not in edgePartners:
-                edgePartners[fromJunction] = []
-
-                # Add edges to each others dictionary entries if not already there
-            if fromJunction not in edgePartners[toJunction]:
-                edgePartners[toJunction].append(fromJunction)            
-            if toJunction not in edgePartners[fromJunction]:
-                edgePartners[fromJunction].append(toJunction)
+    trafficLightDict = {}
+    for tlName, lanes, phases in compiled["trafficLights"]:
+        tl = TrafficLight(tlName, list(lanes))
+        tl.setPhases(list(phases))
+        trafficLightDict[tlName] = tl
+        trafficLights.append(tl)
+
+        # Agent pools are created in the order of their first traffic light, as each traffic light is assigned in turn
+    agentPoolOfTL = {}
+    for apID, tlNames in compiled["agentPools"]:
+        for tlName in tlNames:
+            agentPoolOfTL[tlName] = (apID, tlNames)
 
-        else:
-            continue
-    
-    f.close()                                                           # Close file once finished
-
-
-        # Set number of phases for each traffic light
-    for x in tlPhases:
-        for tl in trafficLights:
-            if x == tl.getName():
-                tl.setPhases(tlPhases[x])
-            
-        # Create entries for traffic lights in the communicationPartners dict based on edgePartners data
-    for junction in edgePartners:
-        for t in trafficLights:
-            if junction == t.getName():
-                communicationPartners[t] = []
-    
-        # Create and assign agent pools; populate communicationPartners dictionary 
     agentPools = []
+    agentPoolDict = {}
     for tl in trafficLights:
-        apAssigned = False
-            # If agent pool(s) already exist, check to see its ability to host the traffic light
-        if len(agentPools) > 0:    
-            for ap in agentPools:
-                    # An agent pool can realistically host more than one traffic light iff at minimum all TL's using the pool share the same number of phases
-                if tl.getPhases() == ap.getActionSet(): 
-                    tl.assignToAgentPool(ap)
-                    ap.addNewTrafficLight(tl)
-                    apAssigned = True
-                    break
-        
-        if apAssigned == False:
-            apID = "AP" + str(len(agentPools) + 1)                      # Construct new agent ID
+        apID, tlNames = agentPoolOfTL[tl.getName()]
+        if apID in agentPoolDict:
+            tl.assignToAgentPool(agentPoolDict[apID])
+            agentPoolDict[apID].addNewTrafficLight(tl)
+        else:
             agentPool = AgentPool(apID, tl.getPhases(), minIndividualRunsPerGen)                 # Create a new agent pool for traffic light
             agentPool.addNewTrafficLight(tl)                            # Assign traffic light to agent pool 
-            
+            agentPoolDict[apID] = agentPool
             agentPools.append(agentPool)                                # Add new pool to agent pools list
 
-            # Determine a traffic light's communication partners
-        for p in edgePartners[tl.getName()]:
-            for t in trafficLights:
-                if p == t.getName():
-                    communicationPartners[tl].append(t)                # If edge partner is a traffic light, add it to tl's entry in communicationPartner 
-        
-        tl.setCommunicationPartners(communicationPartners[tl])         # Set each TL's communication partners list
+        tl.setCommunicationPartners([trafficLightDict[p] for p in compiled["communicationPartners"][tl.getName()]])         # Set each TL's communication partners list
 
     return (userDefinedRules, trafficLights, agentPools)
+
+    # CREATE ALL AGENTS FOR A NETWORK; WITH A TOPOLOGY CACHE DIRECTORY, THE NETWORK IS ONLY PARSED WHEN IT OR THE USER DEFINED RULES HAVE CHANGED. WITH A DETECTOR FILE NAME, ALSO WRITE THE NETWORK'S DETECTORS TO IT
+def run(sumoNetworkName, minIndividualRunsPerGen, topologyCacheDir=None, detectorFile=None):
+    if topologyCacheDir is None:
+        compiled = compileTopology(sumoNetworkName)
+    else:
+        compiled = loadCompiledTopology(sumoNetworkName, topologyCacheDir)
+
+    if detectorFile is not None:
+        writeDetectorFile(compiled, detectorFile)
+
+    return buildSetUp(compiled, minIndividualRunsPerGen)
     
 # main entry point
 if __name__ == "__main__":
-    run("simpleNetwork.net.xml")
\ No newline at end of file
+    run("simpleNetwork.net.xml", 1)
\ No newline at end of file
@@ -8,7 +8,7 @@ class Intention:
         self.trafficLight = trafficLight
         self.action = action
         self.time = timeWhenCreated
-        self.turn = self.time/5
+        self.turn = self.time/trafficLight.getDecisionInterval()
 
         # RETURN CORRESPONDING TRAFFIC LIGHT OBJECT
     def getTrafficLight(self):
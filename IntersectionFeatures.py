@@ -0,0 +1,112 @@
+import os
+import sys
+
+class IntersectionFeatures:
+
+        # INITIALIZE AN EMPTY SNAPSHOT OF AN INTERSECTION'S STATE AT A GIVEN SIMULATION TIME
+    def __init__(self, trafficLight, time):
+        self.trafficLight = trafficLight
+        self.time = time                                    # Simulation time the snapshot was taken at
+        self.longestTimeWaitedToProceedStraight = 0
+        self.longestTimeWaitedToTurnLeft = 0
+        self.numCarsWaitingToProceedStraight = 0
+        self.numCarsWaitingToTurnLeft = 0
+        self.carsWaiting = {}                               # Stopped vehIDs and their accumulated waiting times (used for rule rewards)
+        self.jamLength = 0                                  # Total length (m) of the queues in the incoming lanes, if read from detectors
+        self.phaseName = ""
+        self.phaseNameSplit = []                            # Phase name split into direction, movement and colour (ex: ["H", "S", "G"])
+        self.phaseDuration = 0                              # Total duration of the current phase
+        self.timeInPhase = 0                                # Time elapsed since the current phase began
+        self.featureValues = None
+
+        # RETURN THE TRAFFIC LIGHT THE SNAPSHOT BELONGS TO
+    def getTrafficLight(self):
+        return self.trafficLight
+
+        # RETURN THE SIMULATION TIME THE SNAPSHOT WAS TAKEN AT
+    def getTime(self):
+        return self.time
+
+        # ADD A STOPPED VEHICLE TO THE SNAPSHOT; movement IS "L" FOR LEFT TURN LANES AND "S" OTHERWISE
+    def addStoppedVehicle(self, vehID, movement, waitingTime, accumulatedWaitingTime):
+        self.carsWaiting[vehID] = accumulatedWaitingTime
+
+        if movement == "L":
+            if waitingTime > self.longestTimeWaitedToTurnLeft:
+                self.longestTimeWaitedToTurnLeft = waitingTime
+            if waitingTime > 0:
+                self.numCarsWaitingToTurnLeft += 1
+        else:
+            if waitingTime > self.longestTimeWaitedToProceedStraight:
+                self.longestTimeWaitedToProceedStraight = waitingTime
+            if waitingTime > 0:
+                self.numCarsWaitingToProceedStraight += 1
+
+        # ADD THE QUEUE OF AN INCOMING LANE, AS READ FROM A LANE OR ITS DETECTOR, TO THE SNAPSHOT; waitingTime IS THE TOTAL WAITING TIME OF THE LANE'S VEHICLES
+    def addLaneQueue(self, laneID, movement, numHalting, waitingTime, jamLength=0):
+        if numHalting == 0:
+            return
+        meanWaitingTime = waitingTime/numHalting
+        self.jamLength += jamLength
+
+            # Queued vehicles are not identified, so each gets a position in its lane's queue and the lane's mean waiting time. Throughput rewards compare queues position by position
+        for position in range(numHalting):
+            self.carsWaiting[laneID + "#" + str(position)] = meanWaitingTime
+
+            # Longest waits are approximated by the lane with the longest mean wait
+        if movement == "L":
+            self.longestTimeWaitedToTurnLeft = max(self.longestTimeWaitedToTurnLeft, meanWaitingTime)
+            self.numCarsWaitingToTurnLeft += numHalting
+        else:
+            self.longestTimeWaitedToProceedStraight = max(self.longestTimeWaitedToProceedStraight, meanWaitingTime)
+            self.numCarsWaitingToProceedStraight += numHalting
+
+        # SET THE CURRENT PHASE OF THE TRAFFIC LIGHT BY ITS INDEX, LOOKING IT UP IN THE TRAFFIC LIGHT'S PHASE TABLE
+    def setPhase(self, phaseIndex, phaseDuration, timeInPhase):
+        phaseTable = self.trafficLight.getPhaseTable()
+        self.phaseName = phaseTable.getName(phaseIndex)
+        self.phaseNameSplit = phaseTable.getNameSplit(phaseIndex)
+        self.phaseDuration = phaseDuration
+        self.timeInPhase = timeInPhase
+
+    def getLongestTimeWaitedToProceedStraight(self):
+        return self.longestTimeWaitedToProceedStraight
+
+    def getLongestTimeWaitedToTurnLeft(self):
+        return self.longestTimeWaitedToTurnLeft
+
+    def getNumCarsWaitingToProceedStraight(self):
+        return self.numCarsWaitingToProceedStraight
+
+    def getNumCarsWaitingToTurnLeft(self):
+        return self.numCarsWaitingToTurnLeft
+
+        # RETURN DICTIONARY OF STOPPED VEHIDs AND THEIR ACCUMULATED WAITING TIMES
+    def getCarsWaiting(self):
+        return self.carsWaiting
+
+    def getJamLength(self):
+        return self.jamLength
+
+    def getPhaseName(self):
+        return self.phaseName
+
+    def getPhaseNameSplit(self):
+        return self.phaseNameSplit
+
+        # RETURN COLOUR OF THE CURRENT PHASE (G OR Y)
+    def getPhaseColour(self):
+        return self.phaseNameSplit[2]
+
+    def getPhaseDuration(self):
+        return self.phaseDuration
+
+    def getTimeInPhase(self):
+        return self.timeInPhase
+
+        # RETURN FEATURE VALUES READ BY COMPILED PREDICATES, INDEXED BY PredicateEngine.rsFeatureIDs
+    def getFeatureValues(self):
+        if self.featureValues is None:
+            self.featureValues = [self.longestTimeWaitedToProceedStraight, self.longestTimeWaitedToTurnLeft, self.numCarsWaitingToProceedStraight, self.numCarsWaitingToTurnLeft, self.phaseDuration, self.phaseName]
+
+        return self.featureValues
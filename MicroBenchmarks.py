@@ -0,0 +1,296 @@
+import os
+import sys
+import io
+import copy
+import json
+import time
+import optparse
+import platform
+import tempfile
+import contextlib
+
+import InitSetUp
+import RandomStreams
+import EvolutionaryLearner
+import ReinforcementLearner
+from Driver import Driver
+from Intention import Intention
+from IntersectionFeatures import IntersectionFeatures
+from SimulationSession import SimulationSession
+
+# Micro-benchmarks of the learning hot paths: rule matching and selection at every traffic light
+# decision, rule weight updates, breeding a new generation and the initial set-up. Agent pools are
+# created randomly from a network as in training, and rules are matched against synthetic
+# intersection snapshots and communicated intentions, so no SUMO process is needed; the stand-in
+# simulator only provides the simulation time. Results (per-call times in microseconds) are written
+# as JSON (by default into benchmarkResults/, which git ignores) and can be compared against an
+# earlier results file used as a baseline:
+#   python MicroBenchmarks.py -o benchmarkResults/baseline.json
+#   python MicroBenchmarks.py -b benchmarkResults/baseline.json
+# A benchmark whose per-call time grew by more than the tolerance is reported as a regression, and
+# the script exits with status 1.
+
+global defaultNetwork
+global defaultSumoCmd
+global defaultResultsFile
+global defaultRepeats
+global defaultTolerance
+global benchmarkSeed
+global numSnapshots
+global maxCarsWaiting
+global snapshotTime
+defaultNetwork = "simpleNetwork.net.xml"
+defaultSumoCmd = ["sumo", "-c", "config_file.sumocfg"]     # Only read by the stand-in simulator
+defaultResultsFile = os.path.join("benchmarkResults", "microBenchmarks.json")
+defaultRepeats = 5                  # Each benchmark reports the fastest of this many repeats
+defaultTolerance = 0.2              # Fraction a per-call time may grow by before it is a regression
+benchmarkSeed = 0                   # Seed of every random stream, so runs benchmark the same agent pools and snapshots
+numSnapshots = 50                   # Synthetic intersection snapshots each traffic light's rules are matched against
+maxCarsWaiting = 30                 # Largest number of stopped vehicles in a synthetic snapshot
+snapshotTime = 20                   # Simulation time (s) of the snapshots; communicated intentions are sent up to 10 s before it
+
+def get_options():
+    opt_parser = optparse.OptionParser()
+    opt_parser.add_option("-o", "--output", default=defaultResultsFile, help="file the results are written to")
+    opt_parser.add_option("-b", "--baseline", default=None, help="results file to compare the results against")
+    opt_parser.add_option("-t", "--tolerance", type="float", default=defaultTolerance, help="fraction a per-call time may grow by before it is a regression")
+    opt_parser.add_option("-r", "--repeats", type="int", default=defaultRepeats, help="number of times each benchmark is repeated")
+    opt_parser.add_option("-n", "--network", default=defaultNetwork, help="SUMO network the agent pools are created for")
+    options, args = opt_parser.parse_args()
+    return options
+
+    # RETURN THE FASTEST PER-CALL TIME (S) OF A BENCHMARK OVER A NUMBER OF REPEATS; prepare RETURNS (FUNCTION MAKING numCalls CALLS, numCalls) AND IS NOT TIMED
+def timeBenchmark(prepare, repeats):
+    perCallTimes = []
+    for r in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):     # The learning code prints as it goes
+            run, numCalls = prepare()
+            start = time.perf_counter()
+            run()
+            perCallTimes.append((time.perf_counter() - start)/numCalls)
+
+    return min(perCallTimes)
+
+    # CREATE A SYNTHETIC SNAPSHOT OF AN INTERSECTION WITH A RANDOM QUEUE AND PHASE
+def createSnapshot(driver, trafficLight, time, randomGenerator):
+    features = IntersectionFeatures(trafficLight, time)
+    lanes = trafficLight.getLanes()
+    for v in range(randomGenerator.integers(maxCarsWaiting + 1)):
+        lane = lanes[randomGenerator.integers(len(lanes))]
+        waitingTime = float(randomGenerator.integers(0, 120))
+        features.addStoppedVehicle(trafficLight.getName() + "_veh" + str(v), driver.laneIndex[lane][1], waitingTime, waitingTime + float(randomGenerator.integers(0, 60)))
+
+    phaseDuration = float(randomGenerator.integers(5, 60))
+    features.setPhase(int(randomGenerator.integers(trafficLight.getPhaseTable().getNumPhases())), phaseDuration, float(randomGenerator.integers(0, phaseDuration + 1)))
+    return features
+
+    # CREATE RANDOM AGENT POOLS FOR A NETWORK AND A DRIVER MATCHING THEIR RULES AGAINST SYNTHETIC SNAPSHOTS; RETURNS (DRIVER, SESSION, SNAPSHOTS)
+def setUpBenchmarks(networkName, sumoCmd):
+    randomGenerator = RandomStreams.getGenerator("benchmarks")
+    with contextlib.redirect_stdout(io.StringIO()):
+        setUpTuple = InitSetUp.run(networkName, 1)
+        session = SimulationSession(sumoCmd, backend="standin")
+        driver = Driver(sumoCmd, setUpTuple, 225, 5, 10000, session=session)
+        session.startEpisode()
+        driver.subscribeToIntersections(setUpTuple[1])
+        session.getBackend().simulationStep(snapshotTime)
+
+        for tl in setUpTuple[1]:
+            tl.assignIndividual()
+            for partner in tl.getCommunicationPartners():
+                actionSet = partner.getAgentPool().getActionSet()
+                tl.recieveIntention(Intention(partner, int(randomGenerator.integers(len(actionSet))), snapshotTime - int(randomGenerator.integers(0, 11))))
+
+    snapshots = []
+    for s in range(numSnapshots):
+        snapshots.append({tl.getName(): createSnapshot(driver, tl, snapshotTime, randomGenerator) for tl in setUpTuple[1]})
+
+    return driver, session, snapshots
+
+    # RETURN A BENCHMARK MATCHING EVERY TRAFFIC LIGHT'S RULES AGAINST EVERY SNAPSHOT; ONE CALL IS ONE TRAFFIC LIGHT DECISION
+def benchmarkGetValidRules(driver, snapshots):
+    trafficLights = driver.setUpTuple[1]
+    def prepare():
+        def run():
+            for snapshot in snapshots:
+                driver.intersectionFeatures = snapshot
+                for tl in trafficLights:
+                    driver.getValidRules(tl, tl.getAssignedIndividual())
+        return run, len(snapshots)*len(trafficLights)
+    return prepare
+
+    # RETURN A BENCHMARK EVALUATING EVERY RS (ruleType 0) OR RSint (ruleType 1) RULE OF EVERY TRAFFIC LIGHT AGAINST EVERY SNAPSHOT; ONE CALL IS ONE RULE
+def benchmarkEvaluateRule(driver, snapshots, ruleType):
+    trafficLights = driver.setUpTuple[1]
+    rules = []
+    for tl in trafficLights:
+        ruleSet = tl.getAssignedIndividual().getRS() if ruleType == 0 else tl.getAssignedIndividual().getRSint()
+        rules += [(tl, rule) for rule in ruleSet]
+    evaluate = driver.evaluateRule if ruleType == 0 else driver.evaluateCoopRule
+    def prepare():
+        def run():
+            for snapshot in snapshots:
+                driver.intersectionFeatures = snapshot
+                for tl, rule in rules:
+                    evaluate(tl, rule)
+        return run, len(snapshots)*len(rules)
+    return prepare
+
+    # RETURN A BENCHMARK SELECTING A RULE FROM THE VALID RS (coop False) OR RSint (coop True) RULES OF EVERY DECISION; ONE CALL IS ONE SELECTION
+def benchmarkSelectRule(driver, snapshots, coop):
+    decisions = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for snapshot in snapshots:
+            driver.intersectionFeatures = snapshot
+            for tl in driver.setUpTuple[1]:
+                validRules = driver.getValidRules(tl, tl.getAssignedIndividual())
+                decisions.append((tl, validRules[1] if coop else validRules[0]))
+    def prepare():
+        def run():
+            for tl, validRules in decisions:
+                if coop:
+                    tl.getAssignedIndividual().selectCoopRule(validRules, tl.getRandomGenerator())
+                else:
+                    tl.getAssignedIndividual().selectRule(validRules, tl.getRandomGenerator())
+        return run, len(decisions)
+    return prepare
+
+    # RETURN A BENCHMARK UPDATING RULE WEIGHTS FROM RANDOM REWARDS; ONE CALL IS ONE UPDATE
+def benchmarkUpdatedWeight(driver):
+    randomGenerator = RandomStreams.getGenerator("benchmarks")
+    rules = []
+    for tl in driver.setUpTuple[1]:
+        rules += tl.getAssignedIndividual().getRS() + tl.getAssignedIndividual().getRSint()
+    updates = []
+    for u in range(1000):
+        updates.append((rules[randomGenerator.integers(len(rules))], rules[randomGenerator.integers(len(rules))], randomGenerator.random(), randomGenerator.random(), int(randomGenerator.integers(-5, 6))))
+    def prepare():
+        def run():
+            for rule, nextRule, throughputRatio, waitTimeReducedRatio, queueDifference in updates:
+                ReinforcementLearner.updatedWeight(rule, nextRule, throughputRatio, waitTimeReducedRatio, queueDifference)
+        return run, len(updates)
+    return prepare
+
+    # RETURN A COPY OF A DRIVER'S AGENT POOLS WITH RANDOM FITNESSES, AS AFTER A GENERATION'S RUNS
+def copyAgentPoolsWithFitnesses(driver):
+    randomGenerator = RandomStreams.getGenerator("benchmarks")
+    agentPools = copy.deepcopy(driver.setUpTuple[2])
+    for ap in agentPools:
+        for i in ap.getIndividualsSet():
+            i.updateFitness(float(randomGenerator.integers(1000, 10000)))
+        ap.normalizeIndividualsFitnesses()
+
+    return agentPools
+
+    # RETURN A BENCHMARK BREEDING A CHILD FROM EVERY PAIR OF NEIGHBOURING INDIVIDUALS IN EACH AGENT POOL; ONE CALL IS ONE CHILD
+def benchmarkCrossover(driver):
+    def prepare():
+        pairs = []
+        for ap in copyAgentPoolsWithFitnesses(driver):
+            individuals = ap.getIndividualsSet()
+            pairs += [(individuals[i], individuals[i + 1]) for i in range(len(individuals) - 1)]
+        def run():
+            for parent1, parent2 in pairs:
+                EvolutionaryLearner.crossover(parent1, parent2)
+        return run, len(pairs)
+    return prepare
+
+    # RETURN A BENCHMARK MUTATING EVERY INDIVIDUAL OF EVERY AGENT POOL ONCE; ONE CALL IS ONE MUTATION
+def benchmarkMutate(driver):
+    def prepare():
+        individuals = []
+        for ap in copyAgentPoolsWithFitnesses(driver):
+            individuals += ap.getIndividualsSet()
+        def run():
+            for i in individuals:
+                EvolutionaryLearner.mutate(i)
+        return run, len(individuals)
+    return prepare
+
+    # RETURN A BENCHMARK CREATING A NEW GENERATION OF EVERY AGENT POOL; ONE CALL IS ONE GENERATION. GENERATION FILES ARE WRITTEN TO A TEMPORARY DIRECTORY
+def benchmarkCreateNewGeneration(driver):
+    def prepare():
+        agentPools = copyAgentPoolsWithFitnesses(driver)
+        def run():
+            cwd = os.getcwd()
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                try:
+                    EvolutionaryLearner.createNewGeneration(agentPools)
+                finally:
+                    os.chdir(cwd)
+        return run, 1
+    return prepare
+
+    # RETURN A BENCHMARK OF THE INITIAL SET-UP OF A NETWORK, WITHOUT A TOPOLOGY CACHE; ONE CALL IS ONE SET-UP
+def benchmarkInitSetUp(networkName):
+    def prepare():
+        def run():
+            InitSetUp.run(networkName, 1)
+        return run, 1
+    return prepare
+
+    # RUN EVERY BENCHMARK; RETURNS A DICTIONARY OF BENCHMARK NAMES AND PER-CALL TIMES IN MICROSECONDS
+def run(networkName=defaultNetwork, sumoCmd=defaultSumoCmd, repeats=defaultRepeats):
+    RandomStreams.seed(benchmarkSeed)
+    driver, session, snapshots = setUpBenchmarks(networkName, sumoCmd)
+    benchmarks = [
+        ("Driver.getValidRules", benchmarkGetValidRules(driver, snapshots)),
+        ("Driver.evaluateRule", benchmarkEvaluateRule(driver, snapshots, 0)),
+        ("Driver.evaluateCoopRule", benchmarkEvaluateRule(driver, snapshots, 1)),
+        ("Individual.selectRule", benchmarkSelectRule(driver, snapshots, False)),
+        ("Individual.selectCoopRule", benchmarkSelectRule(driver, snapshots, True)),
+        ("ReinforcementLearner.updatedWeight", benchmarkUpdatedWeight(driver)),
+        ("EvolutionaryLearner.crossover", benchmarkCrossover(driver)),
+        ("EvolutionaryLearner.mutate", benchmarkMutate(driver)),
+        ("EvolutionaryLearner.createNewGeneration", benchmarkCreateNewGeneration(driver)),
+        ("InitSetUp.run", benchmarkInitSetUp(networkName)),
+    ]
+
+    results = {}
+    for name, prepare in benchmarks:
+        results[name] = timeBenchmark(prepare, repeats)*1e6
+        print("{:<42}{:>14.2f} us".format(name, results[name]))
+    session.close()
+
+    return results
+
+    # WRITE BENCHMARK RESULTS AND THE CONDITIONS THEY WERE MEASURED IN TO A JSON FILE
+def saveResults(results, fileName, networkName, repeats):
+    if os.path.dirname(fileName) != "":
+        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+    with open(fileName, "w") as f:
+        json.dump({"network": networkName, "repeats": repeats, "seed": benchmarkSeed, "python": platform.python_version(), "machine": platform.machine(), "results": results}, f, indent=4)
+
+    # COMPARE BENCHMARK RESULTS AGAINST A BASELINE RESULTS FILE; RETURNS THE NAMES OF BENCHMARKS SLOWER THAN THE BASELINE BY MORE THAN THE TOLERANCE
+def compareWithBaseline(results, baselineFile, tolerance):
+    with open(baselineFile, "r") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print("\n{:<42}{:>14}{:>14}{:>10}".format("Benchmark", "Baseline (us)", "Current (us)", "Ratio"))
+    for name in results:
+        if name not in baseline:
+            print("{:<42}{:>14}{:>14.2f}".format(name, "-", results[name]))
+            continue
+        ratio = results[name]/baseline[name]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("{:<42}{:>14.2f}{:>14.2f}{:>10.2f}{}".format(name, baseline[name], results[name], ratio, flag))
+
+    return regressions
+
+# main entry point
+if __name__ == "__main__":
+    options = get_options()
+    results = run(options.network, defaultSumoCmd, options.repeats)
+    saveResults(results, options.output, options.network, options.repeats)
+    print("Results written to", options.output)
+
+    if options.baseline is not None:
+        regressions = compareWithBaseline(results, options.baseline, options.tolerance)
+        if len(regressions) > 0:
+            print(len(regressions), "benchmark(s) regressed by more than", str(int(options.tolerance*100)) + "%:", ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,159 @@
+import os
+import sys
+import multiprocessing
+
+from sumolib.miscutils import getFreeSocketPort
+
+import RandomStreams
+from Driver import Driver
+from SimulationSession import SimulationSession
+from TimingStats import TimingStats
+
+# Runs the episodes of a generation on a pool of worker processes, each driving its own SUMO
+# instance over a labelled TraCI connection on its own port. Episodes are planned up front in the
+# main process so every individual gets its minimum number of runs, then split between workers.
+# Workers return the fitness results and rule weight changes of their copies of the agent pools,
+# which are merged back into the main process's agent pools. Episodes are numbered across the whole
+# run and each one chooses rules from random streams keyed by its number, so repeating a run with
+# the same seed and number of workers repeats its results exactly.
+
+    # CREATE A POOL OF WORKER PROCESSES
+def createWorkerPool(numWorkers):
+    return multiprocessing.Pool(processes=numWorkers)
+
+    # RUN ALL EPISODES NEEDED FOR A GENERATION IN PARALLEL AND MERGE THE RESULTS INTO THE AGENT POOLS; firstEpisode IS THE NUMBER OF THE GENERATION'S FIRST EPISODE AND timings OPTIONALLY COLLECTS THE EPISODES' TIMING STATS. RETURNS THE NUMBER OF EPISODES RUN
+def evaluateGeneration(workerPool, numWorkers, sumoCmd, setUpTuple, minIndividualRunsPerGen, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, backend="traci", firstEpisode=0, featureMode="vehicles", timings=None):
+    episodes = planEpisodes(setUpTuple, minIndividualRunsPerGen)
+
+        # Deal episodes out to workers in turn, each with its number
+    tasks = []
+    for w in range(numWorkers):
+        workerEpisodes = [(firstEpisode + e, episodes[e]) for e in range(w, len(episodes), numWorkers)]
+        if len(workerEpisodes) > 0:
+            tasks.append((w, sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, backend, featureMode, RandomStreams.getEntropy(), workerEpisodes))
+
+    for workerResults, workerTimings in workerPool.map(runWorkerEpisodes, tasks):
+        mergeWorkerResults(setUpTuple[2], workerResults)
+        if timings is not None:
+            timings.merge(workerTimings)
+
+    return len(episodes)
+
+    # DECIDE WHICH INDIVIDUAL EACH TRAFFIC LIGHT USES IN EACH EPISODE UNTIL ALL INDIVIDUALS HAVE HAD THEIR MINIMUM NUMBER OF RUNS
+def planEpisodes(setUpTuple, minIndividualRunsPerGen):
+    trafficLights = setUpTuple[1]
+    agentPools = setUpTuple[2]
+    episodes = []
+
+    while individualsNeedRuns(agentPools, minIndividualRunsPerGen):
+        assignment = {}
+        for tl in trafficLights:
+            ap = tl.getAgentPool()
+            individual = ap.selectIndividual()
+            individual.selected()   # Selection is recorded here since workers only see copies of the individuals
+            assignment[tl.getName()] = (ap.getID(), ap.getIndividualsSet().index(individual))
+        episodes.append(assignment)
+
+    return episodes
+
+    # RETURN TRUE IF ANY INDIVIDUAL HAS NOT YET HAD ITS MINIMUM NUMBER OF RUNS THIS GENERATION
+def individualsNeedRuns(agentPools, minIndividualRunsPerGen):
+    for ap in agentPools:
+        for i in ap.getIndividualsSet():
+            if i.needsRuns(minIndividualRunsPerGen):
+                return True
+    return False
+
+    # WORKER ENTRY POINT: RUN A LIST OF PLANNED EPISODES ON THIS WORKER'S OWN SUMO INSTANCE AND RETURN WHAT CHANGED, WITH THE EPISODES' TIMING STATS
+def runWorkerEpisodes(task):
+    workerIndex, sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, backend, featureMode, entropy, episodes = task
+    RandomStreams.seed(entropy)     # Workers may be started without the main process's module state
+    agentPools = {}
+    for ap in setUpTuple[2]:
+        agentPools[ap.getID()] = ap
+
+    snapshot = takeSnapshot(setUpTuple[2])
+    session = SimulationSession(sumoCmd, "worker" + str(workerIndex), getFreeSocketPort(), backend=backend)   # One SUMO process serves all of the worker's episodes
+    timings = TimingStats()
+
+    for episode, assignment in episodes:
+        assignedIndividuals = {}
+        for tlName in assignment:
+            apID, index = assignment[tlName]
+            assignedIndividuals[tlName] = agentPools[apID].getIndividualsSet()[index]
+
+        simRunner = Driver(sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, session=session, featureMode=featureMode)
+        simRunner.run(assignedIndividuals, episode)
+        timings.merge(simRunner.getTimings())
+
+    session.close()
+    print(session.getLabel(), "setup/teardown overhead for", len(episodes), "episodes:", round(session.getTotalOverhead(), 2))
+    return getChangesSinceSnapshot(setUpTuple[2], snapshot), timings
+
+    # RECORD THE FITNESS RESULTS AND RULE WEIGHTS OF EVERY INDIVIDUAL BEFORE A WORKER RUNS ITS EPISODES
+def takeSnapshot(agentPools):
+    individuals = {}
+    rules = {}
+    for ap in agentPools:
+        for index, i in enumerate(ap.getIndividualsSet()):
+            individuals[(ap.getID(), index)] = (len(i.getRunFitnessResults()), i.getAggregateVehicleWaitTime())
+            for ruleLocation, rule in getRuleLocations(ap.getID(), index, i):
+                    # Rules can be shared between individuals, so each rule is only recorded at its first location
+                if id(rule) not in rules:
+                    rules[id(rule)] = (ruleLocation, rule.getWeight())
+
+    return (individuals, rules)
+
+    # RETURN ((apID, individual index, rule set name, rule index), rule) PAIRS FOR EVERY RULE OF AN INDIVIDUAL
+def getRuleLocations(apID, index, individual):
+    locations = []
+    for ruleIndex, rule in enumerate(individual.getRS()):
+        locations.append(((apID, index, "RS", ruleIndex), rule))
+    for ruleIndex, rule in enumerate(individual.getRSint()):
+        locations.append(((apID, index, "RSint", ruleIndex), rule))
+
+    return locations
+
+    # RETURN THE NEW FITNESS RESULTS, WAIT TIMES AND RULE WEIGHT CHANGES OF EVERY INDIVIDUAL SINCE A SNAPSHOT
+def getChangesSinceSnapshot(agentPools, snapshot):
+    individualSnapshot, ruleSnapshot = snapshot
+    individualChanges = {}
+    ruleWeightChanges = []
+
+    for ap in agentPools:
+        for index, i in enumerate(ap.getIndividualsSet()):
+            numResultsBefore, aggregateWaitTimeBefore = individualSnapshot[(ap.getID(), index)]
+            newResults = i.getRunFitnessResults()[numResultsBefore:]
+            if len(newResults) > 0:
+                individualChanges[(ap.getID(), index)] = (newResults, i.getAggregateVehicleWaitTime() - aggregateWaitTimeBefore, i.getLastRunTime())
+
+            for ruleLocation, rule in getRuleLocations(ap.getID(), index, i):
+                if id(rule) in ruleSnapshot and ruleSnapshot[id(rule)][0] == ruleLocation:
+                    weightChange = rule.getWeight() - ruleSnapshot[id(rule)][1]
+                    if weightChange != 0:
+                        ruleWeightChanges.append((ruleLocation, weightChange))
+
+    return (individualChanges, ruleWeightChanges)
+
+    # APPLY THE CHANGES REPORTED BY A WORKER TO THE MAIN PROCESS'S AGENT POOLS
+def mergeWorkerResults(agentPools, workerResults):
+    individualChanges, ruleWeightChanges = workerResults
+    individuals = {}
+    for ap in agentPools:
+        for index, i in enumerate(ap.getIndividualsSet()):
+            individuals[(ap.getID(), index)] = i
+
+    for key in individualChanges:
+        newResults, aggregateWaitTimeChange, lastRunTime = individualChanges[key]
+        i = individuals[key]
+        i.addRunFitnessResults(newResults)
+        i.updateAggregateVehicleWaitTime(aggregateWaitTimeChange)
+        i.updateLastRunTime(lastRunTime)
+
+    for ruleLocation, weightChange in ruleWeightChanges:
+        apID, index, ruleSetName, ruleIndex = ruleLocation
+        if ruleSetName == "RS":
+            rule = individuals[(apID, index)].getRS()[ruleIndex]
+        else:
+            rule = individuals[(apID, index)].getRSint()[ruleIndex]
+        rule.updateWeight(weightChange)
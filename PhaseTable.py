@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Table of a traffic light's phases, built once from the phases of its tlLogic in the network file so
+# that phase predicates and user defined rule actions look phases up by index instead of reading and
+# splitting phase names every step. Phase names are of the form direction_movement_colour (ex:
+# "V_S_G"); components missing from a name are left empty.
+
+class PhaseTable:
+
+        # BUILD THE TABLE FROM A TRAFFIC LIGHT'S PHASE NAMES, IN PHASE INDEX ORDER
+    def __init__(self, phaseNames):
+        self.names = list(phaseNames)
+        self.nameSplits = []            # Phase index -> (direction, movement, colour)
+        for name in self.names:
+            components = name.split("_")[:3]
+            self.nameSplits.append(tuple(components) + ("",)*(3 - len(components)))
+
+            # Phases run in index order, wrapping around to the first phase after the last
+        self.nextPhases = [(i + 1) % len(self.names) for i in range(len(self.names))]
+
+            # The yellow phase of a phase is the next yellow phase with the same direction and movement, or simply the next phase if there is none
+        self.nextYellows = []
+        for i in range(len(self.names)):
+            direction, movement, colour = self.nameSplits[i]
+            nextYellow = self.nextPhases[i]
+            for step in range(1, len(self.names)):
+                j = (i + step) % len(self.names)
+                if self.nameSplits[j] == (direction, movement, "Y"):
+                    nextYellow = j
+                    break
+            self.nextYellows.append(nextYellow)
+
+    def getNumPhases(self):
+        return len(self.names)
+
+    def getName(self, phaseIndex):
+        return self.names[phaseIndex]
+
+        # RETURN (DIRECTION, MOVEMENT, COLOUR) OF A PHASE
+    def getNameSplit(self, phaseIndex):
+        return self.nameSplits[phaseIndex]
+
+        # RETURN COLOUR OF A PHASE (G OR Y)
+    def getColour(self, phaseIndex):
+        return self.nameSplits[phaseIndex][2]
+
+        # RETURN THE INDEX OF THE PHASE THAT FOLLOWS A PHASE IN THE SCHEDULE
+    def getNextPhase(self, phaseIndex):
+        return self.nextPhases[phaseIndex]
+
+        # RETURN THE INDEX OF THE YELLOW PHASE ENDING A PHASE IN THE SAME DIRECTION
+    def getNextYellow(self, phaseIndex):
+        return self.nextYellows[phaseIndex]
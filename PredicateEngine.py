@@ -0,0 +1,141 @@
+import os
+import sys
+import math
+import re
+
+import CoopPredicateSet
+
+# Compiles rule conditions (predicate names such as "numCarsWaitingToTurnLeft_3_6") once into
+# (featureID, lower, upper) tuples so that a rule can be evaluated with plain comparisons instead
+# of splitting its predicate names and looking them up with getattr at every decision step.
+#
+# An interval condition holds when lower < value <= upper. Conditions that are not intervals
+# (phase and intended action checks) store a test function as lower and None as upper.
+
+    # RS feature IDs; order must match IntersectionFeatures.getFeatureValues()
+global rsFeatureIDs
+rsFeatureIDs = {
+    "longestTimeWaitedToProceedStraight": 0,
+    "longestTimeWaitedToTurnLeft": 1,
+    "numCarsWaitingToProceedStraight": 2,
+    "numCarsWaitingToTurnLeft": 3,
+    "timeSpentInCurrentPhase": 4,
+    "phaseName": 5
+}
+
+    # RSint feature IDs; order must match getIntentionFeatureValues()
+global coopFeatureIDs
+coopFeatureIDs = {
+    "timeSinceCommunication": 0,
+    "intendedActionIs": 1,
+    "intention": 2
+}
+
+    # Interval predicate families whose upper bound is exclusive (ex: 0 < timeSinceCommunication < 5)
+global exclusiveUpperBoundFamilies
+exclusiveUpperBoundFamilies = ["timeSinceCommunication"]
+
+    # Phase predicate name components mapped to the corresponding components of SUMO phase names (ex: "V_S_G")
+global phaseDirections
+global phaseMovements
+global phaseColours
+phaseDirections = {"vertical": "V", "horizontal": "H", "northSouth": "NS", "southNorth": "SN", "eastWest": "EW", "westEast": "WE"}
+phaseMovements = {"": ["S", "SL"], "LeftTurn": ["L", "SL"]}
+phaseColours = {"Green": "G", "Yellow": "Y"}
+global phasePredicatePattern
+phasePredicatePattern = re.compile("^(" + "|".join(phaseDirections) + ")PhaseIs(LeftTurn)?_(Green|Yellow)$")
+
+global compiledRSConditions
+global compiledCoopConditions
+compiledRSConditions = {}       # Cache of compiled RS conditions, keyed by predicate name
+compiledCoopConditions = {}     # Cache of compiled RSint conditions, keyed by predicate name
+
+    # RETURN THE COMPILED FORM OF AN RS CONDITION, COMPILING IT ON FIRST USE
+def compileCondition(cond):
+    compiled = compiledRSConditions.get(cond)
+    if compiled is None:
+        compiled = parseCondition(cond)
+        compiledRSConditions[cond] = compiled
+
+    return compiled
+
+    # RETURN THE COMPILED FORM OF AN RSint CONDITION, COMPILING IT ON FIRST USE
+def compileCoopCondition(cond):
+    compiled = compiledCoopConditions.get(cond)
+    if compiled is None:
+        compiled = parseCoopCondition(cond)
+        compiledCoopConditions[cond] = compiled
+
+    return compiled
+
+    # PARSE AN RS PREDICATE NAME INTO A (featureID, lower, upper) TUPLE
+def parseCondition(cond):
+    predicateSplit = cond.split("_")
+    predicate = predicateSplit[0]
+
+    if predicate in rsFeatureIDs:
+        lower, upper = parseInterval(predicate, predicateSplit[1:])
+        return (rsFeatureIDs[predicate], lower, upper)
+
+    phaseMatch = phasePredicatePattern.match(cond)
+    if phaseMatch:
+        direction = phaseDirections[phaseMatch.group(1)]
+        colour = phaseColours[phaseMatch.group(3)]
+            # A phase predicate is true for any phase name with its direction and colour and a matching movement
+        acceptedPhases = frozenset(direction + "_" + movement + "_" + colour for movement in phaseMovements[phaseMatch.group(2) or ""])
+        return (rsFeatureIDs["phaseName"], acceptedPhases.__contains__, None)
+
+    raise ValueError("Cannot compile unknown predicate: " + cond)
+
+    # PARSE AN RSint PREDICATE NAME INTO A (featureID, lower, upper) TUPLE
+def parseCoopCondition(cond):
+    predicateSplit = cond.split("_")
+    predicate = predicateSplit[0]
+
+    if predicate == "timeSinceCommunication":
+        lower, upper = parseInterval(predicate, predicateSplit[1:])
+        return (coopFeatureIDs[predicate], lower, upper)
+
+    elif predicate == "intendedActionIs":
+        return (coopFeatureIDs[predicate], getattr(CoopPredicateSet, cond), None)
+
+    else:       # Custom predicates (of form TLname_action) are all handled by CoopPredicateSet.customPredicate
+        return (coopFeatureIDs["intention"], evaluateCustomPredicate, None)
+
+    # RETURN (lower, upper) BOUNDS OF AN INTERVAL PREDICATE FROM THE NUMBERS IN ITS NAME
+def parseInterval(predicate, bounds):
+        # A single 0 means the value must equal 0 (ex: numCarsWaitingToTurnLeft_0)
+    if len(bounds) == 1 and float(bounds[0]) == 0:
+        return (math.nextafter(0.0, -math.inf), 0.0)
+
+        # Any other single bound is an open-ended interval (ex: timeSpentInCurrentPhase_300)
+    elif len(bounds) == 1:
+        return (float(bounds[0]), math.inf)
+
+    lower = float(bounds[0])
+    upper = float(bounds[1])
+    if predicate in exclusiveUpperBoundFamilies:
+        upper = math.nextafter(upper, -math.inf)
+
+    return (lower, upper)
+
+    # EVALUATE A CUSTOM PREDICATE AGAINST A COMMUNICATED INTENTION
+def evaluateCustomPredicate(intention):
+    return CoopPredicateSet.customPredicate(str(intention.getTrafficLight().getName()) + "_" + str(intention.getAction()), intention)
+
+    # RETURN THE RSint FEATURE VALUES OF A COMMUNICATED INTENTION AT A GIVEN TIME
+def getIntentionFeatureValues(intention, time):
+    return [time - intention.getTime(), intention.getAction(), intention]
+
+    # RETURN TRUE IF EVERY CONDITION HOLDS FOR THE GIVEN FEATURE VALUES; compile IS compileCondition FOR RS RULES AND compileCoopCondition FOR RSint RULES
+def evaluateConditions(conditions, featureValues, compile=compileCondition):
+    for cond in conditions:
+        featureID, lower, upper = compile(cond)
+        value = featureValues[featureID]
+        if upper is None:
+            if not lower(value):
+                return False
+        elif not lower < value <= upper:
+            return False
+
+    return True
@@ -0,0 +1,120 @@
+import os
+import sys
+import inspect
+
+import PredicateSet
+import CoopPredicateSet
+import PredicateEngine
+import RandomStreams
+
+# Registry of every predicate rules can use, built once when the module is imported so that creating
+# and mutating rules does not look the predicate modules up again. Each predicate is recorded with
+# its category and compiled form (category, featureID, lower, upper), as given by PredicateEngine:
+#   "RS"            - predicates of PredicateSet used in random RS rules
+#   "RSint"         - predicates of CoopPredicateSet used in random RSint rules
+#   "userDefined"   - predicates of PredicateSet only used by the agent pools' user-defined rules
+#   "agentSpecific" - custom predicates (of form TLname_action) for an agent pool's communication partners
+# Agent specific predicates depend on the topology, so they are built per agent pool on first use and
+# invalidated whenever traffic lights or communication partners change.
+
+    # Functions of the predicate modules that are not predicates
+global nonPredicateFunctions
+nonPredicateFunctions = {
+    PredicateSet: ["getPredicateList", "getRandomPredicate", "run"],
+    CoopPredicateSet: ["customPredicate", "getPredicateSet", "getPredicateSetFromFile", "getRandomPredicate", "getAgentSpecificPredicates", "run"]
+}
+
+global userDefinedPredicateNames
+userDefinedPredicateNames = ["emergencyVehicleApproachingVertical", "emergencyVehicleApproachingHorizontal", "maxGreenPhaseTimeReached", "maxYellowPhaseTimeReached"]
+
+global predicateInfo
+global rsPredicates
+global coopPredicates
+global userDefinedPredicates
+global agentSpecificPredicates
+predicateInfo = {}              # Predicate name -> (category, featureID, lower, upper)
+rsPredicates = []               # Names of RS predicates, in alphabetical order
+coopPredicates = []             # Names of RSint predicates, in alphabetical order
+userDefinedPredicates = []      # Names of user-defined predicates
+agentSpecificPredicates = {}    # Agent pool -> names of its agent specific predicates
+
+    # RETURN THE NAMES OF THE PREDICATE FUNCTIONS IN A MODULE, IN ALPHABETICAL ORDER
+def getPredicateNames(module):
+    return [name for name, function in inspect.getmembers(module, predicate=inspect.isfunction) if name not in nonPredicateFunctions[module]]
+
+    # FILL THE REGISTRY FROM THE PREDICATE MODULES
+def buildRegistry():
+    predicateInfo.clear()
+    rsPredicates.clear()
+    coopPredicates.clear()
+    userDefinedPredicates.clear()
+    agentSpecificPredicates.clear()
+
+    for name in getPredicateNames(PredicateSet):
+        if name in userDefinedPredicateNames:
+            userDefinedPredicates.append(name)
+            predicateInfo[name] = ("userDefined", None, getattr(PredicateSet, name), None)
+        else:
+            rsPredicates.append(name)
+            predicateInfo[name] = ("RS",) + PredicateEngine.compileCondition(name)
+
+    for name in getPredicateNames(CoopPredicateSet):
+        coopPredicates.append(name)
+        predicateInfo[name] = ("RSint",) + PredicateEngine.compileCoopCondition(name)
+
+    # FORGET THE AGENT SPECIFIC PREDICATES OF EVERY AGENT POOL; CALLED WHEN TRAFFIC LIGHTS OR COMMUNICATION PARTNERS CHANGE
+def invalidateTopology():
+    agentSpecificPredicates.clear()
+
+    # RETURN THE CATEGORY AND COMPILED FORM OF A PREDICATE, OR None IF IT IS NOT REGISTERED
+def getPredicateInfo(name):
+    return predicateInfo.get(name)
+
+def getRSPredicates():
+    return rsPredicates
+
+def getUserDefinedPredicates():
+    return userDefinedPredicates
+
+    # RETURN THE OLDEST AGE OF A COMMUNICATED INTENTION THAT A timeSinceCommunication PREDICATE CAN STILL MATCH
+def getIntentionLifetime():
+    timeFeatureID = PredicateEngine.coopFeatureIDs["timeSinceCommunication"]
+    return max(upper for category, featureID, lower, upper in predicateInfo.values() if category == "RSint" and featureID == timeFeatureID)
+
+    # RETURN THE CUSTOM PREDICATES FOR THE ACTIONS OF THE COMMUNICATION PARTNERS OF AN AGENT POOL'S TRAFFIC LIGHTS, BUILDING THEM ON FIRST USE
+def getAgentSpecificPredicates(agentPool):
+    predicates = agentSpecificPredicates.get(agentPool)
+    if predicates is None:
+        predicates = []
+        for tl in agentPool.getAssignedTrafficLights():
+            for partner in tl.getCommunicationPartners():
+                for action in partner.getAgentPool().getActionSet():
+                    pred = partner.getName() + "_" + action
+                    predicates.append(pred)
+                    predicateInfo[pred] = ("agentSpecific",) + PredicateEngine.compileCoopCondition(pred)
+        agentSpecificPredicates[agentPool] = predicates
+
+    return predicates
+
+    # RETURN ALL RSint PREDICATES AN AGENT POOL'S RULES CAN USE
+def getCoopPredicates(agentPool):
+    return coopPredicates + getAgentSpecificPredicates(agentPool)
+
+    # RETURN A RANDOM RS PREDICATE DRAWN FROM A GENERATOR, OR FROM THE REGISTRY'S OWN STREAM
+def getRandomRSPredicate(randomGenerator=None):
+    if randomGenerator is None:
+        randomGenerator = RandomStreams.getGenerator("predicateRegistry")
+    return rsPredicates[randomGenerator.integers(len(rsPredicates))]
+
+    # RETURN A RANDOM RSint PREDICATE FOR AN AGENT POOL, CHOSEN FROM ITS RSint AND AGENT SPECIFIC PREDICATES WITHOUT JOINING THEM; DRAWN FROM THE AGENT POOL'S STREAM UNLESS A GENERATOR IS GIVEN
+def getRandomCoopPredicate(agentPool, randomGenerator=None):
+    if randomGenerator is None:
+        randomGenerator = agentPool.getRandomGenerator()
+    agentSpecific = getAgentSpecificPredicates(agentPool)
+    index = randomGenerator.integers(len(coopPredicates) + len(agentSpecific))
+    if index < len(coopPredicates):
+        return coopPredicates[index]
+
+    return agentSpecific[index - len(coopPredicates)]
+
+buildRegistry()
@@ -339,7 +339,7 @@ def timeSpentInCurrentPhase_180_210(time):
         return False 
 
 def timeSpentInCurrentPhase_210_240(time):
-    if 210 < time <= 250:
+    if 210 < time <= 240:
         return True
     else:
         return False 
@@ -539,31 +539,15 @@ def maxYellowPhaseTimeReached(phase, timeInPhase, maxTime):
 #----------------------------- end -----------------------------#
 
 
-    # RETURN LIST OF PREDICATE FUNCTIONS
+    # RETURN LIST OF PREDICATE FUNCTIONS, EXCLUDING USER-DEFINED PREDICATES (SEE PredicateRegistry)
 def getPredicateList():
-    thisModule = sys.modules[__name__] # Get reference to this module for next operation
-    methodsDict = dict(inspect.getmembers(thisModule, predicate=inspect.isfunction)) # Get a dictionary with all methods (predicates) in this module
-        # Remove all methods that are not predicates from dictionary 
-    methodsDict.pop("getPredicateList")
-    methodsDict.pop("getRandomPredicate") 
-    methodsDict.pop("run")
-        # Remove all user define predicates
-    methodsDict.pop("emergencyVehicleApproachingVertical")
-    methodsDict.pop("emergencyVehicleApproachingHorizontal")
-    methodsDict.pop("maxGreenPhaseTimeReached")
-    methodsDict.pop("maxYellowPhaseTimeReached")
-
-        # Seperate methods/predicates from rest of data in dictionary into a list
-    predicateList = []
-    for predicate in methodsDict:
-        predicateList.append(predicate)
-    
-    return predicateList
+    import PredicateRegistry        # Imported here since the registry is built from this module
+    return list(PredicateRegistry.getRSPredicates())
 
     # RETURN RANDOM PREDICATE FROM LIST OF PREDICATE FUNCTIONS
 def getRandomPredicate():
-    predicateList = getPredicateList()
-    return (predicateList[randrange(len(predicateList))])
+    import PredicateRegistry
+    return PredicateRegistry.getRandomRSPredicate()
 
 
 def run():
@@ -0,0 +1,56 @@
+import os
+import sys
+
+# Tracks the queue of stopped vehicles at a traffic light between its decisions, for rule rewards.
+# Each decision hands the tracker the intersection's current queue (vehIDs and their accumulated
+# waiting times); vehicles of the last queue that are no longer in it have gone through the
+# intersection. Throughput, their waiting time, the total waiting time of the last queue and the
+# change in queue length are all counted in one pass over the last queue, so rewards do not rebuild
+# sets or dictionaries of the vehicles that went through.
+
+class QueueTracker:
+
+    def __init__(self):
+        self.queue = {}                     # Stopped vehIDs and their accumulated waiting times at the last decision
+        self.numCarsWaitingBefore = 0       # Length of the queue before the last update
+        self.totalWaitingTimeBefore = 0     # Total waiting time of the queue before the last update
+        self.throughput = 0                 # Vehicles that left the queue at the last update
+        self.throughputWaitingTime = 0      # Total waiting time of the vehicles that left the queue at the last update
+        self.queueDelta = 0                 # Change in queue length at the last update
+
+        # REPLACE THE QUEUE WITH THE INTERSECTION'S CURRENT QUEUE, COUNTING THE VEHICLES THAT LEFT THE LAST ONE
+    def update(self, carsWaiting):
+        throughput = 0
+        throughputWaitingTime = 0
+        totalWaitingTime = 0
+        for vehID, waitingTime in self.queue.items():
+            totalWaitingTime += waitingTime
+            if vehID not in carsWaiting:
+                throughput += 1
+                throughputWaitingTime += waitingTime
+
+        self.numCarsWaitingBefore = len(self.queue)
+        self.totalWaitingTimeBefore = totalWaitingTime
+        self.throughput = throughput
+        self.throughputWaitingTime = throughputWaitingTime
+        self.queueDelta = len(carsWaiting) - len(self.queue)
+        self.queue = carsWaiting
+
+        # RETURN DICTIONARY OF STOPPED VEHIDs AND THEIR ACCUMULATED WAITING TIMES AT THE LAST DECISION
+    def getQueue(self):
+        return self.queue
+
+    def getNumCarsWaitingBefore(self):
+        return self.numCarsWaitingBefore
+
+    def getTotalWaitingTimeBefore(self):
+        return self.totalWaitingTimeBefore
+
+    def getThroughput(self):
+        return self.throughput
+
+    def getThroughputWaitingTime(self):
+        return self.throughputWaitingTime
+
+    def getQueueDelta(self):
+        return self.queueDelta
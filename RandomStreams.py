@@ -0,0 +1,42 @@
+import os
+import sys
+import zlib
+import numpy as np
+
+# Random number streams for every component that makes random choices (agent pools, the GA operators
+# breeding them, traffic lights choosing rules). All streams are spawned from one root SeedSequence,
+# so seeding the root with the entropy of an earlier run repeats it exactly. A stream is identified
+# by a name and optional integer keys (ex: an episode number) rather than by the order streams are
+# created in, so its draws do not depend on what other components, or other processes, drew first.
+
+global rootSeedSequence
+global generators
+rootSeedSequence = np.random.SeedSequence()
+generators = {}     # (name, keys) -> generator of a persistent stream
+
+    # SEED EVERY STREAM FROM A ROOT ENTROPY; None DRAWS FRESH ENTROPY FROM THE OPERATING SYSTEM
+def seed(entropy=None):
+    global rootSeedSequence
+    rootSeedSequence = np.random.SeedSequence(entropy)
+    generators.clear()
+
+    # RETURN THE ROOT ENTROPY; SEEDING WITH IT REPEATS THE RUN
+def getEntropy():
+    return rootSeedSequence.entropy
+
+    # RETURN THE SEED SEQUENCE OF A STREAM, SPAWNED FROM THE ROOT UNDER THE STREAM'S NAME AND KEYS
+def getSeedSequence(name, *keys):
+    spawnKey = (zlib.crc32(name.encode()),) + tuple(int(key) for key in keys)
+    return np.random.SeedSequence(rootSeedSequence.entropy, spawn_key=spawnKey)
+
+    # RETURN A NEW GENERATOR AT THE START OF A STREAM
+def createGenerator(name, *keys):
+    return np.random.default_rng(getSeedSequence(name, *keys))
+
+    # RETURN THE GENERATOR OF A STREAM SHARED WITHIN THIS PROCESS, CREATING IT ON FIRST USE; LATER CALLS CONTINUE THE STREAM
+def getGenerator(name, *keys):
+    key = (name, keys)
+    if key not in generators:
+        generators[key] = createGenerator(name, *keys)
+
+    return generators[key]
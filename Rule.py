@@ -1,6 +1,8 @@
 import os
 import sys
 
+import RuleEncoding
+
 class Rule:
 
     def __init__(self, ruleType, conditions, action, agentPool):
@@ -26,6 +28,11 @@ class Rule:
     def setConditions(self, conditions):
         self._conditions = conditions
 
+        # GET A KEY OF THE RULE'S CONDITIONS, AS A SET OF PREDICATE IDS, AND ACTION; DUPLICATE RULES HAVE EQUAL KEYS
+        # Conditions are mutated in place, so the key is made when asked for instead of being stored
+    def getKey(self):
+        return (frozenset(RuleEncoding.getPredicateID(self.type, cond) for cond in self.conditions), self.action)
+
         # GET RULE ACTION
     def getAction(self):
         return self.action
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import PredicateEngine
+
+# Gives every rule condition an id in a global table of compiled predicates, so that rules can be
+# compared by the set of predicates they use (see Rule.getKey) whatever the order of their
+# conditions.
+#
+# Predicates are keyed by rule type and name since RS (type 0) rules are evaluated against the
+# intersection's features while RSint (type 1) rules must hold for every communicated intention.
+
+    # Global predicate table; ids only ever grow, so ids handed out earlier stay valid as predicates are added
+global predicateIDs
+global predicateTable
+predicateIDs = {}           # (rule type, predicate name) -> predicate id
+predicateTable = []         # (rule type, featureID, lower, upper) for every predicate id
+
+    # RETURN THE ID OF A RULE CONDITION, ADDING IT TO THE PREDICATE TABLE ON FIRST USE
+def getPredicateID(ruleType, cond):
+    key = (ruleType, cond)
+    predicateID = predicateIDs.get(key)
+    if predicateID is None:
+        if ruleType == 1:
+            featureID, lower, upper = PredicateEngine.compileCoopCondition(cond)
+        else:
+            featureID, lower, upper = PredicateEngine.compileCondition(cond)
+        predicateID = len(predicateTable)
+        predicateIDs[key] = predicateID
+        predicateTable.append((ruleType, featureID, lower, upper))
+
+    return predicateID
@@ -1,7 +1,8 @@
-import traci
 import numpy as np
 import random
 
+import SimulatorBackend
+
 # phase codes based on tlcs.net.xml
 PHASE_NS_GREEN = 0  # action 0 code 00
 PHASE_NS_YELLOW = 1
@@ -14,8 +15,9 @@ PHASE_EWL_YELLOW = 7
 
 # HANDLE THE SIMULATION OF THE AGENT
 class SimRunner:
-    def __init__(self, sess, model, memory, traffic_gen, total_episodes, gamma, max_steps, green_duration, yellow_duration, sumoCmd):
+    def __init__(self, sess, model, memory, traffic_gen, total_episodes, gamma, max_steps, green_duration, yellow_duration, sumoCmd, backend="traci"):
         self._sess = sess
+        self._sim = SimulatorBackend.createBackend(backend)  # simulator the agent is trained on: "traci", "libsumo" or "standin"
         self._model = model
         self._memory = memory
         self._traffic_gen = traffic_gen
@@ -38,7 +40,7 @@ class SimRunner:
     def run(self, episode):
         # first, generate the route file for this simulation and set up sumo
         self._traffic_gen.generate_routefile(episode)
-        traci.start(self._sumoCmd)
+        self._sim.start(self._sumoCmd)
 
         # set the epsilon for this episode
         self._eps = 1.0 - (episode / self._total_episodes)
@@ -85,7 +87,7 @@ class SimRunner:
 
         self._save_stats(tot_neg_reward)
         print("Total reward: {}, Eps: {}".format(tot_neg_reward, self._eps))
-        traci.close()
+        self._sim.close()
 
     # HANDLE THE CORRECT NUMBER OF STEPS TO SIMULATE
     def _simulate(self, steps_todo):
@@ -93,7 +95,7 @@ class SimRunner:
             steps_todo = self._max_steps - self._steps
         self._steps = self._steps + steps_todo  # update the step counter
         while steps_todo > 0:
-            traci.simulationStep()  # simulate 1 step in sumo
+            self._sim.simulationStep()  # simulate 1 step in sumo
             self._replay()  # training
             steps_todo -= 1
             intersection_queue = self._get_stats()
@@ -102,9 +104,9 @@ class SimRunner:
     # RETRIEVE THE WAITING TIME OF EVERY CAR IN THE INCOMING LANES
     def _get_waiting_times(self):
         incoming_roads = ["E2TL", "N2TL", "W2TL", "S2TL"]
-        for veh_id in traci.vehicle.getIDList():
-            wait_time_car = traci.vehicle.getAccumulatedWaitingTime(veh_id)
-            road_id = traci.vehicle.getRoadID(veh_id)  # get the road id where the car is located
+        for veh_id in self._sim.vehicle.getIDList():
+            wait_time_car = self._sim.vehicle.getAccumulatedWaitingTime(veh_id)
+            road_id = self._sim.vehicle.getRoadID(veh_id)  # get the road id where the car is located
             if road_id in incoming_roads:  # consider only the waiting times of cars in incoming roads
                 self._waiting_times[veh_id] = wait_time_car
             else:
@@ -123,25 +125,25 @@ class SimRunner:
     # SET IN SUMO THE CORRECT YELLOW PHASE
     def _set_yellow_phase(self, old_action):
         yellow_phase = old_action * 2 + 1 # obtain the yellow phase code, based on the old action
-        traci.trafficlight.setPhase("TL", yellow_phase)
+        self._sim.trafficlight.setPhase("TL", yellow_phase)
 
     # SET IN SUMO A GREEN PHASE
     def _set_green_phase(self, action_number):
         if action_number == 0:
-            traci.trafficlight.setPhase("TL", PHASE_NS_GREEN)
+            self._sim.trafficlight.setPhase("TL", PHASE_NS_GREEN)
         elif action_number == 1:
-            traci.trafficlight.setPhase("TL", PHASE_NSL_GREEN)
+            self._sim.trafficlight.setPhase("TL", PHASE_NSL_GREEN)
         elif action_number == 2:
-            traci.trafficlight.setPhase("TL", PHASE_EW_GREEN)
+            self._sim.trafficlight.setPhase("TL", PHASE_EW_GREEN)
         elif action_number == 3:
-            traci.trafficlight.setPhase("TL", PHASE_EWL_GREEN)
+            self._sim.trafficlight.setPhase("TL", PHASE_EWL_GREEN)
 
     # RETRIEVE THE STATS OF THE SIMULATION FOR ONE SINGLE STEP
     def _get_stats(self):
-        halt_N = traci.edge.getLastStepHaltingNumber("N2TL")
-        halt_S = traci.edge.getLastStepHaltingNumber("S2TL")
-        halt_E = traci.edge.getLastStepHaltingNumber("E2TL")
-        halt_W = traci.edge.getLastStepHaltingNumber("W2TL")
+        halt_N = self._sim.edge.getLastStepHaltingNumber("N2TL")
+        halt_S = self._sim.edge.getLastStepHaltingNumber("S2TL")
+        halt_E = self._sim.edge.getLastStepHaltingNumber("E2TL")
+        halt_W = self._sim.edge.getLastStepHaltingNumber("W2TL")
         intersection_queue = halt_N + halt_S + halt_E + halt_W
         return intersection_queue
 
@@ -149,9 +151,9 @@ class SimRunner:
     def _get_state(self):
         state = np.zeros(self._model.num_states)
 
-        for veh_id in traci.vehicle.getIDList():
-            lane_pos = traci.vehicle.getLanePosition(veh_id)
-            lane_id = traci.vehicle.getLaneID(veh_id)
+        for veh_id in self._sim.vehicle.getIDList():
+            lane_pos = self._sim.vehicle.getLanePosition(veh_id)
+            lane_id = self._sim.vehicle.getLaneID(veh_id)
             lane_pos = 750 - lane_pos  # inversion of lane pos, so if the car is close to TL, lane_pos = 0
             lane_group = -1  # just dummy initialization
             valid_car = False  # flag for not detecting cars crossing the intersection or driving away from it
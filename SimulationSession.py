@@ -0,0 +1,65 @@
+import os
+import sys
+import timeit
+
+import SimulatorBackend
+
+class SimulationSession:
+
+        # INITIALIZE A SESSION FOR A SUMO COMMAND; A PERSISTENT SESSION KEEPS ONE SUMO PROCESS AND RELOADS THE SCENARIO FOR EACH EPISODE
+    def __init__(self, sumoCmd, label="default", port=None, persistent=True, backend="traci"):
+        self.sumoCmd = sumoCmd
+        self.backend = SimulatorBackend.createBackend(backend)     # Simulator the session runs episodes on (see SimulatorBackend.backendNames)
+        self.label = label                  # TraCI connection label; parallel workers each use their own
+        self.port = port                    # Port SUMO listens on; None lets TraCI pick a free one
+        self.persistent = persistent
+        self.running = False                # True while a SUMO process is connected
+        self.episodeSetupTime = 0
+        self.episodeOverheads = []          # (setup time, teardown time) in seconds of every episode run in the session
+
+    def getLabel(self):
+        return self.label
+
+    def getBackend(self):
+        return self.backend
+
+    def isPersistent(self):
+        return self.persistent
+
+        # START SUMO FOR THE FIRST EPISODE, OR RELOAD THE SCENARIO IN THE RUNNING SUMO PROCESS FOR LATER EPISODES
+    def startEpisode(self):
+        start = timeit.default_timer()
+        if not self.running:
+            self.backend.start(self.sumoCmd, port=self.port, label=self.label)
+            self.running = True
+        else:
+            self.backend.switch(self.label)
+            self.backend.load(self.sumoCmd[1:])     # Same options as the SUMO command, without the binary
+            self.backend.clearSubscriptionResults()     # Results of the previous episode must not be read as those of the new one
+        self.episodeSetupTime = timeit.default_timer() - start
+
+        # END AN EPISODE; SUMO IS ONLY CLOSED IF THE SESSION IS NOT PERSISTENT
+    def endEpisode(self):
+        start = timeit.default_timer()
+        if not self.persistent:
+            self.close()
+        self.episodeOverheads.append((self.episodeSetupTime, timeit.default_timer() - start))
+
+        # CLOSE THE SUMO PROCESS OF THE SESSION
+    def close(self):
+        if self.running:
+            self.backend.switch(self.label)
+            self.backend.close()
+            self.running = False
+
+        # RETURN (SETUP TIME, TEARDOWN TIME) OF THE LAST EPISODE
+    def getLastEpisodeOverhead(self):
+        return self.episodeOverheads[-1]
+
+        # RETURN LIST OF (SETUP TIME, TEARDOWN TIME) OF EVERY EPISODE
+    def getEpisodeOverheads(self):
+        return self.episodeOverheads
+
+        # RETURN TOTAL SETUP AND TEARDOWN TIME OF ALL EPISODES
+    def getTotalOverhead(self):
+        return sum(setupTime + teardownTime for setupTime, teardownTime in self.episodeOverheads)
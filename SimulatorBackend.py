@@ -0,0 +1,90 @@
+import os
+import sys
+
+# Simulator backends expose the parts of the TraCI API used by the project under the same names
+# (backend.simulation, backend.vehicle, backend.trafficlight, backend.edge, backend.lane,
+# backend.lanearea and backend.junction), along with start, load, switch, simulationStep and close. Learning code only
+# talks to a backend, so the simulator can be swapped without changing it:
+#   "traci"   - SUMO in its own process, driven over the TraCI socket protocol
+#   "libsumo" - SUMO loaded into this process; no inter-process communication
+#   "standin" - pure-Python stand-in (see StandInSimulator) that needs no SUMO installation
+#   "surrogate" - NumPy queue model (see SurrogateSimulator) for screening individuals quickly
+
+global backendNames
+backendNames = ["traci", "libsumo", "standin", "surrogate"]
+
+    # CREATE A BACKEND FROM ITS NAME
+def createBackend(name):
+    if name == "traci":
+        return TraciBackend()
+    elif name == "libsumo":
+        return LibsumoBackend()
+    elif name == "standin":
+        from StandInSimulator import StandInBackend
+        return StandInBackend()
+    elif name == "surrogate":
+        from SurrogateSimulator import SurrogateBackend
+        return SurrogateBackend()
+
+    raise ValueError("Unknown simulator backend: " + str(name) + " (expected one of " + ", ".join(backendNames) + ")")
+
+class TraciBackend:
+
+        # INITIALIZE BACKEND WITH THE TRACI MODULE AND ITS DOMAINS
+    def __init__(self):
+        import traci
+        self.setModule(traci)
+
+        # USE THE DOMAINS OF A MODULE WITH THE TRACI API
+    def setModule(self, module):
+        self.module = module
+        self.simulation = module.simulation
+        self.vehicle = module.vehicle
+        self.trafficlight = module.trafficlight
+        self.edge = module.edge
+        self.lane = module.lane
+        self.lanearea = module.lanearea
+        self.junction = module.junction
+
+        # START SUMO WITH A COMMAND; THE LABEL NAMES THE CONNECTION WHEN SEVERAL ARE OPEN
+    def start(self, sumoCmd, port=None, label="default"):
+        self.module.start(sumoCmd, port=port, label=label)
+
+        # MAKE A LABELLED CONNECTION THE ONE ALL CALLS GO THROUGH
+    def switch(self, label):
+        self.module.switch(label)
+
+        # RELOAD THE SIMULATION WITH THE GIVEN SUMO OPTIONS
+    def load(self, args):
+        self.module.load(args)
+
+        # ADVANCE THE SIMULATION ONE STEP, OR UP TO A GIVEN TIME
+    def simulationStep(self, time=0):
+        self.module.simulationStep(time)
+
+    def close(self):
+        self.module.close()
+
+        # DISCARD CACHED SUBSCRIPTION RESULTS; TRACI ONLY CLEARS THEM ON THE NEXT SIMULATION STEP, NOT ON A RELOAD
+    def clearSubscriptionResults(self):
+        for domain in [self.simulation, self.trafficlight, self.junction, self.lane, self.lanearea]:
+            domain.getAllSubscriptionResults().clear()
+            domain.getAllContextSubscriptionResults().clear()
+
+class LibsumoBackend(TraciBackend):
+
+        # INITIALIZE BACKEND WITH THE LIBSUMO MODULE, WHICH HAS THE SAME API AS TRACI
+    def __init__(self):
+        import libsumo
+        self.setModule(libsumo)
+
+        # START SUMO INSIDE THIS PROCESS; ONLY ONE SIMULATION CAN RUN PER PROCESS, SO PORT AND LABEL ARE UNUSED
+    def start(self, sumoCmd, port=None, label="default"):
+        self.module.start(sumoCmd)
+
+    def switch(self, label):
+        pass
+
+        # LIBSUMO READS SUBSCRIPTION RESULTS STRAIGHT FROM THE SIMULATION, SO THERE IS NO CACHE TO CLEAR
+    def clearSubscriptionResults(self):
+        pass
@@ -0,0 +1,323 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import traci.constants as tc
+
+# A pure-Python stand-in for SUMO with the same API as the other simulator backends. It reads the
+# network and route files named in a SUMO configuration, runs each traffic light's program and
+# moves vehicles along their routes at the speed limit of each lane without any interaction:
+# vehicles never stop, queue or change lanes. It is meant for running and profiling the learning
+# code where SUMO is not available, not for judging how well individuals control traffic.
+
+class StandInDomain:
+
+        # GROUP STAND-IN FUNCTIONS UNDER A TRACI DOMAIN NAME (ex: backend.vehicle.getSpeed)
+    def __init__(self, **functions):
+        self.__dict__.update(functions)
+
+class StandInVehicle:
+
+        # INITIALIZE A VEHICLE WITH ITS ROUTE
+    def __init__(self, vehID, route, departTime):
+        self.id = vehID
+        self.route = route                      # List of edge IDs
+        self.departTime = departTime
+        self.edgeIndex = 0                      # Index of the current edge in the route
+        self.laneID = ""
+        self.position = 0                       # Distance (m) from the start of the current lane
+        self.speed = 0
+        self.waitingTime = 0                    # Time spent stopped since the vehicle last moved
+        self.accumulatedWaitingTime = 0
+
+    def getEdgeID(self):
+        return self.route[self.edgeIndex]
+
+class StandInBackend:
+
+        # INITIALIZE THE STAND-IN AND ITS TRACI-LIKE DOMAINS
+    def __init__(self):
+        self.networks = {}                      # Parsed network files, keyed by file name, so reloads do not parse them again
+        self.network = None
+        self.time = 0
+        self.endTime = None
+
+        self.simulation = StandInDomain(
+            getTime=self.getTime,
+            getMinExpectedNumber=self.getMinExpectedNumber,
+            subscribe=self.subscribeSimulation,
+            getSubscriptionResults=self.getSimulationSubscriptionResults)
+        self.vehicle = StandInDomain(
+            getIDList=self.getVehicleIDList,
+            getRoadID=lambda vehID: self.getVehicleVariable(vehID, tc.VAR_ROAD_ID),
+            getLaneID=lambda vehID: self.getVehicleVariable(vehID, tc.VAR_LANE_ID),
+            getLanePosition=lambda vehID: self.getVehicleVariable(vehID, tc.VAR_LANEPOSITION),
+            getSpeed=lambda vehID: self.getVehicleVariable(vehID, tc.VAR_SPEED),
+            getWaitingTime=lambda vehID: self.getVehicleVariable(vehID, tc.VAR_WAITING_TIME),
+            getAccumulatedWaitingTime=lambda vehID: self.getVehicleVariable(vehID, tc.VAR_ACCUMULATED_WAITING_TIME))
+        self.trafficlight = StandInDomain(
+            getPhase=lambda tlID: self.tlStates[tlID][0],
+            getPhaseName=lambda tlID: self.getTrafficLightPhase(tlID)[2],
+            getPhaseDuration=lambda tlID: self.getTrafficLightPhase(tlID)[0],
+            getNextSwitch=lambda tlID: self.tlStates[tlID][1],
+            getRedYellowGreenState=lambda tlID: self.getTrafficLightPhase(tlID)[1],
+            setPhase=self.setTrafficLightPhase,
+            subscribe=self.subscribeTrafficLight,
+            getSubscriptionResults=self.getTrafficLightSubscriptionResults)
+        self.edge = StandInDomain(
+            getWaitingTime=self.getEdgeWaitingTime,
+            getLastStepHaltingNumber=self.getEdgeHaltingNumber)
+        self.lane = StandInDomain(
+            getLength=lambda laneID: self.network["lanes"][laneID][2],
+            getLastStepHaltingNumber=self.getLaneHaltingNumber,
+            getWaitingTime=self.getLaneWaitingTime,
+            subscribe=self.subscribeLane,
+            getSubscriptionResults=self.getLaneSubscriptionResults)
+        self.lanearea = StandInDomain(
+            subscribe=self.subscribeLaneArea)
+        self.junction = StandInDomain(
+            subscribeContext=self.subscribeJunctionContext,
+            getContextSubscriptionResults=self.getJunctionContextSubscriptionResults)
+
+        # START THE STAND-IN WITH A SUMO COMMAND; THERE IS NO PROCESS OR CONNECTION, SO PORT AND LABEL ARE UNUSED
+    def start(self, sumoCmd, port=None, label="default"):
+        self.load(sumoCmd[1:])
+
+    def switch(self, label):
+        pass
+
+        # LOAD THE NETWORK AND ROUTES GIVEN BY SUMO OPTIONS (-c, -n, -r, -b, -e) AND RESET THE SIMULATION
+    def load(self, args):
+        options = self.readOptions(args)
+        netFile = options["net-file"]
+        if netFile not in self.networks:
+            self.networks[netFile] = self.readNetwork(netFile)
+        self.network = self.networks[netFile]
+
+        self.time = float(options.get("begin", 0))
+        self.endTime = float(options["end"]) if "end" in options else None
+        self.loadDemand(options)
+
+            # Traffic light state: [phase index, next switch time]
+        self.tlStates = {}
+        for tlID in self.network["tlPrograms"]:
+            self.tlStates[tlID] = [0, self.time + self.network["tlPrograms"][tlID][0][0]]
+
+        self.simulationSubscription = []
+        self.trafficLightSubscriptions = {}
+        self.laneSubscriptions = {}
+        self.junctionContextSubscriptions = {}
+
+        # READ THE VEHICLES OF THE ROUTE FILES; NONE HAVE DEPARTED YET
+    def loadDemand(self, options):
+        self.pendingVehicles = []               # Vehicles yet to depart, in order of departure
+        for routeFile in options.get("route-files", "").split(","):
+            if routeFile != "":
+                self.pendingVehicles.extend(self.readRoutes(routeFile))
+        self.pendingVehicles.sort(key=lambda veh: veh.departTime)
+        self.vehicles = {}                      # Vehicles in the network, keyed by vehID
+
+        # ADVANCE THE SIMULATION ONE STEP (1 SECOND), OR UP TO A GIVEN TIME
+    def simulationStep(self, time=0):
+        self.step()
+        while self.time < time:
+            self.step()
+
+    def close(self):
+        self.network = None
+        self.vehicles = {}
+        self.pendingVehicles = []
+
+        # THE STAND-IN COMPUTES SUBSCRIPTION RESULTS WHEN THEY ARE REQUESTED, SO THERE IS NO CACHE TO CLEAR
+    def clearSubscriptionResults(self):
+        pass
+
+        # RUN ONE SIMULATION STEP: INSERT DEPARTING VEHICLES, MOVE VEHICLES AND SWITCH TRAFFIC LIGHT PHASES
+    def step(self):
+        self.insertVehicles()
+        self.moveVehicles()
+        self.time += 1
+        self.switchTrafficLights()
+
+        # PUT VEHICLES WHOSE DEPARTURE TIME HAS COME ON THE FIRST EDGE OF THEIR ROUTE
+    def insertVehicles(self):
+        while len(self.pendingVehicles) > 0 and self.pendingVehicles[0].departTime <= self.time:
+            veh = self.pendingVehicles.pop(0)
+            self.enterEdge(veh, 0)
+            self.vehicles[veh.id] = veh
+
+        # MOVE EVERY TRAFFIC LIGHT WHOSE PHASE HAS RUN ITS DURATION ON TO ITS NEXT PHASE
+    def switchTrafficLights(self):
+        for tlID in self.tlStates:
+            tlState = self.tlStates[tlID]
+            if self.time >= tlState[1]:
+                phases = self.network["tlPrograms"][tlID]
+                tlState[0] = (tlState[0] + 1) % len(phases)
+                tlState[1] = self.time + phases[tlState[0]][0]
+
+        # MOVE EVERY VEHICLE AT THE SPEED LIMIT OF ITS LANE, REMOVING THOSE THAT REACH THE END OF THEIR ROUTE
+    def moveVehicles(self):
+        for vehID in list(self.vehicles):
+            veh = self.vehicles[vehID]
+            veh.position += veh.speed
+            while vehID in self.vehicles and veh.position >= self.network["lanes"][veh.laneID][2]:
+                veh.position -= self.network["lanes"][veh.laneID][2]
+                if veh.edgeIndex + 1 < len(veh.route):
+                    self.enterEdge(veh, veh.edgeIndex + 1)
+                else:
+                    del self.vehicles[vehID]
+
+        # PUT A VEHICLE ON AN EDGE OF ITS ROUTE, IN THE LANE THAT CONNECTS TO THE NEXT EDGE OF THE ROUTE
+    def enterEdge(self, veh, edgeIndex):
+        veh.edgeIndex = edgeIndex
+        edgeID = veh.route[edgeIndex]
+        laneIndex = 0
+        if edgeIndex + 1 < len(veh.route):
+            laneIndex = self.network["connections"].get((edgeID, veh.route[edgeIndex + 1]), 0)
+        veh.laneID = edgeID + "_" + str(laneIndex)
+        veh.speed = self.network["lanes"][veh.laneID][1]
+
+    def getTime(self):
+        return self.time
+
+        # RETURN THE NUMBER OF VEHICLES IN THE NETWORK OR YET TO DEPART
+    def getMinExpectedNumber(self):
+        return len(self.vehicles) + len(self.pendingVehicles)
+
+    def getVehicleIDList(self):
+        return list(self.vehicles)
+
+        # RETURN A VARIABLE OF A VEHICLE IN THE NETWORK BY ITS TRACI VARIABLE ID
+    def getVehicleVariable(self, vehID, varID):
+        veh = self.vehicles[vehID]
+        values = {tc.VAR_LANE_ID: veh.laneID, tc.VAR_ROAD_ID: veh.getEdgeID(), tc.VAR_LANEPOSITION: veh.position, tc.VAR_SPEED: veh.speed, tc.VAR_WAITING_TIME: veh.waitingTime, tc.VAR_ACCUMULATED_WAITING_TIME: veh.accumulatedWaitingTime}
+        return values[varID]
+
+        # RETURN (DURATION, STATE, NAME) OF THE CURRENT PHASE OF A TRAFFIC LIGHT
+    def getTrafficLightPhase(self, tlID):
+        return self.network["tlPrograms"][tlID][self.tlStates[tlID][0]]
+
+        # SWITCH A TRAFFIC LIGHT TO A PHASE, WHICH THEN LASTS ITS FULL DURATION
+    def setTrafficLightPhase(self, tlID, phaseIndex):
+        self.tlStates[tlID] = [phaseIndex, self.time + self.network["tlPrograms"][tlID][phaseIndex][0]]
+
+    def getEdgeWaitingTime(self, edgeID):
+        return sum(veh.waitingTime for veh in self.vehicles.values() if veh.getEdgeID() == edgeID)
+
+    def getEdgeHaltingNumber(self, edgeID):
+        return len([veh for veh in self.vehicles.values() if veh.getEdgeID() == edgeID and veh.speed < 0.1])
+
+    def subscribeSimulation(self, varIDs):
+        self.simulationSubscription = varIDs
+
+    def getSimulationSubscriptionResults(self):
+        values = {tc.VAR_TIME: self.time, tc.VAR_MIN_EXPECTED_VEHICLES: self.getMinExpectedNumber()}
+        return {varID: values[varID] for varID in self.simulationSubscription}
+
+    def subscribeTrafficLight(self, tlID, varIDs):
+        self.trafficLightSubscriptions[tlID] = varIDs
+
+    def getTrafficLightSubscriptionResults(self, tlID):
+        duration, state, name = self.getTrafficLightPhase(tlID)
+        values = {tc.TL_CURRENT_PHASE: self.tlStates[tlID][0], tc.VAR_NAME: name, tc.TL_PHASE_DURATION: duration, tc.TL_NEXT_SWITCH: self.tlStates[tlID][1], tc.TL_RED_YELLOW_GREEN_STATE: state}
+        return {varID: values[varID] for varID in self.trafficLightSubscriptions.get(tlID, [])}
+
+    def getLaneHaltingNumber(self, laneID):
+        return len([veh for veh in self.vehicles.values() if veh.laneID == laneID and veh.speed < 0.1])
+
+    def getLaneWaitingTime(self, laneID):
+        return sum(veh.waitingTime for veh in self.vehicles.values() if veh.laneID == laneID)
+
+    def subscribeLane(self, laneID, varIDs):
+        self.laneSubscriptions[laneID] = varIDs
+
+        # ONLY THE HALTING NUMBER AND WAITING TIME OF LANES ARE SUPPORTED AS LANE SUBSCRIPTIONS
+    def getLaneSubscriptionResults(self, laneID):
+        values = {tc.LAST_STEP_VEHICLE_HALTING_NUMBER: self.getLaneHaltingNumber, tc.VAR_WAITING_TIME: self.getLaneWaitingTime}
+        return {varID: values[varID](laneID) for varID in self.laneSubscriptions.get(laneID, [])}
+
+        # THE STAND-IN HAS NO LANE AREA DETECTORS; LANE SUBSCRIPTIONS GIVE THE SAME HALTING NUMBERS
+    def subscribeLaneArea(self, detectorID, varIDs):
+        raise ValueError("The stand-in simulator has no lane area detectors (use the \"lanes\" feature mode)")
+
+        # ONLY VEHICLE VARIABLES ARE SUPPORTED AS JUNCTION CONTEXT SUBSCRIPTIONS
+    def subscribeJunctionContext(self, junctionID, domain, contextRange, varIDs):
+        if domain != tc.CMD_GET_VEHICLE_VARIABLE:
+            raise ValueError("The stand-in simulator only supports vehicle context subscriptions")
+        self.junctionContextSubscriptions[junctionID] = (contextRange, varIDs)
+
+        # RETURN SUBSCRIBED VARIABLES OF VEHICLES WITHIN RANGE OF A JUNCTION, MEASURED ALONG THE EDGES ENTERING AND LEAVING IT
+    def getJunctionContextSubscriptionResults(self, junctionID):
+        if junctionID not in self.junctionContextSubscriptions:
+            return {}
+        contextRange, varIDs = self.junctionContextSubscriptions[junctionID]
+
+        results = {}
+        for veh in self.vehicles.values():
+            fromJunction, toJunction = self.network["edgeEndpoints"][veh.getEdgeID()]
+            laneLength = self.network["lanes"][veh.laneID][2]
+            if (toJunction == junctionID and laneLength - veh.position <= contextRange) or (fromJunction == junctionID and veh.position <= contextRange):
+                results[veh.id] = {varID: self.getVehicleVariable(veh.id, varID) for varID in varIDs}
+
+        return results
+
+        # RETURN A DICTIONARY OF OPTION NAMES AND VALUES FROM SUMO COMMAND LINE OPTIONS AND THE CONFIGURATION FILE THEY NAME
+    def readOptions(self, args):
+        shortNames = {"-c": "configuration-file", "-n": "net-file", "-r": "route-files", "-b": "begin", "-e": "end"}
+        options = {}
+        for i in range(len(args) - 1):
+            if args[i] in shortNames:
+                options[shortNames[args[i]]] = args[i + 1]
+            elif args[i].startswith("--"):
+                options[args[i][2:]] = args[i + 1]
+
+            # Options given on the command line take precedence over those of the configuration file
+        if "configuration-file" in options:
+            configFile = options["configuration-file"]
+            configDir = os.path.dirname(configFile)
+            for section in ET.parse(configFile).getroot():
+                for option in section:
+                    value = option.get("value")
+                    if option.tag in ["net-file", "route-files"]:
+                        value = ",".join(os.path.join(configDir, f.strip()) for f in value.split(","))
+                    options.setdefault(option.tag, value)
+
+        return options
+
+        # PARSE A NETWORK FILE INTO LANES, EDGE ENDPOINTS, LANE CONNECTIONS AND TRAFFIC LIGHT PROGRAMS
+    def readNetwork(self, netFile):
+        network = {
+            "lanes": {},            # laneID -> (edgeID, speed, length)
+            "edgeEndpoints": {},    # edgeID -> (from junction, to junction)
+            "connections": {},      # (from edgeID, to edgeID) -> index of the first lane connecting them
+            "signals": {},          # (from edgeID, to edgeID) -> (tlID, link index) of the signal controlling that lane's connection
+            "tlPrograms": {}        # tlID -> list of (duration, state, name) phases
+        }
+        root = ET.parse(netFile).getroot()
+        for edge in root.iter("edge"):
+            if edge.get("function") == "internal":
+                continue
+            network["edgeEndpoints"][edge.get("id")] = (edge.get("from"), edge.get("to"))
+            for lane in edge.iter("lane"):
+                network["lanes"][lane.get("id")] = (edge.get("id"), float(lane.get("speed")), float(lane.get("length")))
+
+        for connection in root.iter("connection"):
+            key = (connection.get("from"), connection.get("to"))
+            if key[0] in network["edgeEndpoints"] and key not in network["connections"]:
+                network["connections"][key] = int(connection.get("fromLane"))
+                if connection.get("tl") is not None:
+                    network["signals"][key] = (connection.get("tl"), int(connection.get("linkIndex")))
+
+        for tlLogic in root.iter("tlLogic"):
+            network["tlPrograms"][tlLogic.get("id")] = [(float(phase.get("duration")), phase.get("state"), phase.get("name", "")) for phase in tlLogic.iter("phase")]
+
+        return network
+
+        # RETURN THE VEHICLES OF A ROUTE FILE
+    def readRoutes(self, routeFile):
+        vehicles = []
+        for vehicle in ET.parse(routeFile).getroot().iter("vehicle"):
+            route = vehicle.find("route")
+            vehicles.append(StandInVehicle(vehicle.get("id"), route.get("edges").split(), float(vehicle.get("depart"))))
+
+        return vehicles
@@ -0,0 +1,59 @@
+import os
+import sys
+import copy
+import math
+
+import ParallelEvaluator
+from Driver import Driver
+
+# Screens the individuals of a generation on the surrogate simulator before they are given SUMO runs.
+# Screening runs use a copy of the agent pools, so they do not change the selected counts, rule
+# weights or fitnesses of the real individuals. Only the individuals of each agent pool with the best
+# surrogate fitness are promoted to SUMO runs; the rest are screened out and keep their surrogate
+# fitness results for breeding.
+
+    # SCREEN EVERY INDIVIDUAL ON THE SURROGATE SIMULATOR AND PROMOTE THE MOST PROMISING OF EACH AGENT POOL; RETURNS THE SURROGATE FITNESS RESULTS
+def run(surrogateSession, sumoCmd, setUpTuple, runsPerIndividual, promotionFraction, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime):
+    screeningResults = screenIndividuals(surrogateSession, sumoCmd, setUpTuple, runsPerIndividual, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime)
+    for ap in setUpTuple[2]:
+        promoteIndividuals(ap, screeningResults, promotionFraction)
+
+    return screeningResults
+
+    # RUN SURROGATE EPISODES ON A COPY OF THE AGENT POOLS UNTIL EVERY INDIVIDUAL HAS HAD runsPerIndividual RUNS; RETURNS {(apID, individual index): RUN FITNESS RESULTS}
+def screenIndividuals(surrogateSession, sumoCmd, setUpTuple, runsPerIndividual, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime):
+    screeningTuple = copy.deepcopy(setUpTuple)
+    numResultsBefore = {}
+    for ap in screeningTuple[2]:
+        ap.setMinIndividualRunsPerGen(runsPerIndividual)
+        for index, i in enumerate(ap.getIndividualsSet()):
+            i.resetSelectedCount()
+            i.setScreenedOut(False)
+            numResultsBefore[(ap.getID(), index)] = len(i.getRunFitnessResults())
+
+    while ParallelEvaluator.individualsNeedRuns(screeningTuple[2], runsPerIndividual):
+        simRunner = Driver(sumoCmd, screeningTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, session=surrogateSession)
+        simRunner.run()
+
+    screeningResults = {}
+    for ap in screeningTuple[2]:
+        for index, i in enumerate(ap.getIndividualsSet()):
+            screeningResults[(ap.getID(), index)] = i.getRunFitnessResults()[numResultsBefore[(ap.getID(), index)]:]
+
+    return screeningResults
+
+    # PROMOTE THE INDIVIDUALS OF AN AGENT POOL WITH THE BEST (LOWEST) AVERAGE SURROGATE FITNESS TO SUMO RUNS AND SCREEN OUT THE REST; INDIVIDUALS WITH CACHED FITNESS ARE LEFT OUT
+def promoteIndividuals(agentPool, screeningResults, promotionFraction):
+    individuals = agentPool.getIndividualsSet()
+    surrogateFitness = {}
+    for index, i in enumerate(individuals):
+        results = screeningResults[(agentPool.getID(), index)]
+        if not i.isFitnessCached():
+            surrogateFitness[i] = sum(results)/len(results)
+
+    ranking = sorted(surrogateFitness, key=lambda i: surrogateFitness[i])
+    numPromoted = max(1, math.ceil(len(ranking)*promotionFraction))
+    for i in ranking[:numPromoted]:
+        i.setScreenedOut(False)
+    for i in ranking[numPromoted:]:
+        i.screenOut(screeningResults[(agentPool.getID(), individuals.index(i))])
@@ -0,0 +1,228 @@
+import os
+import sys
+import numpy as np
+
+import traci.constants as tc
+
+from StandInSimulator import StandInBackend
+
+# A NumPy queue model of a SUMO network, used to screen individuals before they are given full SUMO
+# runs. It has the same API as the other simulator backends and reads the same configuration,
+# network and route files. Each lane is a queue of vehicles in a single array per vehicle variable,
+# and every vehicle is moved at once each step:
+#   - a vehicle drives at its lane's speed limit, keeping vehicleSpacing behind the vehicle ahead
+#   - at the end of a lane it only crosses the junction if its signal is green and there is room at
+#     the start of the next lane of its route; otherwise it waits at the stop line
+#   - a vehicle is waiting when it does not move during a step, and its accumulated waiting time
+#     covers the last waiting-time-memory seconds, as in SUMO
+# Lane changes, acceleration and right of way between conflicting green movements are not modelled.
+
+global vehicleSpacing
+global greenSignals
+vehicleSpacing = 7.5        # Vehicle length plus minimum gap (m), as for SUMO's default passenger car
+greenSignals = "Gg"         # Signal states in a phase's state string that let vehicles cross
+
+    # Vehicle status codes
+global PENDING
+global ACTIVE
+global ARRIVED
+PENDING = 0
+ACTIVE = 1
+ARRIVED = 2
+
+class SurrogateBackend(StandInBackend):
+
+        # BUILD THE ARRAYS DESCRIBING THE NETWORK'S LANES AND SIGNALS, AND ALL VEHICLES OF THE ROUTE FILES
+    def loadDemand(self, options):
+        network = self.network
+        self.waitingTimeMemory = int(float(options.get("waiting-time-memory", 100)))
+
+            # Lanes, indexed in the order they appear in the network file
+        self.laneIDs = list(network["lanes"])
+        laneIndices = {laneID: i for i, laneID in enumerate(self.laneIDs)}
+        self.laneIndices = laneIndices
+        self.laneEdges = [network["lanes"][laneID][0] for laneID in self.laneIDs]
+        self.laneSpeeds = np.array([network["lanes"][laneID][1] for laneID in self.laneIDs])
+        self.laneLengths = np.array([network["lanes"][laneID][2] for laneID in self.laneIDs])
+        self.laneFromJunctions = np.array([network["edgeEndpoints"][edgeID][0] for edgeID in self.laneEdges])
+        self.laneToJunctions = np.array([network["edgeEndpoints"][edgeID][1] for edgeID in self.laneEdges])
+
+            # Signals of all traffic lights in one array; each traffic light's links start at its offset
+        self.signalOffsets = {}
+        numSignals = 0
+        for tlID in network["tlPrograms"]:
+            self.signalOffsets[tlID] = numSignals
+            numSignals += len(network["tlPrograms"][tlID][0][1])
+        self.phaseGreenSignals = {}     # tlID -> list of boolean arrays, one per phase, of the signals that are green
+        for tlID in network["tlPrograms"]:
+            self.phaseGreenSignals[tlID] = [np.array([signal in greenSignals for signal in state]) for duration, state, name in network["tlPrograms"][tlID]]
+
+            # Vehicles in order of departure, with the lane they use and the signal they pass on each edge of their route
+        vehicles = []
+        for routeFile in options.get("route-files", "").split(","):
+            if routeFile != "":
+                vehicles.extend(self.readRoutes(routeFile))
+        vehicles.sort(key=lambda veh: veh.departTime)
+
+        numVehicles = len(vehicles)
+        maxRouteLength = max([len(veh.route) for veh in vehicles] + [1])
+        self.vehIDs = [veh.id for veh in vehicles]
+        self.vehIndices = {vehID: i for i, vehID in enumerate(self.vehIDs)}
+        self.departTimes = np.array([veh.departTime for veh in vehicles])
+        self.routeLengths = np.array([len(veh.route) for veh in vehicles], dtype=int)
+        self.routeLanes = np.full((numVehicles, maxRouteLength), -1, dtype=int)
+        self.routeSignals = np.full((numVehicles, maxRouteLength), -1, dtype=int)     # -1 where no signal controls the movement
+        for v, veh in enumerate(vehicles):
+            for r, edgeID in enumerate(veh.route):
+                if r + 1 < len(veh.route):
+                    movement = (edgeID, veh.route[r + 1])
+                    self.routeLanes[v, r] = laneIndices[edgeID + "_" + str(network["connections"].get(movement, 0))]
+                    if movement in network["signals"]:
+                        tlID, linkIndex = network["signals"][movement]
+                        self.routeSignals[v, r] = self.signalOffsets[tlID] + linkIndex
+                else:
+                    self.routeLanes[v, r] = laneIndices[edgeID + "_0"]
+
+        self.status = np.full(numVehicles, PENDING, dtype=np.int8)
+        self.routeIndices = np.zeros(numVehicles, dtype=int)
+        self.lanes = self.routeLanes[:, 0].copy()
+        self.positions = np.zeros(numVehicles)
+        self.speeds = np.zeros(numVehicles)
+        self.waitingTimes = np.zeros(numVehicles)
+        self.stoppedHistory = np.zeros((numVehicles, self.waitingTimeMemory), dtype=bool)   # Whether each vehicle was stopped in each of the last waiting-time-memory steps
+
+        # RETURN THE POSITION OF THE LAST VEHICLE ON EVERY LANE (INFINITY FOR EMPTY LANES)
+    def getLaneTailPositions(self, active):
+        tailPositions = np.full(len(self.laneIDs), np.inf)
+        np.minimum.at(tailPositions, self.lanes[active], self.positions[active])
+        return tailPositions
+
+        # RETURN WHETHER EACH SIGNAL OF EVERY TRAFFIC LIGHT IS CURRENTLY GREEN
+    def getGreenSignals(self):
+        return np.concatenate([self.phaseGreenSignals[tlID][self.tlStates[tlID][0]] for tlID in self.tlStates])
+
+        # INSERT VEHICLES WHOSE DEPARTURE TIME HAS COME WHERE THERE IS ROOM AT THE START OF THEIR FIRST LANE; OTHERS WAIT TO DEPART
+    def insertVehicles(self):
+        departing = np.flatnonzero((self.status == PENDING) & (self.departTimes <= self.time))
+        if len(departing) == 0:
+            return
+
+        tailPositions = self.getLaneTailPositions(np.flatnonzero(self.status == ACTIVE))
+        for v in departing:
+            lane = self.lanes[v]
+            if tailPositions[lane] >= vehicleSpacing:
+                self.status[v] = ACTIVE
+                self.positions[v] = 0
+                self.speeds[v] = self.laneSpeeds[lane]
+                tailPositions[lane] = 0
+
+        # MOVE ALL VEHICLES IN THE NETWORK ONE STEP
+    def moveVehicles(self):
+        active = np.flatnonzero(self.status == ACTIVE)
+        if len(active) == 0:
+            return
+        tailPositions = self.getLaneTailPositions(active)
+        greenMask = self.getGreenSignals()
+
+            # Order vehicles by lane, front vehicle first, so each vehicle follows the one before it
+        order = np.lexsort((-self.positions[active], self.lanes[active]))
+        v = active[order]
+        lanes = self.lanes[v]
+        positions = self.positions[v]
+        laneLengths = self.laneLengths[lanes]
+        sameLaneAsLeader = np.concatenate(([False], lanes[1:] == lanes[:-1]))
+        leaderPositions = np.where(sameLaneAsLeader, np.concatenate(([np.inf], positions[:-1])), np.inf)
+
+            # A vehicle may leave its lane at the end of its route, or through an uncontrolled or green connection
+        routeIndices = self.routeIndices[v]
+        onLastEdge = routeIndices + 1 >= self.routeLengths[v]
+        signals = self.routeSignals[v, routeIndices]
+        mayCross = onLastEdge | (signals < 0) | greenMask[np.maximum(signals, 0)]
+
+        limits = leaderPositions - vehicleSpacing
+        limits = np.where(mayCross, limits, np.minimum(limits, laneLengths))
+        newPositions = np.maximum(positions, np.minimum(positions + self.laneSpeeds[lanes], limits))
+
+            # Vehicles reaching the end of a lane move on to the next lane of their route if there is room for them
+        crossing = newPositions >= laneLengths
+        nextLanes = self.routeLanes[v, np.minimum(routeIndices + 1, self.routeLanes.shape[1] - 1)]
+        room = tailPositions[nextLanes] - vehicleSpacing
+        blocked = crossing & ~onLastEdge & (room < 0)
+        newPositions = np.where(blocked, laneLengths, newPositions)
+        self.speeds[v] = newPositions - positions
+
+        arriving = crossing & onLastEdge
+        advancing = crossing & ~onLastEdge & ~blocked
+        self.status[v[arriving]] = ARRIVED
+        self.routeIndices[v[advancing]] += 1
+        self.lanes[v[advancing]] = nextLanes[advancing]
+        newPositions = np.where(advancing, np.minimum(newPositions - laneLengths, room), newPositions)
+        self.positions[v] = newPositions
+
+        stopped = self.speeds[v] < 0.1
+        self.waitingTimes[v] = np.where(stopped, self.waitingTimes[v] + 1, 0)
+        self.stoppedHistory[v, int(self.time) % self.waitingTimeMemory] = stopped
+
+    def getMinExpectedNumber(self):
+        return int(np.count_nonzero(self.status != ARRIVED))
+
+    def getVehicleIDList(self):
+        return [self.vehIDs[v] for v in np.flatnonzero(self.status == ACTIVE)]
+
+        # RETURN A VARIABLE OF A VEHICLE IN THE NETWORK BY ITS TRACI VARIABLE ID
+    def getVehicleVariable(self, vehID, varID):
+        v = self.vehIndices[vehID]
+        if varID == tc.VAR_LANE_ID:
+            return self.laneIDs[self.lanes[v]]
+        elif varID == tc.VAR_ROAD_ID:
+            return self.laneEdges[self.lanes[v]]
+        elif varID == tc.VAR_LANEPOSITION:
+            return float(self.positions[v])
+        elif varID == tc.VAR_SPEED:
+            return float(self.speeds[v])
+        elif varID == tc.VAR_WAITING_TIME:
+            return float(self.waitingTimes[v])
+        elif varID == tc.VAR_ACCUMULATED_WAITING_TIME:
+            return float(np.count_nonzero(self.stoppedHistory[v]))
+
+        raise ValueError("The surrogate simulator does not provide vehicle variable " + str(varID))
+
+        # RETURN THE INDICES OF VEHICLES IN THE NETWORK THAT ARE ON A GIVEN EDGE
+    def getVehiclesOnEdge(self, edgeID):
+        edgeLanes = [i for i, laneEdge in enumerate(self.laneEdges) if laneEdge == edgeID]
+        return np.flatnonzero((self.status == ACTIVE) & np.isin(self.lanes, edgeLanes))
+
+    def getEdgeWaitingTime(self, edgeID):
+        return float(self.waitingTimes[self.getVehiclesOnEdge(edgeID)].sum())
+
+    def getEdgeHaltingNumber(self, edgeID):
+        return int(np.count_nonzero(self.speeds[self.getVehiclesOnEdge(edgeID)] < 0.1))
+
+        # RETURN THE INDICES OF VEHICLES IN THE NETWORK THAT ARE ON A GIVEN LANE
+    def getVehiclesOnLane(self, laneID):
+        return np.flatnonzero((self.status == ACTIVE) & (self.lanes == self.laneIndices[laneID]))
+
+    def getLaneHaltingNumber(self, laneID):
+        return int(np.count_nonzero(self.speeds[self.getVehiclesOnLane(laneID)] < 0.1))
+
+    def getLaneWaitingTime(self, laneID):
+        return float(self.waitingTimes[self.getVehiclesOnLane(laneID)].sum())
+
+        # RETURN SUBSCRIBED VARIABLES OF VEHICLES WITHIN RANGE OF A JUNCTION, MEASURED ALONG THE EDGES ENTERING AND LEAVING IT
+    def getJunctionContextSubscriptionResults(self, junctionID):
+        if junctionID not in self.junctionContextSubscriptions:
+            return {}
+        contextRange, varIDs = self.junctionContextSubscriptions[junctionID]
+
+        lanes = self.lanes
+        approaching = (self.laneToJunctions[lanes] == junctionID) & (self.laneLengths[lanes] - self.positions <= contextRange)
+        leaving = (self.laneFromJunctions[lanes] == junctionID) & (self.positions <= contextRange)
+        results = {}
+        for v in np.flatnonzero((self.status == ACTIVE) & (approaching | leaving)):
+            results[self.vehIDs[v]] = {varID: self.getVehicleVariable(self.vehIDs[v], varID) for varID in varIDs}
+
+        return results
+
+    def close(self):
+        self.network = None
+        self.status = np.zeros(0, dtype=np.int8)
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import bisect
+
+# Counters and histograms of the time spent in the phases of a simulation run (stepping the
+# simulation, acquiring intersection state, checking user-defined rules, matching and selecting
+# rules, updating rule weights and applying phases). Times are measured with a monotonic clock by
+# the code being timed and recorded here without any output, so timing can stay on during training.
+# Stats of several runs (ex: the episodes of a generation) are aggregated with merge, and getRecord
+# returns them as a dictionary that can be written as one JSON line of a timings file.
+
+    # Upper bounds (s) of the histogram buckets; the last bucket holds every longer time
+global histogramBounds
+histogramBounds = [1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1]
+
+    # APPEND A RECORD AS ONE JSON LINE TO A FILE
+def writeRecord(fileName, record):
+    with open(fileName, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+class TimingStats:
+
+    def __init__(self):
+        self.stats = {}     # Phase name -> [count, total time, longest time, histogram counts]
+
+        # RECORD ONE TIMED CALL OF A PHASE
+    def record(self, phase, seconds):
+        stats = self.stats.get(phase)
+        if stats is None:
+            stats = self.stats[phase] = [0, 0, 0, [0]*(len(histogramBounds) + 1)]
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+        stats[3][bisect.bisect_left(histogramBounds, seconds)] += 1
+
+        # ADD THE STATS OF ANOTHER RUN TO THESE
+    def merge(self, other):
+        for phase, (count, total, longest, histogram) in other.stats.items():
+            stats = self.stats.get(phase)
+            if stats is None:
+                stats = self.stats[phase] = [0, 0, 0, [0]*(len(histogramBounds) + 1)]
+            stats[0] += count
+            stats[1] += total
+            stats[2] = max(stats[2], longest)
+            stats[3] = [a + b for a, b in zip(stats[3], histogram)]
+
+    def getCount(self, phase):
+        return self.stats[phase][0] if phase in self.stats else 0
+
+    def getTotal(self, phase):
+        return self.stats[phase][1] if phase in self.stats else 0
+
+        # RETURN THE STATS AS A DICTIONARY OF PHASE NAMES AND THEIR COUNT, TOTAL, MEAN AND LONGEST TIMES (S) AND HISTOGRAM
+    def getRecord(self):
+        record = {"histogramBounds": histogramBounds}
+        for phase, (count, total, longest, histogram) in self.stats.items():
+            record[phase] = {"count": count, "total": total, "mean": total/count, "max": longest, "histogram": list(histogram)}
+
+        return record
@@ -1,6 +1,12 @@
 import os
 import sys
-from numpy.random import choice
+from collections import deque
+
+import PredicateRegistry
+import RandomStreams
+
+from PhaseTable import PhaseTable
+from QueueTracker import QueueTracker
 
 from Intention import Intention
 class TrafficLight:
@@ -10,19 +16,32 @@ class TrafficLight:
 
     pCoop = 0.5
 
+    global intentionLifetime        # Intentions older than this (s) cannot match any timeSinceCommunication predicate, so they are dropped
+    global intentionBufferSize      # Partners communicate at most one intention per simulation step, so this many cover the lifetime
+
+    intentionLifetime = PredicateRegistry.getIntentionLifetime()
+    intentionBufferSize = int(intentionLifetime) + 1
+
+    global defaultDecisionInterval  # Seconds between a traffic light's decisions unless set otherwise
+
+    defaultDecisionInterval = 5
+
     def __init__ (self, name, lanes):
         self.name = name
         self.lanes = lanes
         self.edges = []
         self._setEdges(self.lanes)
         self.phases = []
+        self.phaseTable = PhaseTable([])
         self.currentRule = None 
-        self.carsWaiting = {}
+        self.queueTracker = QueueTracker()     # Queue of stopped vehicles at the last decision, for rule rewards
         self.waitTime = 0
         self.doNothingCount = 0
         self.communicationPartners = []
         self.communicatedIntentions = {}
-        self.recievedIntentions = {}
+        self.recievedIntentions = {}        # Partner name -> buffer of intentions recieved from that partner, oldest first
+        self.decisionInterval = defaultDecisionInterval
+        self.randomGenerator = RandomStreams.getGenerator("trafficLight_" + name)   # Stream for choosing rules; Driver gives each episode its own
 
         # RETURNS THE TRAFFIC LIGHT'S NAME
     def getName(self):
@@ -63,6 +82,11 @@ class TrafficLight:
         # SETS THE PHASES AVAILBLE TO THE TRAFFIC LIGHT
     def setPhases(self, phases):
         self.phases = phases
+        self.phaseTable = PhaseTable(phases)    # Built before agent pools add their "do nothing" action to the phases
+
+        # RETURNS THE TABLE OF THE TRAFFIC LIGHT'S PHASES
+    def getPhaseTable(self):
+        return self.phaseTable
 
         # SETS THE PHASES AVAILBLE TO THE TRAFFIC LIGHT
     def addPhase(self, phase):
@@ -89,19 +113,25 @@ class TrafficLight:
     def getAssignedIndividual(self):
         return self.assignedIndividual
 
-        # ASSIGNS A RULE SET INDIVIDUAL CURRENTLY BEING USED BY THE TRAFFIC LIGHT FOR A SIM RUN
-    def assignIndividual(self):
-        self.assignedIndividual = self.agentPool.selectIndividual()
+        # ASSIGNS A RULE SET INDIVIDUAL CURRENTLY BEING USED BY THE TRAFFIC LIGHT FOR A SIM RUN; IF NONE IS GIVEN, ONE IS SELECTED FROM THE AGENT POOL
+    def assignIndividual(self, individual=None):
+        if individual is None:
+            individual = self.agentPool.selectIndividual()
+        self.assignedIndividual = individual
         print("Individual selected is", self.assignedIndividual)
         self.assignedIndividual.selected() # Let Individual know it's been selected
 
-        # RETURNS THE TOTAL NUMBER OF CARS WAITING AT THE TRAFFIC LIGHT'S INTERSECTION
+        # RETURNS THE CARS WAITING AT THE TRAFFIC LIGHT'S INTERSECTION AT ITS LAST DECISION
     def getCarsWaiting(self):
-        return self.carsWaiting
+        return self.queueTracker.getQueue()
     
-        # SETS THE TOTAL NUMBER OF CARS WAITING AT THE TRAFFIC LIGHT'S INTERSECTION
+        # SETS THE CARS WAITING AT THE TRAFFIC LIGHT'S INTERSECTION, COUNTING THE CARS THAT WENT THROUGH SINCE THE LAST DECISION
     def updateCarsWaiting(self, carsWaiting):
-        self.carsWaiting = carsWaiting
+        self.queueTracker.update(carsWaiting)
+
+        # RETURNS THE TRACKER OF THE QUEUE AT THE TRAFFIC LIGHT'S INTERSECTION
+    def getQueueTracker(self):
+        return self.queueTracker
 
         # RETURNS THE TOTAL WAIT TIME OF CARS WAITING AT THE TRAFFIC LIGHT'S INTERSECTION
     def getWaitTime(self):
@@ -119,6 +149,21 @@ class TrafficLight:
     def getDoNothingCount(self):
         return self.doNothingCount
 
+        # RETURN THE NUMBER OF SECONDS BETWEEN THE TRAFFIC LIGHT'S DECISIONS
+    def getDecisionInterval(self):
+        return self.decisionInterval
+
+        # SET THE NUMBER OF SECONDS BETWEEN THE TRAFFIC LIGHT'S DECISIONS
+    def setDecisionInterval(self, decisionInterval):
+        self.decisionInterval = decisionInterval
+
+    def getRandomGenerator(self):
+        return self.randomGenerator
+
+        # SET THE GENERATOR RULES ARE CHOSEN WITH
+    def setRandomGenerator(self, randomGenerator):
+        self.randomGenerator = randomGenerator
+
         # RETURN LIST OF COMMUNICATION PARTNERS
     def getCommunicationPartners(self):
         return self.communicationPartners
@@ -126,6 +171,7 @@ class TrafficLight:
         # SET LIST OF COMMUNICATION PARTNERS
     def setCommunicationPartners(self, commPartners):
         self.communicationPartners = commPartners
+        PredicateRegistry.invalidateTopology()         # Agent specific predicates depend on communication partners
 
         # SET TL'S NEXT INTENDED ACTION
     def setIntention(self, intention):
@@ -137,21 +183,36 @@ class TrafficLight:
         for tl in self.communicationPartners:
             tl.recieveIntention(intention)
 
-        # RECIEVE AN INTENTION FROM A COMMUNICATION PARTNER
+        # RECIEVE AN INTENTION FROM A COMMUNICATION PARTNER INTO THAT PARTNER'S BUFFER
     def recieveIntention(self, intention):
-        if intention.getTurn() not in self.recievedIntentions:
-            self.recievedIntentions[intention.getTurn()] = []
-        
-        self.recievedIntentions[intention.getTurn()].append(intention)
+        partnerName = intention.getTrafficLight().getName()
+        if partnerName not in self.recievedIntentions:
+            self.recievedIntentions[partnerName] = deque(maxlen=intentionBufferSize)
+
+        self.pruneIntentions(self.recievedIntentions[partnerName], intention.getTime())     # Prune before appending, so intentions of a previous simulation run are detected
+        self.recievedIntentions[partnerName].append(intention)
         # print(self.getName(), "recieved an intention from", intention.getTrafficLight().getName(), "\n")
 
-    def getCommunicatedIntentions(self):
-        return self.recievedIntentions
+        # DROP INTENTIONS THAT NO timeSinceCommunication PREDICATE CAN MATCH AT A GIVEN TIME, AND INTENTIONS FROM A PREVIOUS SIMULATION RUN
+    def pruneIntentions(self, intentions, time):
+        if len(intentions) > 0 and intentions[-1].getTime() > time:
+            intentions.clear()
+        while len(intentions) > 0 and time - intentions[0].getTime() > intentionLifetime:
+            intentions.popleft()
+
+        # RETURN THE INTENTIONS RECIEVED FROM ALL COMMUNICATION PARTNERS THAT ARE STILL CURRENT AT A GIVEN TIME
+    def getCommunicatedIntentions(self, time):
+        communicatedIntentions = []
+        for intentions in self.recievedIntentions.values():
+            self.pruneIntentions(intentions, time)
+            communicatedIntentions.extend(intentions)
+
+        return communicatedIntentions
 
         # DECIDE WHICH RULE TO APPLY AT CURRENT ACTION STEP
     def getNextRule(self, validRulesRS, validRulesRSint, time): 
             # First, select a rule from RS and communicate it
-        intendedRule = self.getAssignedIndividual().selectRule(validRulesRS)    # Get intended rule to apply
+        intendedRule = self.getAssignedIndividual().selectRule(validRulesRS, self.randomGenerator)    # Get intended rule to apply
 
         if intendedRule == -1:
             return -1
@@ -159,7 +220,7 @@ class TrafficLight:
         self.setIntention(Intention(self, intendedRule.getAction(), time))
             
             # If intended rule isn't user-defined, select a rule from RSint and then decide between the two
-        coopRule = self.getAssignedIndividual().selectCoopRule(validRulesRSint)
+        coopRule = self.getAssignedIndividual().selectCoopRule(validRulesRSint, self.randomGenerator)
 
             # If no valid rules apply from RSint, return the intented rule from RS
         if coopRule == -1:
@@ -168,6 +229,7 @@ class TrafficLight:
         if coopRule.getWeight() >= intendedRule.getWeight():
             return coopRule
         else:
-            rule = choice([coopRule, intendedRule], 1, p = [pCoop, (1-pCoop)])  # Select one of the two rules based on pCoop value
-            return rule[0]                                                      # Choice returns an array, so we take the only element of it
+            if self.randomGenerator.random() < pCoop:   # Select one of the two rules based on pCoop value
+                return coopRule
+            return intendedRule
 
@@ -8,7 +8,13 @@ import timeit
 import time
 
 from Driver import Driver
+from SimulationSession import SimulationSession
 import EvolutionaryLearner
+import ParallelEvaluator
+import SurrogateScreening
+import RandomStreams
+from FitnessCache import FitnessCache
+import TimingStats
 
 
 # Importing needed python modules from the $SUMO_HOME/tools directory
@@ -20,7 +26,6 @@ else:
 
 
 from sumolib import checkBinary  # Checks for the binary in environ vars
-import traci
 
 if __name__ == "__main__":
 
@@ -28,6 +33,22 @@ if __name__ == "__main__":
     gui = False
     totalGenerations = 50
     individualRunsPerGen = 3  # Min number of training runs an individual gets per generation
+    parallelWorkers = 1  # Number of SUMO instances evaluating episodes at once; 1 runs episodes one after another
+    reuseSimulation = True  # Keep one SUMO process and reload the scenario between episodes instead of restarting SUMO
+    simulatorBackend = "traci"  # "traci" (SUMO over a socket), "libsumo" (SUMO in this process) or "standin" (pure-Python stand-in)
+    screenWithSurrogate = False  # Screen individuals on the surrogate simulator and only give the most promising ones SUMO runs
+    surrogateRunsPerIndividual = 3  # Min number of surrogate runs an individual gets when screening
+    surrogatePromotionFraction = 0.3  # Fraction of each agent pool's individuals promoted to SUMO runs after screening
+    useFitnessCache = True  # Skip runs for individuals whose rules already have enough fitness results cached on disk for this scenario
+    fitnessCacheFile = "fitnessCache.json"
+    fitnessCacheSize = 10000  # Max number of individuals kept in the fitness cache; least recently used ones are evicted
+    topologyCacheDir = "topologyCache"  # Directory of compiled network topologies, reused while the network and user-defined rules files are unchanged; None parses them every launch
+    featureMode = "vehicles"  # How intersection features are read: "vehicles" (per-vehicle subscriptions), "detectors" (lane area detectors, SUMO only) or "lanes" (lane halting numbers); see Driver.featureModes
+    detectorFile = "detectors.add.xml"  # Lane area detectors written for the "detectors" feature mode
+    timingsFile = "timings.jsonl"  # File each episode's and generation's phase timings are appended to as JSON lines; None keeps them in memory only
+    accountTraciCalls = False  # Count and time every simulator call of an episode by API function and Driver method (slows runs down; episodes run one after another only)
+    traciCallsFile = "traciCalls.jsonl"  # File each episode's simulator call counts and fitness results are appended to as JSON lines when accountTraciCalls is on
+    randomSeed = None  # Seed of every random stream; None draws a new one, printed at the start so the run can be repeated
     gamma = 0.75
     batch_size = 100
     memory_size = 50000
@@ -39,6 +60,7 @@ if __name__ == "__main__":
     maxGreenPhaseTime = 225
     maxYellowPhaseTime = 5
     maxSimulationTime = 10000
+    decisionInterval = 5  # Seconds between traffic light decisions; TrafficLight.setDecisionInterval sets it per traffic light
     runTimeSet = []
 
 
@@ -51,15 +73,31 @@ if __name__ == "__main__":
     # initializations
     #sumoCmd = [sumoBinary, "-c", "intersection/tlcs_config_train.sumocfg", "--no-step-log", "true", "--waiting-time-memory", str(max_steps)]
     sumoCmd = [sumoBinary, "-c", "config_file.sumocfg", "--waiting-time-memory", "5", "--time-to-teleport", "-1"]
+    if featureMode == "detectors":
+        sumoCmd += ["--additional-files", detectorFile]
+    else:
+        detectorFile = None
         
     print("----- Start time:", datetime.datetime.now())
-    setUpTuple = InitSetUp.run(sumoNetworkName, individualRunsPerGen)
-    simRunner = Driver(sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime)
+    RandomStreams.seed(randomSeed)
+    print("Random seed:", RandomStreams.getEntropy())
+    setUpTuple = InitSetUp.run(sumoNetworkName, individualRunsPerGen, topologyCacheDir, detectorFile)
+    for tl in setUpTuple[1]:
+        tl.setDecisionInterval(decisionInterval)
+    simRunner = Driver(sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, featureMode=featureMode)
     episode = 0
     generations = 1
     allIndividualsTested = False
     simulationStartTime = datetime.datetime.now()
     generationRuntimes = []
+    simSession = SimulationSession(sumoCmd, persistent=reuseSimulation, backend=simulatorBackend)
+    if screenWithSurrogate:
+        surrogateSession = SimulationSession(sumoCmd, persistent=True, backend="surrogate")
+    if parallelWorkers > 1:
+        workerPool = ParallelEvaluator.createWorkerPool(parallelWorkers)
+    if useFitnessCache:
+        decisionIntervals = {tl.getName(): tl.getDecisionInterval() for tl in setUpTuple[1]}
+        fitnessCache = FitnessCache(sumoCmd, maxGreenPhaseTime, maxYellowPhaseTime, decisionIntervals, simulatorBackend if featureMode == "vehicles" else simulatorBackend + "_" + featureMode, fitnessCacheFile, fitnessCacheSize)    # Feature modes give different results, so each has its own entries
 
     # Evolutionary learning loop 
     while generations <= totalGenerations:
@@ -68,6 +106,7 @@ if __name__ == "__main__":
         print("The average generation runtime is", sum(generationRuntimes)/generations)
         genStart = datetime.datetime.now()
         startTime = time.time()
+        generationTimings = TimingStats.TimingStats()   # Phase timings of every episode of the generation
 
         # Prepare for next simulation run
         allIndividualsTested = False
@@ -76,34 +115,63 @@ if __name__ == "__main__":
                 i.resetSelectedCount()
                 # print("Generation includes Individual:", i.getID())
 
+            # Adjust maximum simulation times for individuals based on generation count
+        if generations >= 5 and generations < 15:
+            print('The generation is', generations, "so we're changing maxSimTime to 6000")
+            maxSimulationTime = 6000
+            print("Changed maxSimTime to", maxSimulationTime)
+        elif generations >= 15:
+            print('The generation is', generations, "so we're changing maxSimTime to 4000")
+            maxSimulationTime = 4000
+            print("Changed maxSimTime to", maxSimulationTime)
+
+            # Individuals with enough cached fitness results are not given runs
+        if useFitnessCache:
+            cacheHits = fitnessCache.applyCachedResults(setUpTuple[2], individualRunsPerGen, maxSimulationTime)
+            print("Fitness cache hits:", cacheHits)
+            allIndividualsTested = not ParallelEvaluator.individualsNeedRuns(setUpTuple[2], individualRunsPerGen)
+
+            # Screened out individuals keep their surrogate fitness and are not given SUMO runs
+        if screenWithSurrogate:
+            start = timeit.default_timer()
+            SurrogateScreening.run(surrogateSession, sumoCmd, setUpTuple, surrogateRunsPerIndividual, surrogatePromotionFraction, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime)
+            stop = timeit.default_timer()
+            print('Surrogate screening time: ', round(stop - start, 1))
+
+            # Parallel evaluation runs every episode the generation needs on the worker pool's SUMO instances
+        if parallelWorkers > 1:
+            start = timeit.default_timer()
+            episode += ParallelEvaluator.evaluateGeneration(workerPool, parallelWorkers, sumoCmd, setUpTuple, individualRunsPerGen, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, simulatorBackend, episode, featureMode, generationTimings)
+            stop = timeit.default_timer()
+            print('Parallel evaluation time: ', round(stop - start, 1))
+            allIndividualsTested = True
+
         # Reinforcement learning loop
         while not allIndividualsTested:
-                # Adjust maximum simulation times for individuals based on generation count
-            if generations >= 5 and generations < 15:
-                print('The generation is', generations, "so we're changing maxSimTime to 6000")
-                maxSimulationTime = 6000
-                print("Changed maxSimTime to", maxSimulationTime)
-            elif generations >= 15:
-                print('The generation is', generations, "so we're changing maxSimTime to 4000")
-                maxSimulationTime = 4000
-                print("Changed maxSimTime to", maxSimulationTime)
-
             print('Changes made. The generation is', generations, "and the maxSimTime is", maxSimulationTime)
-            simRunner = Driver(sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime)
+            simRunner = Driver(sumoCmd, setUpTuple, maxGreenPhaseTime, maxYellowPhaseTime, maxSimulationTime, session=simSession, featureMode=featureMode, accountCalls=accountTraciCalls)
 
             print('----- Episode {}'.format(episode+1), "of GENERATION {} of {}".format(generations, totalGenerations))
             print("Generation start time:", genStart)
             print("The average generation runtime is", sum(generationRuntimes)/generations)
             start = timeit.default_timer()
-            resultingAgentPools = simRunner.run()  # run the simulation
+            resultingAgentPools = simRunner.run(episode=episode)  # run the simulation
             stop = timeit.default_timer()
             print('Time: ', round(stop - start, 1))
+            setupTime, teardownTime = simSession.getLastEpisodeOverhead()
+            print('Setup time: ', round(setupTime, 2), '----- Teardown time: ', round(teardownTime, 2))
+            generationTimings.merge(simRunner.getTimings())
+            if timingsFile is not None:
+                TimingStats.writeRecord(timingsFile, {"record": "episode", "generation": generations, "episode": episode, "runtime": stop - start, "timings": simRunner.getTimings().getRecord()})
+            if accountTraciCalls:
+                fitnessResults = {tl.getName(): tl.getAssignedIndividual().getRunFitnessResults()[-1] for tl in setUpTuple[1]}    # Fitness each traffic light's individual got from the episode
+                TimingStats.writeRecord(traciCallsFile, {"generation": generations, "episode": episode, "fitnessResults": fitnessResults, "calls": simRunner.getCallRecord()})
             episode += 1
 
             needsTesting = []
             for ap in resultingAgentPools:
                 for i in ap.getIndividualsSet():
-                    if i.getSelectedCount() < individualRunsPerGen:
+                    if i.needsRuns(individualRunsPerGen):
                         needsTesting.append(True)
                     else:
                         needsTesting.append(False)
@@ -115,6 +183,10 @@ if __name__ == "__main__":
                         continue # print(i, "has a selected count of:", i.getSelectedCount())
             #allIndividualsTested = True # Uncomment for quick testing
 
+        if useFitnessCache:
+            fitnessCache.storeResults(setUpTuple[2], maxSimulationTime)
+            fitnessCache.save()
+
             # Prepare individuals for the next run through
         for ap in setUpTuple[2]:
             ap.normalizeIndividualsFitnesses()  # Normalize the fitness values of each Individual in an agent pool for breeding purposes
@@ -142,9 +214,19 @@ if __name__ == "__main__":
         
         print("Generation start time:", genStart, "----- End time:", datetime.datetime.now())
         generationRuntimes.append(time.time() - startTime)
+        if timingsFile is not None:
+            TimingStats.writeRecord(timingsFile, {"record": "generation", "generation": generations, "totalEpisodes": episode, "runtime": generationRuntimes[-1], "timings": generationTimings.getRecord()})
         generations += 1 
                
 
+    simSession.close()
+    if screenWithSurrogate:
+        surrogateSession.close()
+    print("Total setup/teardown overhead of", len(simSession.getEpisodeOverheads()), "episodes:", round(simSession.getTotalOverhead(), 1))
+    if parallelWorkers > 1:
+        workerPool.close()
+        workerPool.join()
+
     print("Start time:", simulationStartTime, "----- End time:", datetime.datetime.now())
     print("This simulation began at:", simulationStartTime)
     print("PATH:", path)